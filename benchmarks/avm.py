@@ -0,0 +1,1729 @@
+# -----------------           Description          -----------------
+# Evaluator of AVM bytecode (up to version 8), used by the local ledger (see benchmarks/local_ledger.py) to execute the
+# compiled contracts without a node. A program is decoded once into a list of instructions - the handler of the opcode,
+# its decoded immediates and its opcode cost - with the branch targets resolved to instruction indices, thus evaluating
+# an instruction is a single call.
+# Evaluation follows the rules of the AVM that the contracts depend on: uint64 and byte math including their failures,
+# the opcode budget pooled across a group (700 per app call, inner ones included), the availability of the accounts,
+# apps and assets referenced by the transaction, the box references and the box I/O budget of a group (1024 bytes per
+# reference), inner transactions with fee pooling and the limits of logs and inner transactions. Opcodes that the
+# contracts don't use (signature verification, JSON, VRF, block fields) are not supported.
+# The ledger is accessed through the attributes and methods listed in GroupContext, and is mutated only through its
+# journaled ledger.set and ledger.delete, thus a failed group can be rolled back.
+
+# -----------------           Imports          -----------------
+import hashlib
+import math
+
+from Cryptodome.Hash import SHA512, keccak
+
+from src.config import APP_CALL_BUDGET
+from src.teal_assembler import OPS
+
+# ---------------------------------------------------------------
+
+
+class AVMError(Exception):
+    pass
+
+
+MAX_UINT64 = (1 << 64) - 1
+MAX_BYTE_MATH_INPUT = 64
+MAX_STRING_SIZE = 4096
+MAX_STACK_DEPTH = 1000
+MAX_CALL_DEPTH = 8
+
+# Box I/O budget of each box reference [B]
+BOX_IO_BUDGET = 1024
+MAX_BOX_SIZE = 32768
+MAX_BOX_NAME_SIZE = 64
+MAX_INNER_TXNS = 256
+MAX_LOGS = 32
+MAX_LOG_SIZE = 1024
+MAX_APP_ARGS = 16
+# Maximum number of accounts among the references of an app call
+MAX_ACCOUNTS = 4
+MAX_KEY_SIZE = 64
+MAX_KEY_VALUE_SIZE = 128
+
+ZERO_ADDRESS = bytes(32)
+
+# Costs of the opcodes that don't cost 1
+OPCODE_COSTS = {
+    "sha256": 35, "keccak256": 130, "sha512_256": 45, "sha3_256": 130, "divmodw": 20, "sqrt": 4, "expw": 10,
+    "bsqrt": 40, "b+": 10, "b-": 10, "b/": 20, "b*": 20, "b%": 20, "b|": 6, "b&": 6, "b^": 6, "b~": 4,
+}
+
+# Fields of transactions holding addresses and byte values - the others hold uint64 values
+ADDRESS_FIELDS = {
+    "Sender", "Receiver", "CloseRemainderTo", "AssetSender", "AssetReceiver", "AssetCloseTo", "RekeyTo",
+    "ConfigAssetManager", "ConfigAssetReserve", "ConfigAssetFreeze", "ConfigAssetClawback", "FreezeAssetAccount",
+}
+BYTES_FIELDS = {
+    "Note", "Lease", "Type", "TxID", "VotePK", "SelectionPK", "ApprovalProgram", "ClearStateProgram",
+    "ConfigAssetUnitName", "ConfigAssetName", "ConfigAssetURL", "ConfigAssetMetadataHash", "StateProofPK",
+}
+# Fields of transactions holding arrays
+ARRAY_FIELDS = {"ApplicationArgs", "Accounts", "Assets", "Applications", "Logs", "ApprovalProgramPages",
+                "ClearStateProgramPages"}
+
+TYPE_ENUMS = {b"pay": 1, b"keyreg": 2, b"acfg": 3, b"axfer": 4, b"afrz": 5, b"appl": 6}
+TYPE_NAMES = {v: k for k, v in TYPE_ENUMS.items()}
+
+# On completion actions
+NO_OP, OPT_IN, CLOSE_OUT, CLEAR_STATE, UPDATE_APPLICATION, DELETE_APPLICATION = range(6)
+
+
+# Function returns the value of a field that has not been set
+def field_default(name: str):
+    if name in ADDRESS_FIELDS:
+        return ZERO_ADDRESS
+    if name in BYTES_FIELDS:
+        return b""
+    if name in ARRAY_FIELDS:
+        return ()
+    return 0
+
+
+# Group being evaluated - shared by all of its (inner) app calls
+class GroupContext:
+
+    __slots__ = ("txns", "budget", "spent", "fee_credit", "inner_txns", "box_refs", "box_quota", "dirty_boxes",
+                 "dirty_bytes", "scratch", "created_apps", "created_assets")
+
+    def __init__(self, txns: list, min_fee: int):
+        self.txns = txns
+        app_calls = [t for t in txns if t["TypeEnum"] == 6]
+        # Pooled opcode budget and the cost spent from it
+        self.budget = APP_CALL_BUDGET * len(app_calls)
+        self.spent = 0
+        # Fees paid above the minimum, which can pay for other (inner) transactions
+        self.fee_credit = sum(t["Fee"] for t in txns) - min_fee * len(txns)
+        # Number of inner transactions issued
+        self.inner_txns = 0
+        # Referenced boxes as (app ID, name) and the box I/O budget
+        self.box_refs = set()
+        refs = 0
+        for t in app_calls:
+            for app_id, name in t.get("Boxes", ()):
+                self.box_refs.add((app_id, name))
+                refs += 1
+        self.box_quota = BOX_IO_BUDGET * refs
+        # Boxes written and their sizes
+        self.dirty_boxes = {}
+        self.dirty_bytes = 0
+        # Scratch space of the evaluated app calls (for gload) and IDs created by the transactions (for gaid)
+        self.scratch = {}
+        self.created_apps = set()
+        self.created_assets = set()
+
+
+# -----    Decoding     -----
+class Program:
+
+    __slots__ = ("version", "code", "names", "offsets")
+
+    def __init__(self, version: int, code: list, names: list, offsets: list):
+        self.version = version
+        # Instructions as (handler, immediates, cost, whether the handler needs the cost spent so far)
+        self.code = code
+        # Name and byte offset of each instruction
+        self.names = names
+        self.offsets = offsets
+
+
+_OPCODES = {opcode: (name, immediates) for name, (opcode, immediates) in OPS.items()}
+
+
+def _read_varuint(bytecode: bytes, i: int):
+    value = shift = 0
+    while True:
+        b = bytecode[i]
+        i += 1
+        value |= (b & 0x7f) << shift
+        if b < 0x80:
+            return value, i
+        shift += 7
+
+
+def _read_bytes(bytecode: bytes, i: int):
+    n, i = _read_varuint(bytecode, i)
+    if i + n > len(bytecode):
+        raise AVMError("Byte constant exceeds the program")
+    return bytes(bytecode[i:i + n]), i + n
+
+
+# Function decodes the immediates of the instruction at i, returns (immediates, offset of the next instruction)
+def _read_immediates(bytecode: bytes, i: int, immediates: list):
+    values = []
+    for kind in immediates:
+        if kind == "u8":
+            values.append(bytecode[i])
+            i += 1
+        elif kind == "i8":
+            values.append(bytecode[i] - 256 if bytecode[i] > 127 else bytecode[i])
+            i += 1
+        elif kind == "label":
+            values.append(int.from_bytes(bytecode[i:i + 2], 'big', signed=True))
+            i += 2
+        elif kind == "labels":
+            n = bytecode[i]
+            i += 1
+            values.append([int.from_bytes(bytecode[i + 2 * k:i + 2 * k + 2], 'big', signed=True) for k in range(n)])
+            i += 2 * n
+        elif kind == "varuint":
+            value, i = _read_varuint(bytecode, i)
+            values.append(value)
+        elif kind == "bytes":
+            value, i = _read_bytes(bytecode, i)
+            values.append(value)
+        elif kind == "varuints":
+            n, i = _read_varuint(bytecode, i)
+            block = []
+            for _ in range(n):
+                value, i = _read_varuint(bytecode, i)
+                block.append(value)
+            values.append(block)
+        elif kind == "bytess":
+            n, i = _read_varuint(bytecode, i)
+            block = []
+            for _ in range(n):
+                value, i = _read_bytes(bytecode, i)
+                block.append(value)
+            values.append(block)
+        else:
+            values.append(kind[bytecode[i]])
+            i += 1
+    if i > len(bytecode):
+        raise AVMError("Immediates exceed the program")
+    return values, i
+
+
+_programs = {}
+
+
+# Function decodes the bytecode into a Program (cached, since many apps run the same programs)
+def load_program(bytecode: bytes):
+    program = _programs.get(bytecode)
+    if program is not None:
+        return program
+
+    version, i = _read_varuint(bytecode, 0)
+    if not 1 <= version <= 8:
+        raise AVMError("Unsupported program version {}".format(version))
+
+    names, offsets, raw = [], [], []
+    while i < len(bytecode):
+        if bytecode[i] not in _OPCODES:
+            raise AVMError("Invalid opcode 0x{:02x} at {}".format(bytecode[i], i))
+        name, immediates = _OPCODES[bytecode[i]]
+        values, end = _read_immediates(bytecode, i + 1, immediates)
+        names.append(name)
+        offsets.append(i)
+        raw.append((name, values, end))
+        i = end
+
+    # Resolve branch offsets (relative to the end of the branch instruction) to instruction indices
+    index = {offset: k for k, offset in enumerate(offsets)}
+    index[len(bytecode)] = len(offsets)
+
+    def target(end, offset):
+        if end + offset not in index:
+            raise AVMError("Branch to an invalid offset {}".format(end + offset))
+        return index[end + offset]
+
+    code = []
+    for k, (name, values, end) in enumerate(raw):
+        if name in ("bnz", "bz", "b"):
+            values = [target(end, values[0])]
+        elif name == "callsub":
+            # Subroutines return to the next instruction
+            values = [(target(end, values[0]), k + 1)]
+        elif name in ("switch", "match"):
+            values = [[target(end, offset) for offset in values[0]]]
+        handler, immediates = _instruction(name, values)
+        sync = name in _SYNC_OPS or (name == "global" and values[0] == "OpcodeBudget")
+        code.append((handler, immediates, OPCODE_COSTS.get(name, 1), sync))
+
+    program = Program(version, code, names, offsets)
+    _programs[bytecode] = program
+    return program
+
+
+# Function returns a copy of the program whose instructions add their cost to costs by opcode name, for profiling
+def profiled(program: Program, costs: dict):
+    code = [(_counted(handler, name, cost, costs), immediates, cost, sync)
+            for (handler, immediates, cost, sync), name in zip(program.code, program.names)]
+    return Program(program.version, code, program.names, program.offsets)
+
+
+def _counted(handler, name: str, cost: int, costs: dict):
+    def counted(ev, imm):
+        costs[name] = costs.get(name, 0) + cost
+        return handler(ev, imm)
+    return counted
+
+
+# -----    Evaluation     -----
+class Evaluation:
+
+    __slots__ = ("ledger", "group", "txns", "index", "txn", "app_id", "app", "program", "caller", "depth", "stack",
+                 "scratch", "frames", "intc", "bytec", "logs", "itxns", "last_itxns", "cost", "accounts")
+
+    def __init__(self, ledger, group: GroupContext, txns: list, index: int, app, program: Program, caller=None,
+                 depth: int = 0):
+        self.ledger = ledger
+        self.group = group
+        # Transactions of the (inner) group of the app call and its position in it
+        self.txns = txns
+        self.index = index
+        self.txn = txns[index]
+        self.app_id = app.id
+        self.app = app
+        self.program = program
+        # Evaluation of the app that issued this call as an inner transaction (if it did)
+        self.caller = caller
+        self.depth = depth
+        self.stack = []
+        self.scratch = [0] * 256
+        # Frames of callsub: (return instruction, height of the stack, number of arguments, number of return values)
+        self.frames = []
+        self.intc = []
+        self.bytec = []
+        self.logs = []
+        # Inner group being built and the last submitted one
+        self.itxns = None
+        self.last_itxns = []
+        # Opcode cost of the evaluation
+        self.cost = 0
+        # Accounts available to the program (determined on first use)
+        self.accounts = None
+
+    # Function runs the program, returns whether it approved. Raises AVMError if it failed.
+    def run(self):
+        group = self.group
+        code = self.program.code
+        n = len(code)
+        stack = self.stack
+        pc = 0
+        cost = 0
+        limit = group.budget - group.spent
+        try:
+            while pc < n:
+                handler, immediates, c, sync = code[pc]
+                pc += 1
+                cost += c
+                if cost > limit:
+                    raise AVMError("dynamic cost budget exceeded, executing {}: local program cost was {}".format(
+                        self.program.names[pc - 1], self.cost + cost))
+                if sync:
+                    # Nested evaluations spend from (and add to) the pooled budget
+                    group.spent += cost
+                    self.cost += cost
+                    cost = 0
+                    result = handler(self, immediates)
+                    limit = group.budget - group.spent
+                else:
+                    result = handler(self, immediates)
+                if result is not None:
+                    if result < 0:
+                        break
+                    pc = result
+                if len(stack) > MAX_STACK_DEPTH:
+                    raise AVMError("stack overflow")
+        except AVMError as e:
+            raise AVMError("pc={} {}: {}".format(self.program.offsets[pc - 1], self.program.names[pc - 1], e)) \
+                from None
+        except IndexError:
+            raise AVMError("pc={} {}: stack underflow or index out of range".format(
+                self.program.offsets[pc - 1], self.program.names[pc - 1])) from None
+        finally:
+            group.spent += cost
+            self.cost += cost
+
+        if len(stack) != 1:
+            raise AVMError("stack len is {} instead of 1".format(len(stack)))
+        if type(stack[0]) is not int:
+            raise AVMError("stack finished with bytes not int")
+        if self.caller is None:
+            group.scratch[self.index] = self.scratch
+        return stack[0] != 0
+
+    # -----    References     -----
+    def available_accounts(self):
+        t = self.txn
+        accounts = {t["Sender"], self.ledger.app_address(self.app_id)}
+        accounts.update(t.get("Accounts", ()))
+        for app_id in t.get("Applications", ()):
+            accounts.add(self.ledger.app_address(app_id))
+        for app_id in self.group.created_apps:
+            accounts.add(self.ledger.app_address(app_id))
+        return accounts
+
+    def account(self, ref):
+        if type(ref) is int:
+            if ref == 0:
+                return self.txn["Sender"]
+            accounts = self.txn.get("Accounts", ())
+            if ref > len(accounts):
+                raise AVMError("invalid Account reference {}".format(ref))
+            return accounts[ref - 1]
+        if len(ref) != 32:
+            raise AVMError("invalid address of length {}".format(len(ref)))
+        if self.accounts is None or ref not in self.accounts:
+            self.accounts = self.available_accounts()
+        if ref not in self.accounts:
+            raise AVMError("unavailable Account {}".format(self.ledger.encode_address(ref)))
+        return ref
+
+    def application(self, ref: int):
+        if type(ref) is not int:
+            raise AVMError("app reference is not uint64")
+        apps = self.txn.get("Applications", ())
+        if ref == 0:
+            return self.app_id
+        if ref <= len(apps):
+            return apps[ref - 1]
+        if ref == self.app_id or ref in apps or ref in self.group.created_apps:
+            return ref
+        raise AVMError("unavailable App {}".format(ref))
+
+    def asset(self, ref: int):
+        if type(ref) is not int:
+            raise AVMError("asset reference is not uint64")
+        assets = self.txn.get("Assets", ())
+        if ref < len(assets):
+            return assets[ref]
+        if ref in assets or ref in self.group.created_assets:
+            return ref
+        raise AVMError("unavailable Asset {}".format(ref))
+
+    def box(self, name):
+        if type(name) is not bytes:
+            raise AVMError("box name is not bytes")
+        if not 1 <= len(name) <= MAX_BOX_NAME_SIZE:
+            raise AVMError("box names must be 1 to 64 bytes long")
+        if (self.app_id, name) not in self.group.box_refs:
+            raise AVMError("invalid Box reference {}".format(name.hex()))
+        return name
+
+    # Function records the write of the box with its new size against the write budget of the group
+    def write_box(self, name: bytes, size: int):
+        group = self.group
+        key = (self.app_id, name)
+        group.dirty_bytes += size - group.dirty_boxes.get(key, 0)
+        group.dirty_boxes[key] = size
+        if group.dirty_bytes > group.box_quota:
+            raise AVMError("write budget ({}) exceeded {}".format(group.box_quota, group.dirty_bytes))
+
+    # Function checks that the boxes referenced by the group fit the box I/O budget (at the start of each app call)
+    def check_box_read_budget(self):
+        group = self.group
+        if not group.box_refs:
+            return
+        size = 0
+        for app_id, name in group.box_refs:
+            app = self.ledger.apps.get(app_id)
+            if app is not None:
+                size += len(app.boxes.get(name, b""))
+        if size > group.box_quota:
+            raise AVMError("box read budget ({}) exceeded {}".format(group.box_quota, size))
+
+
+# -----    Helpers     -----
+def _uint(x):
+    if type(x) is not int:
+        raise AVMError("argument is not uint64")
+    return x
+
+
+def _bytes(x):
+    if type(x) is not bytes:
+        raise AVMError("argument is not bytes")
+    return x
+
+
+def _big(x):
+    if type(x) is not bytes:
+        raise AVMError("argument is not bytes")
+    if len(x) > MAX_BYTE_MATH_INPUT:
+        raise AVMError("byte math input is longer than 64 bytes")
+    return int.from_bytes(x, 'big')
+
+
+def _to_bytes(x: int):
+    return x.to_bytes((x.bit_length() + 7) // 8, 'big')
+
+
+def _check_size(x: bytes):
+    if len(x) > MAX_STRING_SIZE:
+        raise AVMError("byte value exceeds 4096 bytes")
+    return x
+
+
+def _txn_field(ev: Evaluation, t: dict, name: str):
+    value = t.get(name)
+    if value is not None:
+        return value
+    if name == "NumAppArgs":
+        return len(t.get("ApplicationArgs", ()))
+    if name == "NumAccounts":
+        return len(t.get("Accounts", ()))
+    if name == "NumAssets":
+        return len(t.get("Assets", ()))
+    if name == "NumApplications":
+        return len(t.get("Applications", ()))
+    if name == "NumLogs":
+        return len(t.get("Logs", ()))
+    if name == "LastLog":
+        logs = t.get("Logs", ())
+        return logs[-1] if logs else b""
+    if name == "TxID":
+        return ZERO_ADDRESS
+    if name in ARRAY_FIELDS:
+        raise AVMError("{} is an array field".format(name))
+    return field_default(name)
+
+
+def _txn_array(t: dict, name: str, i: int):
+    if name == "Accounts":
+        if i == 0:
+            return t["Sender"]
+        i -= 1
+    elif name == "Applications":
+        if i == 0:
+            return t.get("ApplicationID", 0)
+        i -= 1
+    elif name not in ARRAY_FIELDS:
+        raise AVMError("{} is not an array field".format(name))
+    values = t.get(name, ())
+    if not 0 <= i < len(values):
+        raise AVMError("invalid {} index {}".format(name, i))
+    return values[i]
+
+
+def _group_txn(ev: Evaluation, i: int):
+    if type(i) is not int or i >= len(ev.txns):
+        raise AVMError("transaction index {} out of group".format(i))
+    return ev.txns[i]
+
+
+def _last_itxn(ev: Evaluation, i: int = -1):
+    if not ev.last_itxns:
+        raise AVMError("no inner transaction available")
+    if i >= len(ev.last_itxns):
+        raise AVMError("inner transaction index {} out of group".format(i))
+    return ev.last_itxns[i]
+
+
+# -----    Opcodes     -----
+def _err(ev, imm):
+    raise AVMError("err opcode executed")
+
+
+def _sha256(ev, imm):
+    ev.stack[-1] = hashlib.sha256(_bytes(ev.stack[-1])).digest()
+
+
+def _sha512_256(ev, imm):
+    ev.stack[-1] = SHA512.new(_bytes(ev.stack[-1]), truncate="256").digest()
+
+
+def _keccak256(ev, imm):
+    ev.stack[-1] = keccak.new(data=_bytes(ev.stack[-1]), digest_bits=256).digest()
+
+
+def _sha3_256(ev, imm):
+    ev.stack[-1] = hashlib.sha3_256(_bytes(ev.stack[-1])).digest()
+
+
+def _add(ev, imm):
+    s = ev.stack
+    b = s.pop()
+    a = s[-1]
+    if type(a) is not int or type(b) is not int:
+        raise AVMError("+ arg is not uint64")
+    c = a + b
+    if c > MAX_UINT64:
+        raise AVMError("+ overflowed")
+    s[-1] = c
+
+
+def _sub(ev, imm):
+    s = ev.stack
+    b = s.pop()
+    a = s[-1]
+    if type(a) is not int or type(b) is not int:
+        raise AVMError("- arg is not uint64")
+    if b > a:
+        raise AVMError("- would result negative")
+    s[-1] = a - b
+
+
+def _div(ev, imm):
+    s = ev.stack
+    b = _uint(s.pop())
+    a = _uint(s[-1])
+    if b == 0:
+        raise AVMError("/ 0")
+    s[-1] = a // b
+
+
+def _mul(ev, imm):
+    s = ev.stack
+    b = _uint(s.pop())
+    a = _uint(s[-1])
+    c = a * b
+    if c > MAX_UINT64:
+        raise AVMError("* overflowed")
+    s[-1] = c
+
+
+def _mod(ev, imm):
+    s = ev.stack
+    b = _uint(s.pop())
+    a = _uint(s[-1])
+    if b == 0:
+        raise AVMError("% 0")
+    s[-1] = a % b
+
+
+def _compare(op):
+    def handler(ev, imm):
+        s = ev.stack
+        b = s.pop()
+        a = s[-1]
+        if type(a) is not int or type(b) is not int:
+            raise AVMError("comparison arg is not uint64")
+        s[-1] = 1 if op(a, b) else 0
+    return handler
+
+
+def _logic(op):
+    def handler(ev, imm):
+        s = ev.stack
+        b = _uint(s.pop())
+        s[-1] = 1 if op(_uint(s[-1]), b) else 0
+    return handler
+
+
+def _eq(ev, imm):
+    s = ev.stack
+    b = s.pop()
+    a = s[-1]
+    if type(a) is not type(b):
+        raise AVMError("cannot compare uint64 to bytes")
+    s[-1] = 1 if a == b else 0
+
+
+def _neq(ev, imm):
+    s = ev.stack
+    b = s.pop()
+    a = s[-1]
+    if type(a) is not type(b):
+        raise AVMError("cannot compare uint64 to bytes")
+    s[-1] = 1 if a != b else 0
+
+
+def _not(ev, imm):
+    ev.stack[-1] = 1 if _uint(ev.stack[-1]) == 0 else 0
+
+
+def _len(ev, imm):
+    ev.stack[-1] = len(_bytes(ev.stack[-1]))
+
+
+def _itob(ev, imm):
+    ev.stack[-1] = _uint(ev.stack[-1]).to_bytes(8, 'big')
+
+
+def _btoi(ev, imm):
+    x = _bytes(ev.stack[-1])
+    if len(x) > 8:
+        raise AVMError("btoi arg too long, got {} bytes".format(len(x)))
+    ev.stack[-1] = int.from_bytes(x, 'big')
+
+
+def _bitwise(op):
+    def handler(ev, imm):
+        s = ev.stack
+        b = _uint(s.pop())
+        s[-1] = op(_uint(s[-1]), b)
+    return handler
+
+
+def _bitwise_not(ev, imm):
+    ev.stack[-1] = _uint(ev.stack[-1]) ^ MAX_UINT64
+
+
+def _mulw(ev, imm):
+    s = ev.stack
+    b = _uint(s.pop())
+    c = _uint(s.pop()) * b
+    s.append(c >> 64)
+    s.append(c & MAX_UINT64)
+
+
+def _addw(ev, imm):
+    s = ev.stack
+    b = _uint(s.pop())
+    c = _uint(s.pop()) + b
+    s.append(c >> 64)
+    s.append(c & MAX_UINT64)
+
+
+def _divmodw(ev, imm):
+    s = ev.stack
+    d_lo, d_hi, n_lo, n_hi = _uint(s.pop()), _uint(s.pop()), _uint(s.pop()), _uint(s.pop())
+    d = (d_hi << 64) | d_lo
+    if d == 0:
+        raise AVMError("/ 0")
+    q, r = divmod((n_hi << 64) | n_lo, d)
+    s.extend((q >> 64, q & MAX_UINT64, r >> 64, r & MAX_UINT64))
+
+
+def _divw(ev, imm):
+    s = ev.stack
+    c, b, a = _uint(s.pop()), _uint(s.pop()), _uint(s.pop())
+    if c == 0:
+        raise AVMError("/ 0")
+    q = ((a << 64) | b) // c
+    if q > MAX_UINT64:
+        raise AVMError("divw overflowed")
+    s.append(q)
+
+
+def _intcblock(ev, imm):
+    ev.intc = imm
+
+
+def _intc(ev, imm):
+    if imm >= len(ev.intc):
+        raise AVMError("intc {} beyond {} constants".format(imm, len(ev.intc)))
+    ev.stack.append(ev.intc[imm])
+
+
+def _bytecblock(ev, imm):
+    ev.bytec = imm
+
+
+def _bytec(ev, imm):
+    if imm >= len(ev.bytec):
+        raise AVMError("bytec {} beyond {} constants".format(imm, len(ev.bytec)))
+    ev.stack.append(ev.bytec[imm])
+
+
+def _push(ev, imm):
+    ev.stack.append(imm)
+
+
+def _push_many(ev, imm):
+    ev.stack.extend(imm)
+
+
+def _txn(ev, imm):
+    ev.stack.append(_txn_field(ev, ev.txn, imm))
+
+
+def _txna(ev, imm):
+    name, i = imm
+    ev.stack.append(_txn_array(ev.txn, name, i))
+
+
+def _txnas(ev, imm):
+    s = ev.stack
+    s[-1] = _txn_array(ev.txn, imm, _uint(s[-1]))
+
+
+def _gtxn(ev, imm):
+    t, name = imm
+    ev.stack.append(_txn_field(ev, _group_txn(ev, t), name))
+
+
+def _gtxna(ev, imm):
+    t, name, i = imm
+    ev.stack.append(_txn_array(_group_txn(ev, t), name, i))
+
+
+def _gtxnas(ev, imm):
+    t, name = imm
+    s = ev.stack
+    s[-1] = _txn_array(_group_txn(ev, t), name, _uint(s[-1]))
+
+
+def _gtxns(ev, imm):
+    s = ev.stack
+    s[-1] = _txn_field(ev, _group_txn(ev, s[-1]), imm)
+
+
+def _gtxnsa(ev, imm):
+    name, i = imm
+    s = ev.stack
+    s[-1] = _txn_array(_group_txn(ev, s[-1]), name, i)
+
+
+def _gtxnsas(ev, imm):
+    s = ev.stack
+    i = _uint(s.pop())
+    s[-1] = _txn_array(_group_txn(ev, s[-1]), imm, i)
+
+
+def _global(ev, imm):
+    ledger = ev.ledger
+    if imm == "Round":
+        value = ledger.round
+    elif imm == "CurrentApplicationAddress":
+        value = ledger.app_address(ev.app_id)
+    elif imm == "CreatorAddress":
+        value = ev.app.creator
+    elif imm == "CurrentApplicationID":
+        value = ev.app_id
+    elif imm == "GroupSize":
+        value = len(ev.txns)
+    elif imm == "MinTxnFee":
+        value = ledger.min_fee
+    elif imm == "MinBalance":
+        value = ledger.base_min_balance
+    elif imm == "MaxTxnLife":
+        value = 1000
+    elif imm == "ZeroAddress":
+        value = ZERO_ADDRESS
+    elif imm == "LogicSigVersion":
+        value = 8
+    elif imm == "LatestTimestamp":
+        value = ledger.timestamp
+    elif imm == "GroupID":
+        value = ev.txn.get("Group", ZERO_ADDRESS)
+    elif imm == "OpcodeBudget":
+        value = ev.group.budget - ev.group.spent
+    elif imm == "CallerApplicationID":
+        value = ev.caller.app_id if ev.caller is not None else 0
+    elif imm == "CallerApplicationAddress":
+        value = ledger.app_address(ev.caller.app_id) if ev.caller is not None else ZERO_ADDRESS
+    else:
+        raise AVMError("unsupported global field {}".format(imm))
+    ev.stack.append(value)
+
+
+def _load(ev, imm):
+    ev.stack.append(ev.scratch[imm])
+
+
+def _store(ev, imm):
+    ev.scratch[imm] = ev.stack.pop()
+
+
+def _loads(ev, imm):
+    s = ev.stack
+    i = _uint(s[-1])
+    if i > 255:
+        raise AVMError("invalid scratch space position {}".format(i))
+    s[-1] = ev.scratch[i]
+
+
+def _stores(ev, imm):
+    s = ev.stack
+    value = s.pop()
+    i = _uint(s.pop())
+    if i > 255:
+        raise AVMError("invalid scratch space position {}".format(i))
+    ev.scratch[i] = value
+
+
+def _gload(ev, imm):
+    t, i = imm
+    _push_gload(ev, t, i)
+
+
+def _gloads(ev, imm):
+    t = _uint(ev.stack.pop())
+    _push_gload(ev, t, imm)
+
+
+def _gloadss(ev, imm):
+    s = ev.stack
+    i = _uint(s.pop())
+    t = _uint(s.pop())
+    _push_gload(ev, t, i)
+
+
+def _push_gload(ev, t, i):
+    if t >= ev.index or ev.caller is not None:
+        raise AVMError("gload can only access earlier transactions of the group")
+    scratch = ev.group.scratch.get(t)
+    if scratch is None:
+        raise AVMError("transaction {} is not an app call".format(t))
+    ev.stack.append(scratch[i])
+
+
+def _gaid(ev, imm):
+    _push_gaid(ev, imm)
+
+
+def _gaids(ev, imm):
+    _push_gaid(ev, _uint(ev.stack.pop()))
+
+
+def _push_gaid(ev, t):
+    if t >= ev.index or ev.caller is not None:
+        raise AVMError("gaid can only access earlier transactions of the group")
+    created = ev.txns[t].get("CreatedApplicationID") or ev.txns[t].get("CreatedAssetID")
+    if not created:
+        raise AVMError("transaction {} did not create an app or asset".format(t))
+    ev.stack.append(created)
+
+
+def _bnz(ev, imm):
+    if _uint(ev.stack.pop()) != 0:
+        return imm
+
+
+def _bz(ev, imm):
+    if _uint(ev.stack.pop()) == 0:
+        return imm
+
+
+def _b(ev, imm):
+    return imm
+
+
+def _return(ev, imm):
+    s = ev.stack
+    value = s.pop()
+    s.clear()
+    s.append(value)
+    return -1
+
+
+def _assert(ev, imm):
+    if _uint(ev.stack.pop()) == 0:
+        raise AVMError("assert failed")
+
+
+def _bury(ev, imm):
+    s = ev.stack
+    if imm == 0 or imm >= len(s):
+        raise AVMError("bury {} beyond the stack".format(imm))
+    s[-1 - imm] = s.pop()
+
+
+def _popn(ev, imm):
+    s = ev.stack
+    if imm > len(s):
+        raise AVMError("popn {} beyond the stack".format(imm))
+    if imm:
+        del s[-imm:]
+
+
+def _dupn(ev, imm):
+    s = ev.stack
+    s.extend([s[-1]] * imm)
+
+
+def _pop(ev, imm):
+    ev.stack.pop()
+
+
+def _dup(ev, imm):
+    ev.stack.append(ev.stack[-1])
+
+
+def _dup2(ev, imm):
+    s = ev.stack
+    if len(s) < 2:
+        raise AVMError("dup2 expects 2 values")
+    s.extend(s[-2:])
+
+
+def _dig(ev, imm):
+    s = ev.stack
+    if imm >= len(s):
+        raise AVMError("dig {} beyond the stack".format(imm))
+    s.append(s[-1 - imm])
+
+
+def _swap(ev, imm):
+    s = ev.stack
+    s[-1], s[-2] = s[-2], s[-1]
+
+
+def _select(ev, imm):
+    s = ev.stack
+    c = _uint(s.pop())
+    b = s.pop()
+    if c != 0:
+        s[-1] = b
+
+
+def _cover(ev, imm):
+    s = ev.stack
+    if imm >= len(s):
+        raise AVMError("cover {} beyond the stack".format(imm))
+    s.insert(len(s) - 1 - imm, s.pop())
+
+
+def _uncover(ev, imm):
+    s = ev.stack
+    if imm >= len(s):
+        raise AVMError("uncover {} beyond the stack".format(imm))
+    s.append(s.pop(len(s) - 1 - imm))
+
+
+def _concat(ev, imm):
+    s = ev.stack
+    b = _bytes(s.pop())
+    s[-1] = _check_size(_bytes(s[-1]) + b)
+
+
+def _extract_range(x: bytes, start: int, length: int):
+    if start + length > len(x):
+        raise AVMError("extraction end {} is beyond length: {}".format(start + length, len(x)))
+    return x[start:start + length]
+
+
+def _substring(ev, imm):
+    start, end = imm
+    x = _bytes(ev.stack[-1])
+    if end < start or end > len(x):
+        raise AVMError("substring range beyond length of string")
+    ev.stack[-1] = x[start:end]
+
+
+def _substring3(ev, imm):
+    s = ev.stack
+    end, start = _uint(s.pop()), _uint(s.pop())
+    x = _bytes(s[-1])
+    if end < start or end > len(x):
+        raise AVMError("substring range beyond length of string")
+    s[-1] = x[start:end]
+
+
+def _extract(ev, imm):
+    start, length = imm
+    x = _bytes(ev.stack[-1])
+    if length == 0:
+        if start > len(x):
+            raise AVMError("extraction start {} is beyond length: {}".format(start, len(x)))
+        ev.stack[-1] = x[start:]
+    else:
+        ev.stack[-1] = _extract_range(x, start, length)
+
+
+def _extract3(ev, imm):
+    s = ev.stack
+    length, start = _uint(s.pop()), _uint(s.pop())
+    s[-1] = _extract_range(_bytes(s[-1]), start, length)
+
+
+def _extract_uint(size):
+    def handler(ev, imm):
+        s = ev.stack
+        start = _uint(s.pop())
+        s[-1] = int.from_bytes(_extract_range(_bytes(s[-1]), start, size), 'big')
+    return handler
+
+
+def _getbit(ev, imm):
+    s = ev.stack
+    i = _uint(s.pop())
+    x = s[-1]
+    if type(x) is int:
+        if i > 63:
+            raise AVMError("getbit index {} beyond 64 bits".format(i))
+        s[-1] = (x >> i) & 1
+    else:
+        if i >= 8 * len(x):
+            raise AVMError("getbit index {} beyond byteslice".format(i))
+        s[-1] = (x[i // 8] >> (7 - i % 8)) & 1
+
+
+def _setbit(ev, imm):
+    s = ev.stack
+    bit, i = _uint(s.pop()), _uint(s.pop())
+    if bit > 1:
+        raise AVMError("setbit value {} > 1".format(bit))
+    x = s[-1]
+    if type(x) is int:
+        if i > 63:
+            raise AVMError("setbit index {} beyond 64 bits".format(i))
+        s[-1] = (x | (1 << i)) if bit else (x & ~(1 << i))
+    else:
+        if i >= 8 * len(x):
+            raise AVMError("setbit index {} beyond byteslice".format(i))
+        y = bytearray(x)
+        mask = 1 << (7 - i % 8)
+        y[i // 8] = (y[i // 8] | mask) if bit else (y[i // 8] & ~mask)
+        s[-1] = bytes(y)
+
+
+def _getbyte(ev, imm):
+    s = ev.stack
+    i = _uint(s.pop())
+    x = _bytes(s[-1])
+    if i >= len(x):
+        raise AVMError("getbyte index {} beyond length {}".format(i, len(x)))
+    s[-1] = x[i]
+
+
+def _setbyte(ev, imm):
+    s = ev.stack
+    value, i = _uint(s.pop()), _uint(s.pop())
+    x = _bytes(s[-1])
+    if i >= len(x):
+        raise AVMError("setbyte index {} beyond length {}".format(i, len(x)))
+    if value > 255:
+        raise AVMError("setbyte value {} > 255".format(value))
+    s[-1] = x[:i] + bytes([value]) + x[i + 1:]
+
+
+def _replace(x: bytes, start: int, y: bytes):
+    if start + len(y) > len(x):
+        raise AVMError("replacement end {} beyond original length {}".format(start + len(y), len(x)))
+    return x[:start] + y + x[start + len(y):]
+
+
+def _replace2(ev, imm):
+    s = ev.stack
+    y = _bytes(s.pop())
+    s[-1] = _replace(_bytes(s[-1]), imm, y)
+
+
+def _replace3(ev, imm):
+    s = ev.stack
+    y, start = _bytes(s.pop()), _uint(s.pop())
+    s[-1] = _replace(_bytes(s[-1]), start, y)
+
+
+def _balance(ev, imm):
+    s = ev.stack
+    s[-1] = ev.ledger.balances.get(ev.account(s[-1]), 0)
+
+
+def _min_balance(ev, imm):
+    s = ev.stack
+    s[-1] = ev.ledger.min_balance(ev.account(s[-1]))
+
+
+def _app_opted_in(ev, imm):
+    s = ev.stack
+    app_id = ev.application(s.pop())
+    s[-1] = 1 if (ev.account(s[-1]), app_id) in ev.ledger.local else 0
+
+
+def _key(x):
+    if type(x) is not bytes:
+        raise AVMError("key is not bytes")
+    return x
+
+
+def _app_local_get(ev, imm):
+    s = ev.stack
+    key = _key(s.pop())
+    kv = ev.ledger.local.get((ev.account(s[-1]), ev.app_id))
+    if kv is None:
+        raise AVMError("account is not opted in to app {}".format(ev.app_id))
+    s[-1] = kv.get(key, 0)
+
+
+def _app_local_get_ex(ev, imm):
+    s = ev.stack
+    key = _key(s.pop())
+    app_id = ev.application(s.pop())
+    kv = ev.ledger.local.get((ev.account(s[-1]), app_id))
+    value = kv.get(key) if kv is not None else None
+    s[-1] = value if value is not None else 0
+    s.append(0 if value is None else 1)
+
+
+def _app_global_get(ev, imm):
+    s = ev.stack
+    s[-1] = ev.app.state.get(_key(s[-1]), 0)
+
+
+def _app_global_get_ex(ev, imm):
+    s = ev.stack
+    key = _key(s.pop())
+    app = ev.ledger.apps.get(ev.application(s[-1]))
+    value = app.state.get(key) if app is not None else None
+    s[-1] = value if value is not None else 0
+    s.append(0 if value is None else 1)
+
+
+def _check_key_value(key: bytes, value):
+    if len(key) > MAX_KEY_SIZE:
+        raise AVMError("key too long: length was {}, maximum is {}".format(len(key), MAX_KEY_SIZE))
+    if type(value) is bytes and len(key) + len(value) > MAX_KEY_VALUE_SIZE:
+        raise AVMError("key/value total too long for key {}".format(key))
+
+
+def _check_schema(kv: dict, schema):
+    uints = sum(1 for v in kv.values() if type(v) is int)
+    if uints > schema[0] or len(kv) - uints > schema[1]:
+        raise AVMError("store exceeds schema: {} integers, {} byte slices".format(uints, len(kv) - uints))
+
+
+def _put(ledger, kv: dict, key: bytes, value, schema):
+    _check_key_value(key, value)
+    old = kv.get(key)
+    ledger.set(kv, key, value)
+    if old is None or type(old) is not type(value):
+        _check_schema(kv, schema)
+
+
+def _app_local_put(ev, imm):
+    s = ev.stack
+    value = s.pop()
+    key = _key(s.pop())
+    kv = ev.ledger.local.get((ev.account(s.pop()), ev.app_id))
+    if kv is None:
+        raise AVMError("account is not opted in to app {}".format(ev.app_id))
+    _put(ev.ledger, kv, key, value, ev.app.local_schema)
+
+
+def _app_global_put(ev, imm):
+    s = ev.stack
+    value = s.pop()
+    key = _key(s.pop())
+    _put(ev.ledger, ev.app.state, key, value, ev.app.global_schema)
+
+
+def _app_local_del(ev, imm):
+    s = ev.stack
+    key = _key(s.pop())
+    kv = ev.ledger.local.get((ev.account(s.pop()), ev.app_id))
+    if kv is None:
+        raise AVMError("account is not opted in to app {}".format(ev.app_id))
+    if key in kv:
+        ev.ledger.delete(kv, key)
+
+
+def _app_global_del(ev, imm):
+    key = _key(ev.stack.pop())
+    if key in ev.app.state:
+        ev.ledger.delete(ev.app.state, key)
+
+
+def _asset_holding_get(ev, imm):
+    s = ev.stack
+    asset_id = ev.asset(s.pop())
+    amount = ev.ledger.holdings.get((ev.account(s[-1]), asset_id))
+    if amount is None:
+        s[-1] = 0
+        s.append(0)
+    else:
+        s[-1] = amount if imm == "AssetBalance" else 0
+        s.append(1)
+
+
+def _asset_params_get(ev, imm):
+    s = ev.stack
+    params = ev.ledger.assets.get(ev.asset(s[-1]))
+    if params is None:
+        s[-1] = 0
+        s.append(0)
+    else:
+        s[-1] = params[imm]
+        s.append(1)
+
+
+def _app_params_get(ev, imm):
+    s = ev.stack
+    app_id = ev.application(s[-1])
+    app = ev.ledger.apps.get(app_id)
+    if app is None:
+        s[-1] = ZERO_ADDRESS if imm in ("AppCreator", "AppAddress") else (b"" if "Program" in imm else 0)
+        s.append(0)
+        return
+    if imm == "AppAddress":
+        value = ev.ledger.app_address(app_id)
+    elif imm == "AppCreator":
+        value = app.creator
+    elif imm == "AppGlobalNumUint":
+        value = app.global_schema[0]
+    elif imm == "AppGlobalNumByteSlice":
+        value = app.global_schema[1]
+    elif imm == "AppLocalNumUint":
+        value = app.local_schema[0]
+    elif imm == "AppLocalNumByteSlice":
+        value = app.local_schema[1]
+    elif imm == "AppExtraProgramPages":
+        value = app.extra_pages
+    elif imm == "AppApprovalProgram":
+        value = app.approval_bytecode
+    else:
+        value = app.clear_bytecode
+    s[-1] = value
+    s.append(1)
+
+
+def _acct_params_get(ev, imm):
+    s = ev.stack
+    ledger = ev.ledger
+    address = ev.account(s[-1])
+    balance = ledger.balances.get(address, 0)
+    if imm == "AcctBalance":
+        value = balance
+    elif imm == "AcctMinBalance":
+        value = ledger.min_balance(address)
+    elif imm == "AcctAuthAddr":
+        value = ZERO_ADDRESS
+    else:
+        raise AVMError("unsupported account field {}".format(imm))
+    s[-1] = value
+    s.append(1 if balance > 0 else 0)
+
+
+def _pushbytes(ev, imm):
+    ev.stack.append(imm)
+
+
+def _callsub(ev, imm):
+    target, ret = imm
+    if len(ev.frames) >= MAX_STACK_DEPTH:
+        raise AVMError("callsub depth exceeded")
+    ev.frames.append([ret, len(ev.stack), -1, -1])
+    return target
+
+
+def _retsub(ev, imm):
+    if not ev.frames:
+        raise AVMError("retsub with empty callstack")
+    ret, height, args, returns = ev.frames.pop()
+    s = ev.stack
+    if args >= 0:
+        # Frame of proto: remove the arguments and locals, keeping the return values
+        if len(s) < height + returns:
+            raise AVMError("retsub executed with stack below frame. Did you pop args?")
+        values = s[len(s) - returns:] if returns else []
+        del s[height - args:]
+        s.extend(values)
+    return ret
+
+
+def _proto(ev, imm):
+    if not ev.frames:
+        raise AVMError("proto was executed without a callsub")
+    frame = ev.frames[-1]
+    args, returns = imm
+    if frame[1] < args:
+        raise AVMError("callsub to proto that requires {} args with stack height {}".format(args, frame[1]))
+    frame[2] = args
+    frame[3] = returns
+
+
+def _frame_dig(ev, imm):
+    frame = ev.frames[-1] if ev.frames else None
+    if frame is None or frame[2] < 0:
+        raise AVMError("frame_dig with empty callstack")
+    i = frame[1] + imm
+    if i < frame[1] - frame[2] or i >= len(ev.stack):
+        raise AVMError("frame_dig {} out of frame".format(imm))
+    ev.stack.append(ev.stack[i])
+
+
+def _frame_bury(ev, imm):
+    frame = ev.frames[-1] if ev.frames else None
+    if frame is None or frame[2] < 0:
+        raise AVMError("frame_bury with empty callstack")
+    s = ev.stack
+    value = s.pop()
+    i = frame[1] + imm
+    if i < frame[1] - frame[2] or i >= len(s):
+        raise AVMError("frame_bury {} out of frame".format(imm))
+    s[i] = value
+
+
+def _switch(ev, imm):
+    i = _uint(ev.stack.pop())
+    if i < len(imm):
+        return imm[i]
+
+
+def _match(ev, imm):
+    s = ev.stack
+    n = len(imm)
+    if len(s) < n + 1:
+        raise AVMError("match expects {} values".format(n + 1))
+    x = s.pop()
+    values = s[len(s) - n:]
+    del s[len(s) - n:]
+    for i, value in enumerate(values):
+        if type(value) is type(x) and value == x:
+            return imm[i]
+
+
+def _shl(ev, imm):
+    s = ev.stack
+    b = _uint(s.pop())
+    if b > 63:
+        raise AVMError("shl arg too big, ({} > 63)".format(b))
+    s[-1] = (_uint(s[-1]) << b) & MAX_UINT64
+
+
+def _shr(ev, imm):
+    s = ev.stack
+    b = _uint(s.pop())
+    if b > 63:
+        raise AVMError("shr arg too big, ({} > 63)".format(b))
+    s[-1] = _uint(s[-1]) >> b
+
+
+def _sqrt(ev, imm):
+    ev.stack[-1] = math.isqrt(_uint(ev.stack[-1]))
+
+
+def _bitlen(ev, imm):
+    x = ev.stack[-1]
+    ev.stack[-1] = x.bit_length() if type(x) is int else int.from_bytes(x, 'big').bit_length()
+
+
+def _exp(ev, imm):
+    s = ev.stack
+    b = _uint(s.pop())
+    a = _uint(s[-1])
+    if a == 0 and b == 0:
+        raise AVMError("0^0 is undefined")
+    if a > 1 and b > 63 or a > 1 and a ** b > MAX_UINT64:
+        raise AVMError("{}^{} overflow".format(a, b))
+    s[-1] = a ** b
+
+
+def _bsqrt(ev, imm):
+    ev.stack[-1] = _to_bytes(math.isqrt(_big(ev.stack[-1])))
+
+
+def _bmath(op):
+    def handler(ev, imm):
+        s = ev.stack
+        b = _big(s.pop())
+        s[-1] = _to_bytes(op(_big(s[-1]), b))
+    return handler
+
+
+def _bsub(ev, imm):
+    s = ev.stack
+    b = _big(s.pop())
+    a = _big(s[-1])
+    if b > a:
+        raise AVMError("byte math would have negative result")
+    s[-1] = _to_bytes(a - b)
+
+
+def _bdiv(ev, imm):
+    s = ev.stack
+    b = _big(s.pop())
+    if b == 0:
+        raise AVMError("division by zero")
+    s[-1] = _to_bytes(_big(s[-1]) // b)
+
+
+def _bmod(ev, imm):
+    s = ev.stack
+    b = _big(s.pop())
+    if b == 0:
+        raise AVMError("modulo by zero")
+    s[-1] = _to_bytes(_big(s[-1]) % b)
+
+
+def _bcompare(op):
+    def handler(ev, imm):
+        s = ev.stack
+        b = _big(s.pop())
+        s[-1] = 1 if op(_big(s[-1]), b) else 0
+    return handler
+
+
+def _bbitwise(op):
+    def handler(ev, imm):
+        s = ev.stack
+        b = _bytes(s.pop())
+        a = _bytes(s[-1])
+        n = max(len(a), len(b))
+        s[-1] = op(int.from_bytes(a, 'big'), int.from_bytes(b, 'big')).to_bytes(n, 'big')
+    return handler
+
+
+def _bnot(ev, imm):
+    x = _bytes(ev.stack[-1])
+    ev.stack[-1] = bytes(255 - c for c in x)
+
+
+def _bzero(ev, imm):
+    n = _uint(ev.stack[-1])
+    if n > MAX_STRING_SIZE:
+        raise AVMError("bzero attempted to create a too large string")
+    ev.stack[-1] = bytes(n)
+
+
+def _log(ev, imm):
+    x = _bytes(ev.stack.pop())
+    ev.logs.append(x)
+    if len(ev.logs) > MAX_LOGS:
+        raise AVMError("too many log calls in program. up to {} is allowed".format(MAX_LOGS))
+    if sum(len(log) for log in ev.logs) > MAX_LOG_SIZE:
+        raise AVMError("program logs too large. {} bytes >  {} bytes limit".format(
+            sum(len(log) for log in ev.logs), MAX_LOG_SIZE))
+
+
+# -----    Inner transactions     -----
+def _new_itxn(ev):
+    credit = ev.group.fee_credit
+    fee = ev.ledger.min_fee
+    return {"Sender": ev.ledger.app_address(ev.app_id), "Fee": max(0, fee - max(0, credit)), "Type": b"",
+            "TypeEnum": 0}
+
+
+def _itxn_begin(ev, imm):
+    if ev.itxns is not None:
+        raise AVMError("itxn_begin without itxn_submit")
+    ev.itxns = [_new_itxn(ev)]
+
+
+def _itxn_next(ev, imm):
+    if ev.itxns is None:
+        raise AVMError("itxn_next without itxn_begin")
+    ev.itxns.append(_new_itxn(ev))
+
+
+def _itxn_field(ev, imm):
+    if ev.itxns is None:
+        raise AVMError("itxn_field without itxn_begin")
+    t = ev.itxns[-1]
+    value = ev.stack.pop()
+    if imm in ADDRESS_FIELDS:
+        if type(value) is not bytes or len(value) != 32:
+            raise AVMError("{} is not an address".format(imm))
+        if imm == "Sender":
+            if value != ev.ledger.app_address(ev.app_id):
+                raise AVMError("unauthorized Sender")
+        elif imm != "RekeyTo" and value != ZERO_ADDRESS:
+            ev.account(value)
+        t[imm] = value
+    elif imm == "Type":
+        if _bytes(value) not in TYPE_ENUMS:
+            raise AVMError("{} is not a valid Type for itxn_field".format(value))
+        t["Type"] = value
+        t["TypeEnum"] = TYPE_ENUMS[value]
+    elif imm == "TypeEnum":
+        if _uint(value) not in TYPE_NAMES:
+            raise AVMError("{} is not a valid TypeEnum for itxn_field".format(value))
+        t["Type"] = TYPE_NAMES[value]
+        t["TypeEnum"] = value
+    elif imm == "ApplicationArgs":
+        args = t.setdefault("ApplicationArgs", [])
+        args.append(_bytes(value))
+        if len(args) > MAX_APP_ARGS:
+            raise AVMError("too many application args")
+    elif imm == "Accounts":
+        if type(value) is not bytes or len(value) != 32:
+            raise AVMError("Accounts is not an address")
+        ev.account(value)
+        t.setdefault("Accounts", []).append(value)
+    elif imm == "Assets":
+        t.setdefault("Assets", []).append(ev.asset(_uint(value)))
+    elif imm == "Applications":
+        t.setdefault("Applications", []).append(ev.application(_uint(value)))
+    elif imm == "XferAsset":
+        t[imm] = ev.asset(_uint(value))
+    elif imm == "ApplicationID":
+        t[imm] = ev.application(_uint(value)) if value != 0 else 0
+    elif imm in BYTES_FIELDS:
+        t[imm] = _bytes(value)
+    elif imm in ("ApprovalProgramPages", "ClearStateProgramPages"):
+        key = "ApprovalProgram" if imm == "ApprovalProgramPages" else "ClearStateProgram"
+        t[key] = t.get(key, b"") + _bytes(value)
+    else:
+        t[imm] = _uint(value)
+
+
+def _itxn_submit(ev, imm):
+    if ev.itxns is None:
+        raise AVMError("itxn_submit without itxn_begin")
+    if ev.depth >= MAX_CALL_DEPTH - 1:
+        raise AVMError("appl depth ({}) exceeded".format(MAX_CALL_DEPTH))
+    itxns, ev.itxns = ev.itxns, None
+    ev.last_itxns = ev.ledger.submit_inner(ev, itxns)
+
+
+def _itxn(ev, imm):
+    ev.stack.append(_txn_field(ev, _last_itxn(ev), imm))
+
+
+def _itxna(ev, imm):
+    name, i = imm
+    ev.stack.append(_txn_array(_last_itxn(ev), name, i))
+
+
+def _itxnas(ev, imm):
+    s = ev.stack
+    s[-1] = _txn_array(_last_itxn(ev), imm, _uint(s[-1]))
+
+
+def _gitxn(ev, imm):
+    t, name = imm
+    ev.stack.append(_txn_field(ev, _last_itxn(ev, t), name))
+
+
+def _gitxna(ev, imm):
+    t, name, i = imm
+    ev.stack.append(_txn_array(_last_itxn(ev, t), name, i))
+
+
+def _gitxnas(ev, imm):
+    t, name = imm
+    s = ev.stack
+    s[-1] = _txn_array(_last_itxn(ev, t), name, _uint(s[-1]))
+
+
+# -----    Boxes     -----
+def _box_create(ev, imm):
+    s = ev.stack
+    size = _uint(s.pop())
+    name = ev.box(s[-1])
+    if size > MAX_BOX_SIZE:
+        raise AVMError("box size too large: {}, max {}".format(size, MAX_BOX_SIZE))
+    boxes = ev.app.boxes
+    if name in boxes:
+        if len(boxes[name]) != size:
+            raise AVMError("box size mismatch {} {}".format(len(boxes[name]), size))
+        s[-1] = 0
+        return
+    ev.write_box(name, size)
+    ev.ledger.put_box(ev.app, name, bytes(size))
+    s[-1] = 1
+
+
+def _box_extract(ev, imm):
+    s = ev.stack
+    length, start = _uint(s.pop()), _uint(s.pop())
+    name = ev.box(s[-1])
+    value = ev.app.boxes.get(name)
+    if value is None:
+        raise AVMError("no such box {}".format(name.hex()))
+    if start + length > len(value):
+        raise AVMError("extraction end {} is beyond length: {}".format(start + length, len(value)))
+    s[-1] = value[start:start + length]
+
+
+def _box_replace(ev, imm):
+    s = ev.stack
+    y, start = _bytes(s.pop()), _uint(s.pop())
+    name = ev.box(s.pop())
+    value = ev.app.boxes.get(name)
+    if value is None:
+        raise AVMError("no such box {}".format(name.hex()))
+    ev.write_box(name, len(value))
+    ev.ledger.put_box(ev.app, name, _replace(value, start, y))
+
+
+def _box_del(ev, imm):
+    s = ev.stack
+    name = ev.box(s[-1])
+    if name in ev.app.boxes:
+        ev.write_box(name, 0)
+        ev.ledger.delete_box(ev.app, name)
+        s[-1] = 1
+    else:
+        s[-1] = 0
+
+
+def _box_len(ev, imm):
+    s = ev.stack
+    value = ev.app.boxes.get(ev.box(s[-1]))
+    s[-1] = len(value) if value is not None else 0
+    s.append(0 if value is None else 1)
+
+
+def _box_get(ev, imm):
+    s = ev.stack
+    value = ev.app.boxes.get(ev.box(s[-1]))
+    s[-1] = value if value is not None else b""
+    s.append(0 if value is None else 1)
+
+
+def _box_put(ev, imm):
+    s = ev.stack
+    value = _bytes(s.pop())
+    name = ev.box(s.pop())
+    old = ev.app.boxes.get(name)
+    if old is not None and len(old) != len(value):
+        raise AVMError("attempt to box_put wrong size {} != {}".format(len(old), len(value)))
+    if len(value) > MAX_BOX_SIZE:
+        raise AVMError("box size too large: {}, max {}".format(len(value), MAX_BOX_SIZE))
+    ev.write_box(name, len(value))
+    ev.ledger.put_box(ev.app, name, value)
+
+
+# Ops whose handlers can evaluate other programs or read the pooled budget
+_SYNC_OPS = {"itxn_submit"}
+
+_HANDLERS = {
+    "err": _err, "sha256": _sha256, "keccak256": _keccak256, "sha512_256": _sha512_256, "sha3_256": _sha3_256,
+    "+": _add, "-": _sub, "/": _div, "*": _mul, "%": _mod,
+    "<": _compare(lambda a, b: a < b), ">": _compare(lambda a, b: a > b),
+    "<=": _compare(lambda a, b: a <= b), ">=": _compare(lambda a, b: a >= b),
+    "&&": _logic(lambda a, b: a and b), "||": _logic(lambda a, b: a or b), "==": _eq, "!=": _neq, "!": _not,
+    "len": _len, "itob": _itob, "btoi": _btoi,
+    "|": _bitwise(lambda a, b: a | b), "&": _bitwise(lambda a, b: a & b), "^": _bitwise(lambda a, b: a ^ b),
+    "~": _bitwise_not, "mulw": _mulw, "addw": _addw, "divmodw": _divmodw, "divw": _divw,
+    "intcblock": _intcblock, "intc": _intc, "bytecblock": _bytecblock, "bytec": _bytec,
+    "txn": _txn, "txna": _txna, "txnas": _txnas, "gtxn": _gtxn, "gtxna": _gtxna, "gtxnas": _gtxnas,
+    "gtxns": _gtxns, "gtxnsa": _gtxnsa, "gtxnsas": _gtxnsas, "global": _global,
+    "load": _load, "store": _store, "loads": _loads, "stores": _stores, "gload": _gload, "gloads": _gloads,
+    "gloadss": _gloadss, "gaid": _gaid, "gaids": _gaids,
+    "bnz": _bnz, "bz": _bz, "b": _b, "return": _return, "assert": _assert, "bury": _bury, "popn": _popn,
+    "dupn": _dupn, "pop": _pop, "dup": _dup, "dup2": _dup2, "dig": _dig, "swap": _swap, "select": _select,
+    "cover": _cover, "uncover": _uncover,
+    "concat": _concat, "substring": _substring, "substring3": _substring3, "getbit": _getbit, "setbit": _setbit,
+    "getbyte": _getbyte, "setbyte": _setbyte, "extract": _extract, "extract3": _extract3,
+    "extract_uint16": _extract_uint(2), "extract_uint32": _extract_uint(4), "extract_uint64": _extract_uint(8),
+    "replace2": _replace2, "replace3": _replace3,
+    "balance": _balance, "app_opted_in": _app_opted_in, "app_local_get": _app_local_get,
+    "app_local_get_ex": _app_local_get_ex, "app_global_get": _app_global_get,
+    "app_global_get_ex": _app_global_get_ex, "app_local_put": _app_local_put, "app_global_put": _app_global_put,
+    "app_local_del": _app_local_del, "app_global_del": _app_global_del,
+    "asset_holding_get": _asset_holding_get, "asset_params_get": _asset_params_get,
+    "app_params_get": _app_params_get, "acct_params_get": _acct_params_get, "min_balance": _min_balance,
+    "pushbytes": _pushbytes, "pushint": _push, "pushbytess": _push_many, "pushints": _push_many,
+    "callsub": _callsub, "retsub": _retsub, "proto": _proto, "frame_dig": _frame_dig, "frame_bury": _frame_bury,
+    "switch": _switch, "match": _match,
+    "shl": _shl, "shr": _shr, "sqrt": _sqrt, "bitlen": _bitlen, "exp": _exp, "bsqrt": _bsqrt,
+    "b+": _bmath(lambda a, b: a + b), "b-": _bsub, "b/": _bdiv, "b*": _bmath(lambda a, b: a * b),
+    "b<": _bcompare(lambda a, b: a < b), "b>": _bcompare(lambda a, b: a > b),
+    "b<=": _bcompare(lambda a, b: a <= b), "b>=": _bcompare(lambda a, b: a >= b),
+    "b==": _bcompare(lambda a, b: a == b), "b!=": _bcompare(lambda a, b: a != b), "b%": _bmod,
+    "b|": _bbitwise(lambda a, b: a | b), "b&": _bbitwise(lambda a, b: a & b), "b^": _bbitwise(lambda a, b: a ^ b),
+    "b~": _bnot, "bzero": _bzero,
+    "log": _log, "itxn_begin": _itxn_begin, "itxn_field": _itxn_field, "itxn_submit": _itxn_submit,
+    "itxn": _itxn, "itxna": _itxna, "itxn_next": _itxn_next, "gitxn": _gitxn, "gitxna": _gitxna,
+    "itxnas": _itxnas, "gitxnas": _gitxnas,
+    "box_create": _box_create, "box_extract": _box_extract, "box_replace": _box_replace, "box_del": _box_del,
+    "box_len": _box_len, "box_get": _box_get, "box_put": _box_put,
+}
+
+# Opcodes with constant immediates, which are decoded into the handler of their general form
+_CONSTANT_OPS = {
+    "intc_0": ("intc", 0), "intc_1": ("intc", 1), "intc_2": ("intc", 2), "intc_3": ("intc", 3),
+    "bytec_0": ("bytec", 0), "bytec_1": ("bytec", 1), "bytec_2": ("bytec", 2), "bytec_3": ("bytec", 3),
+}
+
+
+def _unsupported(name):
+    def handler(ev, imm):
+        raise AVMError("opcode {} is not supported by the local evaluator".format(name))
+    return handler
+
+
+# Function returns the handler of the instruction and its immediates in the form the handler takes them
+def _instruction(name: str, values: list):
+    if name in _CONSTANT_OPS:
+        name, index = _CONSTANT_OPS[name]
+        return _HANDLERS[name], index
+    handler = _HANDLERS.get(name)
+    if handler is None:
+        return _unsupported(name), None
+    if not values:
+        return handler, None
+    if len(values) == 1:
+        return handler, values[0]
+    return handler, tuple(values)
@@ -0,0 +1,61 @@
+# -----------------           Description          -----------------
+# Benchmark of reading global state and boxes with algod.AlgodClient, which opens a new connection for each request,
+# versus with the pooled keep-alive client (util.PooledAlgodClient), against a local mock algod. Several threads read
+# concurrently, as the box reader does. Reports the throughput and the recorded latency per endpoint.
+# Run from the repository root with: python -m benchmarks.bench_algod_pool
+
+# -----------------           Imports          -----------------
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+from time import perf_counter
+
+from algosdk.v2client import algod
+
+from benchmarks.mock_algod import MockAlgod
+from util import PooledAlgodClient, read_global_state
+
+# ---------------------------------------------------------------
+
+APP_ID = 1
+
+
+def read(client, requests, threads):
+    def one(i):
+        if i % 2:
+            return read_global_state(client, APP_ID)
+        return client.application_box_by_name(APP_ID, (i % 8 + 1).to_bytes(8, 'big'))
+
+    t = perf_counter()
+    with ThreadPoolExecutor(threads) as executor:
+        results = list(executor.map(one, range(requests)))
+    return results, perf_counter() - t
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=5000)
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--latency", type=float, default=0.0, help="emulated latency per request [s]")
+    args = parser.parse_args()
+
+    mock = MockAlgod(latency=args.latency).start()
+    mock.add_compound_contract(APP_ID, list(range(1, 8 * 64 + 1)))
+    try:
+        direct, dt = read(algod.AlgodClient("", mock.address), args.requests, args.threads)
+        print("direct: {:8.1f} requests/s".format(args.requests / dt))
+
+        client = PooledAlgodClient("", mock.address, pool_size=args.threads)
+        pooled, dt = read(client, args.requests, args.threads)
+        print("pooled: {:8.1f} requests/s".format(args.requests / dt))
+        assert pooled == direct
+
+        for endpoint, (n, mean_t, max_t) in sorted(client.latency().items()):
+            print("\t{:32} {:6} requests, mean {:6.2f} ms, max {:6.2f} ms".format(
+                endpoint, n, 1000 * mean_t, 1000 * max_t))
+        client.close()
+    finally:
+        mock.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+# -----------------           Description          -----------------
+# Benchmark of preparing the programs for deployment (cfg.init_CC_programs, cfg.init_FC_programs) with a cold artifact
+# cache of the compiled contracts (src/artifact_cache.py), assembling the programs with algod's compile or offline
+# (src/teal_assembler.py), and with a warm artifact cache, against a local mock algod with emulated network latency.
+# Runs in a temporary directory, thus the repository's compiled_files are not touched.
+# Run from the repository root with: python -m benchmarks.bench_artifact_cache
+
+# -----------------           Imports          -----------------
+import argparse
+import os
+import shutil
+import tempfile
+from time import perf_counter
+
+from algosdk.v2client import algod
+
+from benchmarks.mock_algod import MockAlgod
+
+import src.config as cfg
+
+# ---------------------------------------------------------------
+
+
+def start(client, mock):
+    mock.requests.clear()
+    cfg.CC_approval_program = cfg.FC_approval_program = None
+    t = perf_counter()
+    cfg.init_CC_programs(client)
+    cfg.init_FC_programs(client)
+    return perf_counter() - t, mock.requests["/v2/teal/compile"]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--latency", type=float, default=0.05, help="emulated latency per request [s]")
+    args = parser.parse_args()
+
+    mock = MockAlgod(latency=args.latency).start()
+    client = algod.AlgodClient("", mock.address)
+    cwd = os.getcwd()
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            os.chdir(tmp)
+            os.mkdir("compiled_files")
+
+            cfg.OFFLINE_ASSEMBLY = False
+            dt, compiles = start(client, mock)
+            print("cold start, algod compile:     {:8.3f} s, {} compile requests".format(dt, compiles))
+
+            shutil.rmtree(cfg.ARTIFACT_CACHE_DIR)
+            # The mock's compile returns a stand-in bytecode, thus the offline assembly is not checked against it
+            cfg.OFFLINE_ASSEMBLY = True
+            cfg.ASSEMBLY_CROSS_CHECK = False
+            dt, compiles = start(client, mock)
+            print("cold start, offline assembly:  {:8.3f} s, {} compile requests".format(dt, compiles))
+            cold = [cfg.CC_approval_program, cfg.CC_clear_state_program, cfg.CC_ExtraProgramPages,
+                    cfg.FC_approval_program, cfg.FC_clear_state_program, cfg.FC_ExtraProgramPages]
+
+            dt, compiles = start(client, mock)
+            print("warm start:                    {:8.3f} s, {} compile requests".format(dt, compiles))
+            assert cold == [cfg.CC_approval_program, cfg.CC_clear_state_program, cfg.CC_ExtraProgramPages,
+                            cfg.FC_approval_program, cfg.FC_clear_state_program, cfg.FC_ExtraProgramPages]
+    finally:
+        os.chdir(cwd)
+        mock.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+# -----------------           Description          -----------------
+# Benchmark of deleting all boxes of the compound and farm compound contracts on the local ledger
+# (benchmarks/local_ledger.py): with a fixed number of boxes per delete_boxes call (7, as the demo used to) versus with
+# the groups planned from the measured opcode cost of the calls (demo/batch_planner.py).
+# The contract is given the boxes directly, after the pool has ended. Each group is evaluated in its own round, since
+# the calls can only delete the boxes from the last one down. Reports the groups (i.e. rounds), calls and the opcode
+# cost used out of the pooled budget, and checks that all boxes have been deleted.
+# Run from the repository root with: python -m benchmarks.bench_box_deletion [--boxes N]
+
+# -----------------           Imports          -----------------
+import argparse
+
+from algosdk.atomic_transaction_composer import AtomicTransactionComposer, AccountTransactionSigner
+
+from benchmarks.contract_deployment import Deployment, STAKE
+from benchmarks.local_ledger import LocalLedger
+from demo.batch_planner import plan_box_deletion
+
+import src.config as cfg
+
+# ---------------------------------------------------------------
+
+# Number of boxes per call the demo used to delete
+FIXED_BOXES_PER_CALL = 7
+
+
+# Function returns the groups of delete_boxes calls, with a fixed number of boxes per call
+def plan_fixed(boxes: int, per_call: int = FIXED_BOXES_PER_CALL):
+    groups = []
+    while boxes > 0:
+        group = []
+        while len(group) < cfg.MAX_GROUP_SIZE and boxes > 0:
+            down_to = max(boxes - per_call, 0)
+            group.append((down_to, list(range(boxes, down_to, -1))))
+            boxes = down_to
+        groups.append(group)
+    return groups
+
+
+def run(farm: bool, boxes: int, name: str, groups: list):
+    ledger = LocalLedger()
+    d = Deployment(ledger, farm, 100, STAKE // 10)
+    ledger.advance(d.state()["PER"] - ledger.round + 1)
+
+    # Full boxes of increases
+    box_size = cfg.BOX_INCREMENTS * cfg.LOCAL_STAKE_SIZE
+    ledger.fund(d.address, boxes * 1_000_000)
+    ledger.set_app_state(d.app_id, {b"NB": boxes * cfg.BOX_INCREMENTS},
+                         {box.to_bytes(cfg.BOX_NAME_SIZE, 'big'): bytes(box_size) for box in range(1, boxes + 1)})
+
+    signer = AccountTransactionSigner(d.creator_sk)
+    calls = cost = budget = 0
+    for group in groups:
+        atc = AtomicTransactionComposer()
+        for down_to, refs in group:
+            d.method_call(atc, d.creator, signer, d.params(ledger.min_fee), "delete_boxes", [down_to],
+                          foreign_assets=None, foreign_apps=None, accounts=None,
+                          boxes=[(0, box.to_bytes(cfg.BOX_NAME_SIZE, 'big')) for box in refs])
+        d.execute(atc, "delete_boxes")
+        calls += len(group)
+        cost += sum(t["Cost"] for t in ledger.last_group)
+        budget += cfg.APP_CALL_BUDGET * len(group)
+        ledger.advance()
+
+    assert not ledger.apps[d.app_id].boxes, "{} boxes have not been deleted".format(len(ledger.apps[d.app_id].boxes))
+    assert d.state()["NB"] == 0
+    print("{}, {:<24} {:4d} groups (rounds), {:5d} calls, {:6d} opcode cost out of {:6d} budget ({:.1f} per box)".format(
+        "FC" if farm else "CC", name + ":", len(groups), calls, cost, budget, cost / boxes))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--boxes", type=int, default=500)
+    args = parser.parse_args()
+
+    for farm in (False, True):
+        run(farm, args.boxes, "{} boxes per call".format(FIXED_BOXES_PER_CALL), plan_fixed(args.boxes))
+        run(farm, args.boxes, "planned", plan_box_deletion(args.boxes))
+
+
+if __name__ == "__main__":
+    main()
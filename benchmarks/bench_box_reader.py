@@ -0,0 +1,58 @@
+# -----------------           Description          -----------------
+# Benchmark of reading the compounding boxes: one request after another (as done originally) versus the batched box
+# reader, against a local mock algod with emulated network latency.
+# Run from the repository root with: python -m benchmarks.bench_box_reader
+
+# -----------------           Imports          -----------------
+import argparse
+import random
+from time import perf_counter
+
+from algosdk.v2client import algod
+
+from benchmarks.mock_algod import MockAlgod
+from demo.box_reader import fetch_box, list_box_numbers, split_box, stream_indexes
+
+# ---------------------------------------------------------------
+
+
+def sequential_read(client, app_id, boxes):
+    return [int.from_bytes(value, 'big') for box in boxes for _, value in split_box(box, fetch_box(client, app_id, box))]
+
+
+def batched_read(client, app_id, boxes, workers):
+    return [inc for _, inc in stream_indexes(client, app_id, boxes, workers)]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--increases", type=int, default=100_000)
+    parser.add_argument("--latency", type=float, default=0.005, help="emulated latency per request [s]")
+    parser.add_argument("--workers", type=int, nargs="+", default=[4, 16, 32])
+    args = parser.parse_args()
+
+    app_id = 1
+    increments = [(1 << 64) + random.getrandbits(48) for _ in range(args.increases)]
+    mock = MockAlgod(latency=args.latency).start()
+    mock.add_compound_contract(app_id, increments)
+    client = algod.AlgodClient("", mock.address)
+
+    try:
+        boxes = list_box_numbers(client, app_id)
+
+        t = perf_counter()
+        assert sequential_read(client, app_id, boxes) == increments
+        dt = perf_counter() - t
+        print("sequential          : {:10.1f} increases/s".format(len(increments) / dt))
+
+        for workers in args.workers:
+            t = perf_counter()
+            assert batched_read(client, app_id, boxes, workers) == increments
+            dt = perf_counter() - t
+            print("batched, {:3d} workers: {:10.1f} increases/s".format(workers, len(increments) / dt))
+    finally:
+        mock.stop()
+
+
+if __name__ == "__main__":
+    main()
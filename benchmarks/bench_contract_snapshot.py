@@ -0,0 +1,74 @@
+# -----------------           Description          -----------------
+# Benchmark of the reads of the user screen of the state machine: one after another (as done originally, i.e. global
+# state, trigger round, local state, projected stake and asset holding) versus the concurrent ContractSnapshot
+# (demo/contract_snapshot.py), against a local mock algod with emulated network latency. Checks that both show the same.
+# Run from the repository root with: python -m benchmarks.bench_contract_snapshot
+
+# -----------------           Imports          -----------------
+import argparse
+from time import perf_counter
+
+from algosdk import account
+from algosdk.logic import get_application_address
+
+from benchmarks.mock_algod import MockAlgod
+from demo.contract_snapshot import takeContractSnapshot
+from demo.interact_w_CompoundContract import getTriggerRound, getUsersCompoundStake
+from util import PooledAlgodClient, read_global_state, read_local_state
+
+import src.config as cfg
+
+# ---------------------------------------------------------------
+
+APP_ID = 1
+ASA_ID = 2
+
+
+# Reads of the user screen one after another
+def serial_screen(client, user_address):
+    state = read_global_state(client, APP_ID)
+    trigger_round = getTriggerRound(client, APP_ID)
+    local_state = read_local_state(client, user_address, APP_ID)
+    stake = getUsersCompoundStake(client, user_address, APP_ID)
+    asset_amount = client.account_asset_info(user_address, ASA_ID)['asset-holding']['amount']
+    return state["NB"] - local_state["LNB"], trigger_round, stake, asset_amount
+
+
+def snapshot_screen(client, user_address):
+    snapshot = takeContractSnapshot(client, user_address, APP_ID, ASA_ID)
+    return snapshot.unclaimed_increases, snapshot.trigger_round, snapshot.stake, snapshot.asset_amount
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--screens", type=int, default=50)
+    parser.add_argument("--latency", type=float, default=0.02, help="emulated latency per request [s]")
+    args = parser.parse_args()
+
+    mock = MockAlgod(latency=args.latency).start()
+    # Cumulative indices growing by 0.1 % per increase
+    indexes = [(1 << 64) * 1001 ** i // 1000 ** i for i in range(1, 301)]
+    mock.add_compound_contract(APP_ID, indexes)
+    mock.global_state[APP_ID].update({"SC_ID": 3, "AC_ID": 4, "S_ASA_ID": ASA_ID, "PSR": 1, "PER": 10 ** 6, "LCR": 1})
+    _, user_address = account.generate_account()
+    mock.local_state[(user_address, APP_ID)] = {"LNB": 100, "LS": (1000 << 64).to_bytes(16, 'big')}
+    mock.accounts[get_application_address(APP_ID)] = (100_000 + 10 * cfg.CC_FEE_FOR_COMPOUND, 100_000)
+    mock.asset_holdings[(user_address, ASA_ID)] = 5000
+    client = PooledAlgodClient("", mock.address)
+    try:
+        for name, screen in (("serial", serial_screen), ("snapshot", snapshot_screen)):
+            mock.requests.clear()
+            t = perf_counter()
+            shown = [screen(client, user_address) for _ in range(args.screens)]
+            dt = perf_counter() - t
+            print("{:8}: {:7.1f} ms per screen, {:.1f} requests per screen - {}".format(
+                name, 1000 * dt / args.screens, sum(mock.requests.values()) / args.screens, shown[0]))
+            if name == "serial":
+                expected = shown
+        assert shown == expected
+    finally:
+        mock.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+# -----------------           Description          -----------------
+# Property checks and benchmark of the exact integer emulation of the contract's fixed-point arithmetic
+# (src/fixed_point.py):
+#  - checks against a reference that evaluates the contract expressions literally on big-endian byte strings and
+#    against an exact Decimal reference truncating as the contract does (both must be bit-exact),
+#  - compares the local claim from the cumulative indices (one claim for any number of compoundings) with claiming the
+#    increases one by one, as the contract did before recording the indices, and with the Decimal path originally used
+#    for the off-chain stake estimate (reports the differences and speed).
+# The references are shared with tests/test_fixed_point.py (tests/fixed_point_ref.py), which checks the same properties
+# on fewer compoundings.
+# Run from the repository root with: python -m benchmarks.bench_fixed_point [--increments N]
+
+# -----------------           Imports          -----------------
+import argparse
+import random
+from time import perf_counter
+
+import src.fixed_point as fp
+from tests.fixed_point_ref import decimal_local_claim, sequential_local_claim, random_compounding, check_bit_exact
+
+# ---------------------------------------------------------------
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--increments", type=int, default=1_000_000)
+    parser.add_argument("--chain", type=int, default=1_000, help="number of increments claimed by one user")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    rng = random.Random(args.seed)
+
+    check_bit_exact(rng, min(args.increments, 100_000))
+
+    # Chains of increments claimed by one user at once (as in getUsersCompoundStake), with their cumulative indices
+    chains = []
+    for _ in range(max(args.increments // args.chain, 1)):
+        ls = fp.to_fixed(rng.randint(1, 10 ** 12))
+        increases = [fp.compound_increase(*random_compounding(rng)) for _ in range(args.chain)]
+        index = fp.ONE
+        for increase in increases:
+            index = fp.compound_index(index, increase)
+        chains.append((ls, increases, index))
+    total = sum(len(c) for _, c, _ in chains)
+
+    t = perf_counter()
+    exact = [fp.floor_local_stake(fp.local_claim_box(ls, fp.ONE, index)) for ls, _, index in chains]
+    dt_index = perf_counter() - t
+
+    t = perf_counter()
+    sequential = [fp.floor_local_stake(sequential_local_claim(ls, c)) for ls, c, _ in chains]
+    dt_seq = perf_counter() - t
+
+    t = perf_counter()
+    approx = [int(decimal_local_claim(ls, c)) for ls, c, _ in chains]
+    dt_dec = perf_counter() - t
+
+    print("cumulative index: {:12.0f} increments/s".format(total / dt_index))
+    print("one by one      : {:12.0f} increments/s".format(total / dt_seq))
+    print("decimal path    : {:12.0f} increments/s".format(total / dt_dec))
+    print("speed-up: {:.1f}x over one by one, {:.1f}x over decimal path".format(dt_seq / dt_index, dt_dec / dt_index))
+    for name, other in (("claiming one by one", sequential), ("decimal path", approx)):
+        deviations = [abs(o - e) for o, e in zip(other, exact)]
+        print("{} differs from the cumulative index in {} of {} chains, by at most {} base units".format(
+            name, sum(d != 0 for d in deviations), len(deviations), max(deviations)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,46 @@
+# -----------------           Description          -----------------
+# Benchmark of the import time of the command-line tools, measured with `python -X importtime` in a fresh interpreter.
+# It also guards that PyTeal is not imported at start-up, i.e. only when a contract needs to be compiled for deployment
+# - the script exits with an error if it is.
+# Run from the repository root with: python -m benchmarks.bench_import_time
+
+# -----------------           Imports          -----------------
+import argparse
+import subprocess
+import sys
+
+# ---------------------------------------------------------------
+
+
+# Function returns {module: cumulative import time [us]} of importing the module in a fresh interpreter
+def import_times(module: str):
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import " + module], capture_output=True, text=True, check=True
+    )
+    times = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = [part.strip() for part in line[len("import time:"):].split("|")]
+        times[name] = int(cumulative)
+    return times
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--modules", nargs="+", default=["interactions_state_machine", "demo.keeper"])
+    args = parser.parse_args()
+
+    ok = True
+    for module in args.modules:
+        times = import_times(module)
+        pyteal = "pyteal" in times
+        print("{:30s} {:8.1f} ms{}".format(module, times[module] / 1000, ", imports PyTeal!" if pyteal else ""))
+        ok = ok and not pyteal
+
+    if not ok:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+# -----------------           Description          -----------------
+# Benchmark of the keeper (demo/keeper.py) against a simulated ledger of many compound contracts that advances rounds in
+# real time, with new stakers randomly adding funds for additional compoundings. Reports how many rounds after becoming
+# triggerable the contracts were triggered, whether any trigger was missed or rejected, and the number of algod requests
+# compared to polling getTriggerRound of each contract in each round.
+# With --confirm, each trigger waits for the confirmation of its round as it does on a node, and with --batch the keeper
+# triggers the contracts due together in pipelined atomic groups (as demo/batch_trigger.py does), splitting rejected ones.
+# Run from the repository root with: python -m benchmarks.bench_keeper [--confirm] [--batch]
+
+# -----------------           Imports          -----------------
+import argparse
+import asyncio
+import random
+from statistics import mean
+
+from benchmarks.sim_ledger import SimulatedLedger
+from demo.keeper import Keeper
+from util import round_follower
+
+from algosdk import error
+
+import src.config as cfg
+
+# ---------------------------------------------------------------
+
+
+# New stakers add funds for additional triggers to random contracts
+async def add_stakers(ledger, app_ids, until_round, probability, rng):
+    while ledger.round < until_round:
+        await asyncio.sleep(ledger.round_time)
+        if rng.random() < probability:
+            ledger.fund(rng.choice(app_ids), rng.randint(1, 5))
+
+
+# Same submission of the triggers as triggerCompoundingBatch, but to the simulated ledger
+def batch_trigger(ledger, contracts):
+    results = {app_id: 0 for app_id, _ in contracts}
+    groups = [contracts[i:i + cfg.MAX_GROUP_SIZE] for i in range(0, len(contracts), cfg.MAX_GROUP_SIZE)]
+    submitted = []
+    while groups:
+        group = groups.pop()
+        try:
+            submitted.append((group, ledger.submit_trigger_group([app_id for app_id, _ in group])))
+        except error.AlgodHTTPError:
+            if len(group) > 1:
+                groups.append(group[len(group) // 2:])
+                groups.append(group[:len(group) // 2])
+
+    for group, round in submitted:
+        ledger.wait_for_confirmation(round)
+        for app_id, _ in group:
+            results[app_id] = 1
+    return results
+
+
+async def run(args):
+    rng = random.Random(args.seed)
+    ledger = SimulatedLedger(args.round_time, cfg.CC_FEE_FOR_COMPOUND, cfg.BOX_FEE, args.confirm)
+
+    app_ids = list(range(1, args.contracts + 1))
+    for app_id in app_ids:
+        psr = rng.randint(1, args.rounds // 4)
+        per = psr + rng.randint(args.rounds // 4, 2 * args.rounds)
+        ledger.add_compound_contract(app_id, psr, per, rng.randint(0, 20))
+
+    keeper = Keeper(ledger, recheck_rounds=args.recheck_rounds, batch_trigger=batch_trigger if args.batch else None)
+    for app_id in app_ids:
+        keeper.add_contract(app_id, cfg.CC_FEE_FOR_COMPOUND, lambda client, app_id=app_id: client.trigger_compound(app_id))
+
+    ledger.start()
+    try:
+        until_round = ledger.round + args.rounds
+        await asyncio.gather(
+            keeper.run(until_round),
+            add_stakers(ledger, app_ids, until_round, args.stake_probability, rng)
+        )
+    finally:
+        round_follower(ledger).stop()
+        ledger.stop()
+
+    requests = sum(n for method, n in ledger.requests.items() if method not in ("trigger_compound", "send_group"))
+    polling = 3 * args.contracts * args.rounds
+    print("contracts: {}, rounds: {}".format(args.contracts, args.rounds))
+    print("triggers: {}, rejected: {}, still pending at end: {}".format(
+        len(ledger.delays), ledger.rejected, ledger.pending()))
+    if ledger.delays:
+        print("delay after becoming triggerable: mean {:.2f}, max {} rounds".format(
+            mean(ledger.delays), max(ledger.delays)))
+    print("trigger groups submitted: {} for {} trigger calls".format(
+        ledger.requests.get("send_group", 0), ledger.requests.get("trigger_compound", 0)))
+    print("algod requests: {} (polling each round: {}, {:.1f}x fewer)".format(requests, polling, polling / requests))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--contracts", type=int, default=300)
+    parser.add_argument("--rounds", type=int, default=300)
+    parser.add_argument("--round-time", type=float, default=0.02, help="simulated time between rounds [s]")
+    parser.add_argument("--recheck-rounds", type=int, default=cfg.KEEPER_RECHECK_ROUNDS)
+    parser.add_argument("--stake-probability", type=float, default=0.3, help="probability of a new staker per round")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--confirm", action="store_true", help="triggers wait for the confirmation of their round")
+    parser.add_argument("--batch", action="store_true", help="trigger contracts due together in batched groups")
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
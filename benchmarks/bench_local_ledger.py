@@ -0,0 +1,89 @@
+# -----------------           Description          -----------------
+# Benchmark of the compound and farm compound contracts on the local ledger (benchmarks/local_ledger.py), which runs
+# their compiled programs against fakes of the staking contract, its associated contract and the AMM.
+# Users opt in and stake before the pool starts. Then, throughout the pool, the contract is triggered whenever its
+# schedule allows it (or compounded on demand otherwise), while the users take turns to locally claim, stake more and
+# withdraw. Each user's local stake is checked against its emulation (src/fixed_point.py) after every call, and the
+# stakes against the total stake and the stake in the staking contract at the end.
+# Reports the replayed calls per second (of the evaluation on the ledger and including the building and signing of the
+# groups) and the average opcode cost of each method.
+# Run from the repository root with: python -m benchmarks.bench_local_ledger
+
+# -----------------           Imports          -----------------
+import argparse
+import random
+from time import perf_counter
+
+from benchmarks.contract_deployment import Deployment, STAKE
+from benchmarks.local_ledger import LocalLedger
+
+import src.fixed_point as fp
+import src.schedule as schedule
+
+# ---------------------------------------------------------------
+
+
+def run(farm: bool, users: int, steps: int, seed: int):
+    rng = random.Random(seed)
+    ledger = LocalLedger()
+    pool_rounds = 10 * steps
+    d = Deployment(ledger, farm, pool_rounds, STAKE * users // 100)
+    stakers = [d.add_user() for _ in range(users)]
+    for user in stakers:
+        user.stake(rng.randint(1, 10) * STAKE)
+    ledger.advance(d.state()["PSR"] - ledger.last_round)
+
+    d.costs.clear()
+    groups = ledger.groups
+    evaluation = ledger.evaluation_time
+    t = perf_counter()
+    for _ in range(steps):
+        ledger.advance(pool_rounds // steps - 1)
+        if d.trigger_round() == schedule.TRIGGER_NOW:
+            d.trigger(stakers[0].sk, stakers[0].address)
+        else:
+            d.compound_now(stakers[0].sk, stakers[0].address)
+        for _ in range(len(stakers)):
+            user = rng.choice(stakers)
+            op = rng.random()
+            stake = user.stake_amount()
+            if op < 0.6:
+                user.local_claim()
+            elif op < 0.8 or stake == 0:
+                user.stake(rng.randint(1, 3) * STAKE)
+            else:
+                # Either a partial or a full withdrawal
+                user.withdraw(rng.randint(1, stake) if rng.random() < 0.8 else stake)
+    dt = perf_counter() - t
+    groups = ledger.groups - groups
+    evaluation = ledger.evaluation_time - evaluation
+
+    # Stakes of all users add up to at most the total stake, which is all staked in SC
+    for user in stakers:
+        user.local_claim()
+    state = d.state()
+    stakes = sum(user.stake_amount() for user in stakers)
+    assert 0 < state["NB"], "no compounding has been recorded"
+    assert stakes <= state["TS"], "stakes {} exceed the total stake {}".format(stakes, state["TS"])
+    assert d.sc.stakes[ledger.app_address(d.app_id)] == state["TS"]
+
+    print("{}: {} groups with {} calls in {:.2f} s - {:8.1f} calls/s ({:8.1f} calls/s evaluated), {} increases".format(
+        "FC" if farm else "CC", groups, sum(n for _, n in d.costs.values()), dt,
+        sum(n for _, n in d.costs.values()) / dt, sum(n for _, n in d.costs.values()) / evaluation, state["NB"]))
+    for method, (cost, calls) in sorted(d.costs.items()):
+        print("\t{:<18} {:6d} calls, {:6.0f} opcode cost on average".format(method, calls, cost / calls))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--users", type=int, default=50)
+    parser.add_argument("--steps", type=int, default=40, help="number of compoundings during the pool")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    run(False, args.users, args.steps, args.seed)
+    run(True, args.users, args.steps, args.seed)
+
+
+if __name__ == "__main__":
+    main()
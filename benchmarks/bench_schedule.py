@@ -0,0 +1,132 @@
+# -----------------           Description          -----------------
+# Benchmark of the schedule policies of the compound contract (see src/config.py) on the local ledger
+# (benchmarks/local_ledger.py): the contract is funded for the same number of triggers and triggered whenever its
+# schedule allows it during the pool, while other stakers either stay out of the staking contract (constant yield) or
+# keep joining it (yield falling through the pool).
+# Each scheduled trigger round of the off-chain mirror (src/schedule.py) is checked against the contract, which has to
+# reject the trigger in the round before it and accept it in that round. The last interval of each schedule has to close
+# at the pool end.
+# Reports the triggers done during the pool and the stake compounded by the end of the pool, relative to the uniform
+# schedule [ppm].
+# Run from the repository root with: python -m benchmarks.bench_schedule [--triggers N]
+
+# -----------------           Imports          -----------------
+import argparse
+
+from algosdk import account, error, transaction
+from algosdk.atomic_transaction_composer import AtomicTransactionComposer, AccountTransactionSigner, \
+    TransactionWithSigner
+
+from benchmarks.contract_deployment import Deployment, STAKE
+from benchmarks.local_ledger import LocalLedger
+
+import src.config as cfg
+import src.schedule as schedule
+
+# ---------------------------------------------------------------
+
+POOL_ROUNDS = 20_000
+REWARD_PER_ROUND = STAKE // 10_000
+# Stake of the user of the contract, and of each staker joining the staking contract
+USER_STAKE = 10 * STAKE
+JOINING_STAKE = 10 * STAKE
+# Number of stakers joining the staking contract throughout the pool
+JOINING = 20
+
+POLICIES = {
+    cfg.SCHEDULE_UNIFORM: "uniform",
+    cfg.SCHEDULE_FRONT_LOADED: "front-loaded",
+}
+
+
+# Staker joining the staking contract directly
+def join_sc(d: Deployment, amt: int):
+    ledger = d.ledger
+    sk, address = account.generate_account()
+    ledger.fund(address, 10 ** 7)
+    ledger.give_asset(address, d.s_asa_id, amt, d.creator)
+    signer = AccountTransactionSigner(sk)
+    atc = AtomicTransactionComposer()
+    atc.add_transaction(TransactionWithSigner(
+        transaction.ApplicationOptInTxn(address, d.params(ledger.min_fee), d.sc_id), signer))
+    atc.execute(ledger, 0)
+
+    sp = d.params(ledger.min_fee)
+    atc = AtomicTransactionComposer()
+    atc.add_transaction(TransactionWithSigner(
+        transaction.AssetTransferTxn(address, sp, d.sc_address, amt, d.s_asa_id), signer))
+    args = [b"\x00", b"\x03", bytes(8), b"\x02" + amt.to_bytes(8, 'big')]
+    atc.add_transaction(TransactionWithSigner(
+        transaction.ApplicationNoOpTxn(address, sp, d.sc_id, args, foreign_apps=[d.ac_id], foreign_assets=[d.s_asa_id],
+                                       accounts=[d.sc_address]),
+        signer))
+    atc.execute(ledger, 0)
+
+
+def run(policy: int, triggers: int, joining: bool):
+    ledger = LocalLedger()
+    d = Deployment(ledger, False, POOL_ROUNDS, REWARD_PER_ROUND, policy)
+    user = d.add_user()
+    user.stake(USER_STAKE)
+    join_sc(d, JOINING_STAKE)
+    ledger.fund(d.address, triggers * d.fee_for_compound)
+    state = d.state()
+    joins = [state["PSR"] + (i + 1) * POOL_ROUNDS // (JOINING + 1) for i in range(JOINING)] if joining else []
+    ledger.advance(state["PSR"] - ledger.last_round)
+
+    done = 0
+    while True:
+        while joins and joins[0] <= ledger.round:
+            join_sc(d, JOINING_STAKE)
+            joins.pop(0)
+        code = d.trigger_round()
+        if code == schedule.TRIGGER_NOW:
+            d.trigger(user.sk, user.address)
+            done += 1
+            ledger.advance()
+            continue
+        if code < 0:
+            # The funded triggers have been scheduled until the pool end, with the last interval closing at it
+            info = ledger.account_info(d.address)
+            state = d.state()
+            triggers = schedule.number_of_triggers(info["amount"], info["min-balance"], d.fee_for_compound)
+            assert code == schedule.NO_TRIGGERS_BEFORE_END, "schedule ended with code {}".format(code)
+            assert schedule.next_compound_round(state, triggers) == state["PER"], \
+                "last interval closes at {} instead of the pool end {}".format(
+                    schedule.next_compound_round(state, triggers), state["PER"])
+            break
+        if joins and joins[0] <= code:
+            ledger.advance(joins[0] - ledger.round)
+            continue
+        # The contract has to agree with the mirror on the trigger round
+        ledger.advance(code - 1 - ledger.round)
+        try:
+            d.trigger(user.sk, user.address)
+            raise AssertionError("trigger accepted before the scheduled round {}".format(code))
+        except error.AlgodHTTPError:
+            pass
+        ledger.advance()
+
+    # Compounding after the pool end claims the rest of the rewards
+    ledger.advance(d.state()["PER"] - ledger.round + 1)
+    user.withdraw(1)
+    return done, d.state()["TS"] + 1
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--triggers", type=int, default=20, help="number of triggers the contract is funded for")
+    args = parser.parse_args()
+
+    for joining in (False, True):
+        print("{} yield:".format("Falling" if joining else "Constant"))
+        base = None
+        for policy, name in POLICIES.items():
+            done, stake = run(policy, args.triggers, joining)
+            base = base or stake
+            print("\t{:<14} {:3d} triggers, compounded stake {:d} ({:+.1f} ppm)".format(
+                name, done, stake, (stake - base) * 1e6 / base))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+# -----------------           Description          -----------------
+# Benchmark of the reads of one user operation (e.g. staking re-reads the global state of the contract several times,
+# besides its local state and balances), repeated by several threads, with the pooled client (util.PooledAlgodClient)
+# versus the per-round read-through cache (util.CachedAlgodClient), against a local mock algod with emulated network
+# latency. Also checks that a new round invalidates the cached state.
+# Run from the repository root with: python -m benchmarks.bench_state_cache
+
+# -----------------           Imports          -----------------
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+from time import perf_counter
+
+from algosdk import account
+from algosdk.logic import get_application_address
+
+from benchmarks.mock_algod import MockAlgod
+from util import PooledAlgodClient, CachedAlgodClient, round_follower, read_global_state, read_local_state
+
+# ---------------------------------------------------------------
+
+APP_ID = 1
+
+
+# Reads of one operation - global state as read by stakeCompoundContract, local state and balances of the contract
+def operation(client, user_address):
+    state = read_global_state(client, APP_ID)
+    read_local_state(client, user_address, APP_ID)
+    client.account_info(get_application_address(APP_ID))
+    read_global_state(client, APP_ID)
+    read_global_state(client, APP_ID)
+    return state
+
+
+def run(client, user_address, operations, threads):
+    t = perf_counter()
+    with ThreadPoolExecutor(threads) as executor:
+        states = list(executor.map(lambda _: operation(client, user_address), range(operations)))
+    return states, perf_counter() - t
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--operations", type=int, default=500)
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--latency", type=float, default=0.005, help="emulated latency per request [s]")
+    parser.add_argument("--round-time", type=float, default=0.5, help="emulated time between rounds [s]")
+    args = parser.parse_args()
+
+    mock = MockAlgod(latency=args.latency, round_time=args.round_time).start()
+    mock.add_compound_contract(APP_ID, list(range(1, 65)))
+    _, user_address = account.generate_account()
+    mock.local_state[(user_address, APP_ID)] = {"LNB": 0, "LS": (1 << 64).to_bytes(16, 'big')}
+    mock.accounts[get_application_address(APP_ID)] = (1_000_000, 100_000)
+    try:
+        pooled = PooledAlgodClient("", mock.address)
+        mock.requests.clear()
+        expected, dt = run(pooled, user_address, args.operations, args.threads)
+        print("pooled: {:8.1f} operations/s, {} requests".format(args.operations / dt, sum(mock.requests.values())))
+
+        cached = CachedAlgodClient("", mock.address)
+        follower = round_follower(cached).start()
+        mock.requests.clear()
+        states, dt = run(cached, user_address, args.operations, args.threads)
+        requests = sum(n for endpoint, n in mock.requests.items() if not endpoint.startswith("/v2/status"))
+        print("cached: {:8.1f} operations/s, {} requests (hits: {}, misses: {}, coalesced: {})".format(
+            args.operations / dt, requests, cached.hits, cached.misses, cached.coalesced))
+        assert states == expected
+
+        # State changed in the meantime is read once the round advances
+        mock.global_state[APP_ID]["NB"] += 1
+        follower.wait_for_round(follower.last_round + 1)
+        assert read_global_state(cached, APP_ID)["NB"] == expected[0]["NB"] + 1
+        follower.stop()
+    finally:
+        mock.stop()
+
+
+if __name__ == "__main__":
+    main()
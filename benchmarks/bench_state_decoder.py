@@ -0,0 +1,71 @@
+# -----------------           Description          -----------------
+# Microbenchmark of decoding the global state of compound and farm compound contracts as returned by algod: with
+# util.format_state (base64 decoding of every key into a dict) versus with the typed decoder (src/contract_state.py).
+# Checks that both decode the same values.
+# Run from the repository root with: python -m benchmarks.bench_state_decoder
+
+# -----------------           Imports          -----------------
+import argparse
+import random
+from time import perf_counter
+
+from benchmarks.mock_algod import encode_state
+from src.contract_state import decode_state, CompoundState, FarmCompoundState
+from util import format_state
+
+# ---------------------------------------------------------------
+
+
+# Global states of random compound (and farm compound) contracts, encoded as algod returns them
+def random_states(n, rng):
+    states = []
+    for i in range(n):
+        state = {"TS": rng.getrandbits(48), "PER": rng.getrandbits(26), "PSR": rng.getrandbits(26), "LCD": 0,
+                 "LCR": rng.getrandbits(26), "NS": rng.getrandbits(16), "CP": rng.getrandbits(20),
+                 "NB": rng.getrandbits(16), "CI": rng.getrandbits(72).to_bytes(16, 'big'),
+                 "SC_ID": rng.getrandbits(30), "AC_ID": rng.getrandbits(30), "S_ASA_ID": rng.getrandbits(30)}
+        if i % 2:
+            state.update({"R_ASA_ID": rng.getrandbits(30), "AMM_ID": rng.getrandbits(30),
+                          "P_ADDR": rng.getrandbits(256).to_bytes(32, 'big'), "MRAAL": rng.getrandbits(20)})
+        states.append(encode_state(state))
+    return states
+
+
+def timed(decode, states, repeat):
+    t = perf_counter()
+    for _ in range(repeat):
+        decoded = [decode(state) for state in states]
+    return decoded, (perf_counter() - t) / repeat
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--states", type=int, default=10000)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    states = random_states(args.states, random.Random(args.seed))
+
+    formatted, dt_format = timed(format_state, states, args.repeat)
+    print("format_state: {:10.0f} states/s".format(args.states / dt_format))
+    decoded, dt_decode = timed(decode_state, states, args.repeat)
+    print("decode_state: {:10.0f} states/s ({:.2f}x)".format(args.states / dt_decode, dt_format / dt_decode))
+
+    for f, d in zip(formatted, decoded):
+        assert isinstance(d, FarmCompoundState) == ("AMM_ID" in f)
+        assert isinstance(d, CompoundState)
+        assert all(d[key] == value for key, value in f.items())
+
+    # Typed access of a field versus a dict lookup
+    t = perf_counter()
+    nb = sum(f["NB"] for f in formatted)
+    dt_dict = perf_counter() - t
+    t = perf_counter()
+    assert sum(d.number_of_boxes for d in decoded) == nb
+    dt_field = perf_counter() - t
+    print("access: dict {:.1f} ns, field {:.1f} ns".format(1e9 * dt_dict / args.states, 1e9 * dt_field / args.states))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+# -----------------           Description          -----------------
+# Benchmark of submitting many transaction groups: one at a time with atc.execute, which blocks until each group is
+# confirmed (as done originally), versus all in flight at once through the submission pipeline (util.SubmissionPipeline),
+# against a local mock algod with emulated network latency and rounds advancing in real time.
+# Run from the repository root with: python -m benchmarks.bench_submission
+
+# -----------------           Imports          -----------------
+import argparse
+from time import perf_counter
+
+from algosdk import account, transaction
+from algosdk.atomic_transaction_composer import *
+from algosdk.v2client import algod
+
+from benchmarks.mock_algod import MockAlgod
+from util import SubmissionPipeline, RoundFollower
+
+# ---------------------------------------------------------------
+
+
+# Composers of groups of payments to oneself, each group made unique by its note
+def build_groups(client, groups, group_size):
+    sk, address = account.generate_account()
+    signer = AccountTransactionSigner(sk)
+    sp = client.suggested_params()
+    atcs = []
+    for g in range(groups):
+        atc = AtomicTransactionComposer()
+        for i in range(group_size):
+            txn = transaction.PaymentTxn(address, sp, address, 0, note="{}-{}".format(g, i).encode())
+            atc.add_transaction(TransactionWithSigner(txn, signer))
+        atcs.append(atc)
+    return atcs
+
+
+def confirmation_requests(mock):
+    return sum(n for endpoint, n in mock.requests.items()
+               if endpoint.startswith("/v2/transactions/pending") or endpoint.startswith("/v2/status"))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--groups", type=int, default=50)
+    parser.add_argument("--group-size", type=int, default=4)
+    parser.add_argument("--latency", type=float, default=0.005, help="emulated latency per request [s]")
+    parser.add_argument("--round-time", type=float, default=0.1, help="emulated time between rounds [s]")
+    args = parser.parse_args()
+
+    mock = MockAlgod(latency=args.latency, round_time=args.round_time).start()
+    client = algod.AlgodClient("", mock.address)
+    follower = RoundFollower(client).start()
+    try:
+        atcs = build_groups(client, args.groups, args.group_size)
+        mock.requests.clear()
+        t = perf_counter()
+        for atc in atcs:
+            atc.execute(client, 10)
+        dt = perf_counter() - t
+        print("execute:  {:8.1f} groups/s, {:6.2f} s, {} confirmation requests".format(
+            args.groups / dt, dt, confirmation_requests(mock)))
+
+        atcs = build_groups(client, args.groups, args.group_size)
+        pipeline = SubmissionPipeline(client, follower)
+        mock.requests.clear()
+        t = perf_counter()
+        futures = [pipeline.submit(atc, 10) for atc in atcs]
+        results = [future.result() for future in futures]
+        dt = perf_counter() - t
+        print("pipeline: {:8.1f} groups/s, {:6.2f} s, {} confirmation requests (confirmed: {}, failed: {})".format(
+            args.groups / dt, dt, confirmation_requests(mock), pipeline.confirmed, pipeline.failed))
+        assert all(r.tx_ids == atc.tx_ids for r, atc in zip(results, atcs))
+    finally:
+        follower.stop()
+        mock.stop()
+
+
+if __name__ == "__main__":
+    main()
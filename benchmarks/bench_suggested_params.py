@@ -0,0 +1,57 @@
+# -----------------           Description          -----------------
+# Benchmark of getting suggested transaction parameters for each built group: directly from the node (as done
+# originally) versus from the per-round cache (util.SuggestedParamsCache), against a local mock algod with emulated
+# network latency and rounds advancing in real time. Several threads build groups concurrently, as the keeper does.
+# Run from the repository root with: python -m benchmarks.bench_suggested_params
+
+# -----------------           Imports          -----------------
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+from time import perf_counter
+
+from algosdk.v2client import algod
+
+from benchmarks.mock_algod import MockAlgod
+from util import SuggestedParamsCache, RoundFollower
+
+# ---------------------------------------------------------------
+
+
+def get_params(get, groups, threads):
+    t = perf_counter()
+    with ThreadPoolExecutor(threads) as executor:
+        params = list(executor.map(lambda _: get(), range(groups)))
+    return params, perf_counter() - t
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--groups", type=int, default=2000)
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--latency", type=float, default=0.005, help="emulated latency per request [s]")
+    parser.add_argument("--round-time", type=float, default=0.1, help="emulated time between rounds [s]")
+    args = parser.parse_args()
+
+    mock = MockAlgod(latency=args.latency, round_time=args.round_time).start()
+    client = algod.AlgodClient("", mock.address)
+    follower = RoundFollower(client).start()
+    try:
+        params, dt = get_params(client.suggested_params, args.groups, args.threads)
+        requests = mock.requests["/v2/transactions/params"]
+        print("direct: {:8.1f} groups/s, {} requests".format(args.groups / dt, requests))
+
+        mock.requests.clear()
+        cache = SuggestedParamsCache(client, follower)
+        params, dt = get_params(cache.get, args.groups, args.threads)
+        requests = mock.requests["/v2/transactions/params"]
+        print("cached: {:8.1f} groups/s, {} requests (hits: {}, misses: {})".format(
+            args.groups / dt, requests, cache.hits, cache.misses))
+        # Copies keep the validity window suggested by the node
+        assert all(p.last - p.first == 1000 for p in params)
+    finally:
+        follower.stop()
+        mock.stop()
+
+
+if __name__ == "__main__":
+    main()
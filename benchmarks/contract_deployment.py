@@ -0,0 +1,310 @@
+# -----------------           Description          -----------------
+# Deployment of a compound or farm compound contract on the local ledger (benchmarks/local_ledger.py), with the fakes of
+# the staking contract, its associated contract and the AMM, and its users. The calls are made with the same groups as
+# the demo makes them (demo/interact_w_CompoundContract.py), and each call checks the user's local stake against its
+# emulation (src/fixed_point.py).
+# The programs are taken from the artifact cache of the compiled contracts (src/artifact_cache.py). On a cache miss, the
+# TEAL and ABI JSON are generated into a temporary directory, thus the tracked files in compiled_files are not touched.
+
+# -----------------           Imports          -----------------
+import tempfile
+
+from algosdk import account, transaction
+from algosdk.atomic_transaction_composer import AtomicTransactionComposer, AccountTransactionSigner, \
+    TransactionWithSigner
+from algosdk.logic import get_application_address
+
+from benchmarks.local_ledger import LocalLedger, create_staking_contract, create_amm
+from demo.box_reader import box_references, read_index
+from util import read_global_state, read_local_state
+
+import src.config as cfg
+import src.fixed_point as fp
+import src.schedule as schedule
+
+# ---------------------------------------------------------------
+
+ASSET_TOTAL = 10 ** 15
+STAKE = 1_000_000_000
+CLAIM_PERIOD = 100_000
+
+
+# Function prepares the programs of the (farm) compound contract for deployment, generating the files of a compilation
+# into a temporary directory instead of cfg.COMPILED_FILES_DIR
+def init_programs(farm: bool):
+    compiled_files_dir = cfg.COMPILED_FILES_DIR
+    with tempfile.TemporaryDirectory() as tmp:
+        cfg.COMPILED_FILES_DIR = tmp
+        try:
+            if farm:
+                cfg.init_FC_programs(None)
+            else:
+                cfg.init_CC_programs(None)
+        finally:
+            cfg.COMPILED_FILES_DIR = compiled_files_dir
+
+
+class Deployment:
+
+    def __init__(self, ledger: LocalLedger, farm: bool, pool_rounds: int, reward_per_round: int,
+                 schedule_policy: int = cfg.SCHEDULE_UNIFORM):
+        self.ledger = ledger
+        self.farm = farm
+        self.schedule_policy = schedule_policy
+        self.fee_for_compound = cfg.FC_FEE_FOR_COMPOUND if farm else cfg.CC_FEE_FOR_COMPOUND
+
+        self.creator_sk, self.creator = account.generate_account()
+        ledger.fund(self.creator, 10 ** 12)
+        self.s_asa_id = ledger.create_asset(self.creator, ASSET_TOTAL)
+        self.r_asa_id = ledger.create_asset(self.creator, ASSET_TOTAL) if farm else self.s_asa_id
+        start_round = ledger.round + 10
+        [self.sc_id, self.ac_id, self.sc] = create_staking_contract(
+            ledger, self.s_asa_id, self.r_asa_id, start_round, start_round + pool_rounds, reward_per_round,
+            self.creator, farm)
+        self.sc_address = get_application_address(self.sc_id)
+        if farm:
+            _, self.p_addr = account.generate_account()
+            self.amm_id = create_amm(ledger, self.p_addr, self.s_asa_id, self.r_asa_id, ASSET_TOTAL // 2, self.creator)
+        # Opcode cost and number of calls of each method, and number of groups made unique by their note
+        self.costs = {}
+        self.calls = 0
+        self.app_id = self.create()
+        self.address = get_application_address(self.app_id)
+        self.setup()
+
+    # Note making the group unique, since the same user can repeat the same call in a round
+    def note(self):
+        self.calls += 1
+        return self.calls.to_bytes(8, 'big')
+
+    def params(self, fee: int = 0):
+        sp = self.ledger.suggested_params()
+        sp.flat_fee = True
+        sp.fee = fee
+        return sp
+
+    def method_call(self, atc: AtomicTransactionComposer, sender: str, signer, sp, method: str, args=None, **kwargs):
+        if self.farm:
+            references = dict(foreign_assets=[self.s_asa_id, self.r_asa_id],
+                              foreign_apps=[self.sc_id, self.ac_id, self.amm_id],
+                              accounts=[self.sc_address, self.p_addr])
+        else:
+            references = dict(foreign_assets=[self.s_asa_id], foreign_apps=[self.sc_id, self.ac_id],
+                              accounts=[self.sc_address])
+        references.update(kwargs)
+        atc.add_method_call(app_id=self.app_id, method=self.contract.get_method_by_name(method), sender=sender, sp=sp,
+                            signer=signer, method_args=args, **references)
+
+    def execute(self, atc: AtomicTransactionComposer, method: str):
+        result = atc.execute(self.ledger, 0)
+        info = self.ledger.pending_transaction_info(result.tx_ids[-1])
+        cost, calls = self.costs.get(method, (0, 0))
+        self.costs[method] = (cost + info.get("app-budget-consumed", 0), calls + 1)
+        return result
+
+    def create(self):
+        sp = self.params(self.ledger.min_fee)
+        atc = AtomicTransactionComposer()
+        init_programs(self.farm)
+        if self.farm:
+            args = [self.sc_id, self.ac_id, self.p_addr, self.amm_id, CLAIM_PERIOD, 1, self.schedule_policy]
+            programs = dict(approval_program=cfg.FC_approval_program, clear_program=cfg.FC_clear_state_program,
+                            extra_pages=cfg.FC_ExtraProgramPages,
+                            global_schema=transaction.StateSchema(cfg.FC_NUM_GLOBAL_UINT, cfg.FC_NUM_GLOBAL_BYTES),
+                            local_schema=transaction.StateSchema(cfg.FC_NUM_LOCAL_UINT, cfg.FC_NUM_LOCAL_BYTES))
+        else:
+            args = [self.sc_id, self.ac_id, CLAIM_PERIOD, self.schedule_policy]
+            programs = dict(approval_program=cfg.CC_approval_program, clear_program=cfg.CC_clear_state_program,
+                            extra_pages=cfg.CC_ExtraProgramPages,
+                            global_schema=transaction.StateSchema(cfg.CC_NUM_GLOBAL_UINT, cfg.CC_NUM_GLOBAL_BYTES),
+                            local_schema=transaction.StateSchema(cfg.CC_NUM_LOCAL_UINT, cfg.CC_NUM_LOCAL_BYTES))
+        # Interface of the contract is known once its programs are
+        self.contract = cfg.FC_contract if self.farm else cfg.CC_contract
+        atc.add_method_call(app_id=0, method=self.contract.get_method_by_name("create_app"), sender=self.creator,
+                            sp=sp, signer=AccountTransactionSigner(self.creator_sk), method_args=args,
+                            foreign_apps=[self.sc_id], **programs)
+        result = self.execute(atc, "create_app")
+        return self.ledger.pending_transaction_info(result.tx_ids[0])["application-index"]
+
+    def setup(self):
+        opt_ins = 2 if self.farm else 1
+        sp = self.params((3 + opt_ins) * self.ledger.min_fee)
+        signer = AccountTransactionSigner(self.creator_sk)
+        atc = AtomicTransactionComposer()
+        amt = 100_000 + opt_ins * 100_000 + 50_000 * 3
+        atc.add_transaction(TransactionWithSigner(
+            transaction.PaymentTxn(self.creator, sp, self.address, amt), signer))
+        sp.fee = 0
+        assets = [self.s_asa_id, self.r_asa_id] if self.farm else [self.s_asa_id]
+        self.method_call(atc, self.creator, signer, sp, "on_setup", foreign_assets=assets, foreign_apps=[self.sc_id],
+                         accounts=None)
+        self.execute(atc, "on_setup")
+
+    def add_user(self):
+        sk, address = account.generate_account()
+        self.ledger.fund(address, 10 ** 10)
+        self.ledger.give_asset(address, self.s_asa_id, 100 * STAKE, self.creator)
+        atc = AtomicTransactionComposer()
+        atc.add_transaction(TransactionWithSigner(
+            transaction.ApplicationOptInTxn(address, self.params(self.ledger.min_fee), self.app_id),
+            AccountTransactionSigner(sk)))
+        self.execute(atc, "opt_in")
+        return User(self, sk, address)
+
+    def state(self):
+        return read_global_state(self.ledger, self.app_id)
+
+    def trigger_round(self):
+        info = self.ledger.account_info(self.address)
+        return schedule.trigger_round(self.state(), info["amount"], info["min-balance"], self.fee_for_compound,
+                                      self.ledger.round)
+
+    def trigger(self, sk: str, address: str):
+        atc = AtomicTransactionComposer()
+        self.method_call(atc, address, AccountTransactionSigner(sk), self.params(self.ledger.min_fee),
+                         "trigger_compound", boxes=box_references(self.state()["NB"] + 1),
+                         accounts=[self.p_addr, self.address] if self.farm else [self.address, self.sc_address])
+        self.execute(atc, "trigger_compound")
+
+    def compound_now(self, sk: str, address: str):
+        signer = AccountTransactionSigner(sk)
+        sp = self.params(2 * self.ledger.min_fee)
+        atc = AtomicTransactionComposer()
+        atc.add_transaction(TransactionWithSigner(
+            transaction.PaymentTxn(address, sp, self.address, self.fee_for_compound, note=self.note()), signer))
+        sp.fee = 0
+        self.method_call(atc, address, signer, sp, "compound_now", boxes=box_references(self.state()["NB"] + 1))
+        self.execute(atc, "compound_now")
+
+    def delete_boxes(self, down_to_box: int):
+        boxes = (self.state()["NB"] + cfg.BOX_INCREMENTS - 1) // cfg.BOX_INCREMENTS
+        atc = AtomicTransactionComposer()
+        self.method_call(atc, self.creator, AccountTransactionSigner(self.creator_sk),
+                         self.params(self.ledger.min_fee), "delete_boxes", [down_to_box], foreign_assets=None,
+                         foreign_apps=None, accounts=None,
+                         boxes=[(0, box.to_bytes(cfg.BOX_NAME_SIZE, 'big')) for box in range(boxes, down_to_box, -1)])
+        self.execute(atc, "delete_boxes")
+
+    def delete(self):
+        state = self.state()
+        fees = 5 if self.farm else 4
+        if state["LCD"] == cfg.LAST_COMPOUND_NOT_DONE:
+            fees += 4 + 3
+        assets = [self.s_asa_id, self.r_asa_id] if self.farm else [self.s_asa_id]
+        atc = AtomicTransactionComposer()
+        atc.add_transaction(TransactionWithSigner(
+            transaction.ApplicationDeleteTxn(self.creator, self.params(fees * self.ledger.min_fee), self.app_id,
+                                             accounts=[self.sc_address], foreign_assets=assets,
+                                             foreign_apps=[self.sc_id, self.ac_id]),
+            AccountTransactionSigner(self.creator_sk)))
+        self.execute(atc, "delete")
+
+
+class User:
+
+    def __init__(self, deployment: Deployment, sk: str, address: str):
+        self.d = deployment
+        self.sk = sk
+        self.address = address
+        self.signer = AccountTransactionSigner(sk)
+
+    def local_state(self):
+        return read_local_state(self.d.ledger, self.address, self.d.app_id)
+
+    # Rounded down local stake (as last claimed)
+    def stake_amount(self):
+        return fp.floor_local_stake(int.from_bytes(self.local_state()["LS"], 'big'))
+
+    # Local stake the user is expected to have after claiming up to the increase nb, from the cumulative indices
+    def expected_stake(self, nb: int):
+        local_state = self.local_state()
+        ls = int.from_bytes(local_state["LS"], 'big')
+        if local_state["LNB"] == nb:
+            return ls
+        return fp.local_claim_box(ls, read_index(self.d.ledger, self.d.app_id, local_state["LNB"]),
+                                  read_index(self.d.ledger, self.d.app_id, nb))
+
+    def check_stake(self, expected: int):
+        ls = int.from_bytes(self.local_state()["LS"], 'big')
+        assert ls == expected, "local stake of {} is {} instead of {}".format(self.address, ls, expected)
+
+    def local_claim(self):
+        d = self.d
+        nb = d.state()["NB"]
+        lnb = self.local_state()["LNB"]
+        if nb == lnb:
+            return
+        expected = self.expected_stake(nb)
+        atc = AtomicTransactionComposer()
+        d.method_call(atc, self.address, self.signer, d.params(d.ledger.min_fee), "local_claim", [nb],
+                      foreign_assets=None, foreign_apps=None, accounts=None, boxes=box_references(lnb, nb))
+        d.execute(atc, "local_claim")
+        self.check_stake(expected)
+
+    def stake(self, amt: int):
+        d = self.d
+        self.local_claim()
+        state = d.state()
+        live = d.ledger.round > state["PSR"] and state["TS"] > 0
+        ls = int.from_bytes(self.local_state()["LS"], 'big')
+
+        sp = d.params(3 * d.ledger.min_fee)
+        atc = AtomicTransactionComposer()
+        fund = d.fee_for_compound * 2 if live else d.fee_for_compound + cfg.STAKE_TO_SC_FEE
+        atc.add_transaction(TransactionWithSigner(transaction.PaymentTxn(self.address, sp, d.address, fund, note=d.note()),
+                                                  self.signer))
+        sp.fee = 0
+        atc.add_transaction(TransactionWithSigner(
+            transaction.AssetTransferTxn(self.address, sp, d.address, amt, d.s_asa_id), self.signer))
+        d.method_call(atc, self.address, self.signer, sp, "stake", boxes=box_references(state["NB"], state["NB"] + 1))
+        d.execute(atc, "stake")
+
+        # Staking while the pool is live compounds first (and claims the compounding for the user)
+        if d.state()["NB"] != state["NB"]:
+            ls = fp.local_claim_box(ls, read_index(d.ledger, d.app_id, state["NB"]),
+                                    read_index(d.ledger, d.app_id, d.state()["NB"]))
+        self.check_stake(fp.add_stake(ls, amt))
+
+    def withdraw(self, amt: int):
+        d = self.d
+        self.local_claim()
+        state = d.state()
+        ls = int.from_bytes(self.local_state()["LS"], 'big')
+        full = fp.floor_local_stake(ls)
+
+        sp = d.params(3 * d.ledger.min_fee)
+        atc = AtomicTransactionComposer()
+        if d.ledger.round < state["PSR"]:
+            fund = cfg.UNSTAKE_FROM_SC_FEE
+        elif d.ledger.round <= state["PER"] or state["LCD"] == cfg.LAST_COMPOUND_NOT_DONE:
+            fund = d.fee_for_compound + cfg.UNSTAKE_FROM_SC_FEE
+        else:
+            fund = 0
+        atc.add_transaction(TransactionWithSigner(transaction.PaymentTxn(self.address, sp, d.address, fund, note=d.note()),
+                                                  self.signer))
+        sp.fee = 0
+        d.method_call(atc, self.address, self.signer, sp, "withdraw", [amt],
+                      boxes=box_references(state["NB"], state["NB"] + 1))
+        withdrawn = d.execute(atc, "withdraw").abi_results[0].return_value
+
+        if d.state()["NB"] != state["NB"]:
+            ls = fp.local_claim_box(ls, read_index(d.ledger, d.app_id, state["NB"]),
+                                    read_index(d.ledger, d.app_id, d.state()["NB"]))
+        # Withdrawing the whole local stake withdraws also the effect of the compounding done by the withdrawal
+        expected = fp.floor_local_stake(ls) if amt == full else amt
+        assert withdrawn == expected, "withdrew {} instead of {}".format(withdrawn, expected)
+        self.check_stake(fp.withdraw_stake(ls, expected))
+
+    def close_out(self):
+        atc = AtomicTransactionComposer()
+        atc.add_transaction(TransactionWithSigner(
+            transaction.ApplicationCloseOutTxn(self.address, self.d.params(self.d.ledger.min_fee), self.d.app_id),
+            self.signer))
+        self.d.execute(atc, "close_out")
+
+    def clear_state(self):
+        atc = AtomicTransactionComposer()
+        atc.add_transaction(TransactionWithSigner(
+            transaction.ApplicationClearStateTxn(self.address, self.d.params(self.d.ledger.min_fee), self.d.app_id),
+            self.signer))
+        self.d.execute(atc, "clear_state")
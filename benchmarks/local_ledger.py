@@ -0,0 +1,904 @@
+# -----------------           Description          -----------------
+# In-memory ledger that executes the compiled contracts locally (see benchmarks/avm.py), thus they can be benchmarked and
+# regression-tested without a node. It holds accounts with their balances and minimum balances, assets, apps with their
+# global and local states and boxes, and it evaluates atomic groups of payments, asset transfers, asset creations and app
+# calls - with fee pooling, inner transactions and the pooled opcode budget - in the round following the last one.
+# A group is applied atomically: all changes of the ledger are journaled and rolled back if any transaction fails.
+# Rounds advance with advance(), or with every group in dev mode (as algod does in its DevMode).
+# The apps the contracts call - the Cometa staking contract (SC) with its associated contract (AC) and the Tinyman AMM -
+# are replaced with fakes implemented in Python, which follow the interface the contracts rely on.
+# The ledger also provides the subset of the algod client used by the demo and the tools (status, suggested parameters,
+# sending and confirmation of transactions, application, account and box information), thus it can stand in for the
+# client, e.g. atc.execute(ledger, 3). Signatures are not verified.
+
+# -----------------           Imports          -----------------
+import base64
+import threading
+from time import perf_counter
+
+from algosdk import encoding, error, transaction
+from algosdk.logic import get_application_address
+
+from src.config import APP_CALL_BUDGET, MAX_GROUP_SIZE, MAX_REFERENCES
+from benchmarks.avm import AVMError, GroupContext, Evaluation, Program, load_program, profiled, ZERO_ADDRESS, \
+    TYPE_ENUMS, MAX_INNER_TXNS, MAX_ACCOUNTS, \
+    NO_OP, OPT_IN, CLOSE_OUT, CLEAR_STATE, UPDATE_APPLICATION, DELETE_APPLICATION
+
+# ---------------------------------------------------------------
+
+MIN_TX_FEE = 1_000
+MIN_BALANCE = 100_000
+# Minimum balance requirements of assets, apps and boxes
+ASSET_MIN_BALANCE = 100_000
+APP_MIN_BALANCE = 100_000
+SCHEMA_UINT_MIN_BALANCE = 28_500
+SCHEMA_BYTES_MIN_BALANCE = 50_000
+BOX_FLAT_MIN_BALANCE = 2_500
+BOX_BYTE_MIN_BALANCE = 400
+
+GENESIS_HASH = base64.b64encode(b"local-ledger-genesis-hash-32-byt").decode()
+GENESIS_ID = "local-v1"
+GENESIS_TIMESTAMP = 1_672_531_200
+ROUND_TIME = 3
+
+_MISSING = object()
+
+
+class App:
+
+    __slots__ = ("id", "creator", "approval", "clear", "approval_bytecode", "clear_bytecode", "global_schema",
+                 "local_schema", "extra_pages", "state", "boxes")
+
+    def __init__(self, app_id: int, creator: bytes, approval, clear, approval_bytecode: bytes, clear_bytecode: bytes,
+                 global_schema: tuple, local_schema: tuple, extra_pages: int = 0):
+        self.id = app_id
+        self.creator = creator
+        # Programs (avm.Program) or, for the fakes, objects with call(context)
+        self.approval = approval
+        self.clear = clear
+        self.approval_bytecode = approval_bytecode
+        self.clear_bytecode = clear_bytecode
+        # Schemas as (number of uints, number of byte slices)
+        self.global_schema = global_schema
+        self.local_schema = local_schema
+        self.extra_pages = extra_pages
+        # Global state: key -> int or bytes, and boxes: name -> value
+        self.state = {}
+        self.boxes = {}
+
+
+# Context of a call of a fake app, with the same attributes as avm.Evaluation that the ledger uses
+class FakeCall:
+
+    __slots__ = ("ledger", "group", "txns", "index", "txn", "app_id", "app", "caller", "depth", "logs", "cost")
+
+    def __init__(self, ledger, group: GroupContext, txns: list, index: int, app: App, caller, depth: int):
+        self.ledger = ledger
+        self.group = group
+        self.txns = txns
+        self.index = index
+        self.txn = txns[index]
+        self.app_id = app.id
+        self.app = app
+        self.caller = caller
+        self.depth = depth
+        self.logs = []
+        self.cost = 0
+
+    # Function issues the inner transactions of the fake app
+    def submit(self, itxns: list):
+        for t in itxns:
+            t.setdefault("Sender", self.ledger.app_address(self.app_id))
+            t.setdefault("Fee", 0)
+        return self.ledger.submit_inner(self, itxns)
+
+
+class LocalLedger:
+
+    def __init__(self, dev_mode: bool = False, min_fee: int = MIN_TX_FEE):
+        # Whether each group is committed in its own round
+        self.dev_mode = dev_mode
+        self.min_fee = min_fee
+        self.base_min_balance = MIN_BALANCE
+        # Last committed round - groups are evaluated in the round following it
+        self.last_round = 1
+        # Balances of the accounts and their minimum balances above MIN_BALANCE: address (32 bytes) -> microAlgos
+        self.balances = {}
+        self.min_balances = {}
+        # Assets: asset ID -> params (by names of asset_params_get), and holdings: (address, asset ID) -> amount
+        self.assets = {}
+        self.holdings = {}
+        # Apps: app ID -> App, and local states: (address, app ID) -> {key: int or bytes}
+        self.apps = {}
+        self.local = {}
+        # Results of the confirmed transactions: tx ID -> pending transaction info
+        self.confirmed = {}
+        # Number of evaluated groups, transactions and app calls, and the opcode cost spent by them
+        self.groups = 0
+        self.txns = 0
+        self.app_calls = 0
+        self.cost = 0
+        # Time spent evaluating the groups [s]
+        self.evaluation_time = 0.0
+        # Last applied group (with the fields set by its evaluation, e.g. Logs, Cost and InnerTxns)
+        self.last_group = None
+        # If set to a dict, the opcode costs of the evaluated programs are added to it by app ID and opcode name
+        self.profile = None
+
+        self._next_id = 1000
+        self._addresses = {}
+        self._journal = []
+        # Accounts whose balances changed in the transaction being applied
+        self._touched = set()
+        self._cond = threading.Condition(threading.RLock())
+
+    @property
+    def round(self):
+        return self.last_round + 1
+
+    @property
+    def timestamp(self):
+        return GENESIS_TIMESTAMP + ROUND_TIME * self.round
+
+    # Advance the last committed round
+    def advance(self, rounds: int = 1):
+        with self._cond:
+            self.last_round += rounds
+            self._cond.notify_all()
+
+    # -----    Journal     -----
+    def set(self, d: dict, key, value):
+        self._journal.append((d, key, d.get(key, _MISSING)))
+        d[key] = value
+
+    def delete(self, d: dict, key):
+        self._journal.append((d, key, d[key]))
+        del d[key]
+
+    def _rollback(self, mark: int = 0):
+        journal = self._journal
+        while len(journal) > mark:
+            d, key, old = journal.pop()
+            if old is _MISSING:
+                d.pop(key, None)
+            else:
+                d[key] = old
+
+    # -----    Accounts     -----
+    def app_address(self, app_id: int):
+        address = self._addresses.get(app_id)
+        if address is None:
+            address = encoding.decode_address(get_application_address(app_id))
+            self._addresses[app_id] = address
+        return address
+
+    @staticmethod
+    def encode_address(address: bytes):
+        return encoding.encode_address(address)
+
+    def min_balance(self, address: bytes):
+        return MIN_BALANCE + self.min_balances.get(address, 0)
+
+    def _add_min_balance(self, address: bytes, amount: int):
+        self.set(self.min_balances, address, self.min_balances.get(address, 0) + amount)
+        self._touched.add(address)
+
+    def _move(self, sender: bytes, receiver: bytes, amount: int):
+        balance = self.balances.get(sender, 0)
+        if balance < amount:
+            raise AVMError("overspend (account {}, data balance {}, tried to spend {})".format(
+                self.encode_address(sender), balance, amount))
+        self.set(self.balances, sender, balance - amount)
+        self.set(self.balances, receiver, self.balances.get(receiver, 0) + amount)
+        self._touched.add(sender)
+        self._touched.add(receiver)
+
+    # Fees are burnt, i.e. the fee sink isn't tracked
+    def _pay_fee(self, sender: bytes, fee: int):
+        balance = self.balances.get(sender, 0)
+        if balance < fee:
+            raise AVMError("overspend (account {}, data balance {}, tried to spend {})".format(
+                self.encode_address(sender), balance, fee))
+        self.set(self.balances, sender, balance - fee)
+        self._touched.add(sender)
+
+    def _move_asset(self, sender: bytes, receiver: bytes, asset_id: int, amount: int):
+        holding = self.holdings.get((sender, asset_id))
+        if holding is None:
+            raise AVMError("asset {} missing from {}".format(asset_id, self.encode_address(sender)))
+        if (receiver, asset_id) not in self.holdings:
+            raise AVMError("receiver {} not opted in to asset {}".format(self.encode_address(receiver), asset_id))
+        if holding < amount:
+            raise AVMError("underflow on subtracting {} from sender amount {}".format(amount, holding))
+        self.set(self.holdings, (sender, asset_id), holding - amount)
+        self.set(self.holdings, (receiver, asset_id), self.holdings[(receiver, asset_id)] + amount)
+
+    def _check_min_balances(self):
+        for address in self._touched:
+            balance = self.balances.get(address, 0)
+            extra = self.min_balances.get(address, 0)
+            # Closed accounts are allowed to have zero balance
+            if balance == 0 and extra == 0:
+                continue
+            if balance < MIN_BALANCE + extra:
+                raise AVMError("account {} balance {} below min {}".format(
+                    self.encode_address(address), balance, MIN_BALANCE + extra))
+        self._touched.clear()
+
+    # -----    Boxes     -----
+    def put_box(self, app: App, name: bytes, value: bytes):
+        if name not in app.boxes:
+            self._add_min_balance(self.app_address(app.id),
+                                  BOX_FLAT_MIN_BALANCE + BOX_BYTE_MIN_BALANCE * (len(name) + len(value)))
+        self.set(app.boxes, name, value)
+
+    def delete_box(self, app: App, name: bytes):
+        self._add_min_balance(self.app_address(app.id),
+                              -BOX_FLAT_MIN_BALANCE - BOX_BYTE_MIN_BALANCE * (len(name) + len(app.boxes[name])))
+        self.delete(app.boxes, name)
+
+    # -----    Setup     -----
+    def _new_id(self):
+        self._next_id += 1
+        return self._next_id
+
+    # Fund the account (address as string)
+    def fund(self, address: str, amount: int):
+        with self._cond:
+            address = encoding.decode_address(address)
+            self.balances[address] = self.balances.get(address, 0) + amount
+            self._journal.clear()
+
+    # Create an asset with its whole supply held by the creator (address as string), returns its ID
+    def create_asset(self, creator: str, total: int, decimals: int = 0, unit_name: str = ""):
+        with self._cond:
+            asset_id = self._new_id()
+            creator = encoding.decode_address(creator)
+            self._create_asset(asset_id, creator, total, decimals, unit_name.encode(), b"")
+            self._journal.clear()
+            self._touched.clear()
+            return asset_id
+
+    def _create_asset(self, asset_id: int, creator: bytes, total: int, decimals: int, unit_name: bytes, name: bytes):
+        self.set(self.assets, asset_id, {
+            "AssetTotal": total, "AssetDecimals": decimals, "AssetDefaultFrozen": 0, "AssetUnitName": unit_name,
+            "AssetName": name, "AssetURL": b"", "AssetMetadataHash": b"", "AssetManager": creator,
+            "AssetReserve": creator, "AssetFreeze": ZERO_ADDRESS, "AssetClawback": ZERO_ADDRESS,
+            "AssetCreator": creator,
+        })
+        self.set(self.holdings, (creator, asset_id), total)
+        self._add_min_balance(creator, ASSET_MIN_BALANCE)
+
+    # Opt the account (address as string) into the asset and transfer it the amount from the sender (if given)
+    def give_asset(self, address: str, asset_id: int, amount: int = 0, sender: str = None):
+        with self._cond:
+            address = encoding.decode_address(address)
+            if (address, asset_id) not in self.holdings:
+                self.holdings[(address, asset_id)] = 0
+                self.min_balances[address] = self.min_balances.get(address, 0) + ASSET_MIN_BALANCE
+            if amount:
+                self._move_asset(encoding.decode_address(sender), address, asset_id, amount)
+            self._journal.clear()
+
+    # Set global state keys and boxes of the app, e.g. to start from a state that would take long to reach by calls -
+    # the boxes add to the minimum balance of the app's account
+    def set_app_state(self, app_id: int, state: dict = None, boxes: dict = None):
+        with self._cond:
+            app = self.apps[app_id]
+            app.state.update(state or {})
+            for name, value in (boxes or {}).items():
+                self.put_box(app, name, value)
+            self._journal.clear()
+            self._touched.clear()
+
+    # Create an app implemented in Python (one of the fakes below), returns its ID
+    def create_fake_app(self, fake, global_schema: tuple = (0, 0), local_schema: tuple = (0, 0)):
+        with self._cond:
+            app_id = self._new_id()
+            app = App(app_id, ZERO_ADDRESS, fake, fake, b"", b"", global_schema, local_schema)
+            self.apps[app_id] = app
+            fake.app_id = app_id
+            return app_id
+
+    # -----    Evaluation     -----
+    # Function evaluates the atomic group of transactions (dicts of their fields, see txn_fields) in the round
+    # following the last committed one. Returns the applied transactions, or raises error.AlgodHTTPError if the group
+    # was rejected - in which case the ledger is left unchanged.
+    def evaluate(self, txns: list):
+        with self._cond:
+            start = perf_counter()
+            try:
+                if not 1 <= len(txns) <= MAX_GROUP_SIZE:
+                    raise AVMError("group size {} is not between 1 and {}".format(len(txns), MAX_GROUP_SIZE))
+                for i, t in enumerate(txns):
+                    if not t.get("FirstValid", 0) <= self.round <= t.get("LastValid", self.round):
+                        raise AVMError("transaction {} is not valid in round {}".format(i, self.round))
+                    if t.get("Type") == b"appl":
+                        references = len(t["Accounts"]) + len(t["Assets"]) + len(t["Applications"]) + len(t["Boxes"])
+                        if len(t["Accounts"]) > MAX_ACCOUNTS or references > MAX_REFERENCES:
+                            raise AVMError("transaction {} has too many references: {} with {} accounts".format(
+                                i, references, len(t["Accounts"])))
+                group = GroupContext(txns, self.min_fee)
+                if group.fee_credit < 0:
+                    raise AVMError("fee too small: group fees {} below {}".format(
+                        sum(t["Fee"] for t in txns), self.min_fee * len(txns)))
+                for i in range(len(txns)):
+                    try:
+                        self._apply(group, txns, i, None, 0)
+                        self._check_min_balances()
+                    except AVMError as e:
+                        raise AVMError("transaction {}: {}".format(i, e)) from None
+            except AVMError as e:
+                self._rollback()
+                self._touched.clear()
+                self.evaluation_time += perf_counter() - start
+                raise error.AlgodHTTPError(str(e), 400) from None
+
+            self._journal.clear()
+            self.groups += 1
+            self.txns += len(txns)
+            self.cost += group.spent
+            self.last_group = txns
+            self.evaluation_time += perf_counter() - start
+            if self.dev_mode:
+                self.advance()
+            return txns
+
+    def _apply(self, group: GroupContext, txns: list, index: int, caller, depth: int):
+        t = txns[index]
+        t["GroupIndex"] = index
+        sender = t["Sender"]
+        fee = t.get("Fee", 0)
+        if fee:
+            self._pay_fee(sender, fee)
+        type_enum = t["TypeEnum"]
+        if type_enum == 6:
+            self._application_call(group, txns, index, caller, depth)
+        elif type_enum == 1:
+            self._payment(t)
+        elif type_enum == 4:
+            self._asset_transfer(t)
+        elif type_enum == 3:
+            self._asset_config(group, t)
+        else:
+            raise AVMError("unsupported transaction type {}".format(t.get("Type")))
+
+    def _payment(self, t: dict):
+        sender = t["Sender"]
+        self._move(sender, t.get("Receiver", ZERO_ADDRESS), t.get("Amount", 0))
+        close_to = t.get("CloseRemainderTo", ZERO_ADDRESS)
+        if close_to != ZERO_ADDRESS:
+            if self.min_balances.get(sender, 0) != 0:
+                raise AVMError("account {} cannot be closed while it holds assets or apps".format(
+                    self.encode_address(sender)))
+            self._move(sender, close_to, self.balances.get(sender, 0))
+
+    def _asset_transfer(self, t: dict):
+        sender = t["Sender"]
+        asset_id = t.get("XferAsset", 0)
+        params = self.assets.get(asset_id)
+        if params is None:
+            raise AVMError("asset {} does not exist".format(asset_id))
+        amount = t.get("AssetAmount", 0)
+        receiver = t.get("AssetReceiver", ZERO_ADDRESS)
+        source = t.get("AssetSender", ZERO_ADDRESS)
+        if source != ZERO_ADDRESS:
+            if sender != params["AssetClawback"]:
+                raise AVMError("clawback not allowed: sender is not the clawback of asset {}".format(asset_id))
+        else:
+            source = sender
+
+        # Opt-in
+        if receiver == source and amount == 0 and (source, asset_id) not in self.holdings:
+            self.set(self.holdings, (source, asset_id), 0)
+            self._add_min_balance(source, ASSET_MIN_BALANCE)
+            return
+
+        if amount > 0 or receiver != ZERO_ADDRESS:
+            self._move_asset(source, receiver, asset_id, amount)
+        close_to = t.get("AssetCloseTo", ZERO_ADDRESS)
+        if close_to != ZERO_ADDRESS:
+            self._move_asset(source, close_to, asset_id, self.holdings[(source, asset_id)])
+            self.delete(self.holdings, (source, asset_id))
+            self._add_min_balance(source, -ASSET_MIN_BALANCE)
+
+    def _asset_config(self, group: GroupContext, t: dict):
+        if t.get("ConfigAsset", 0) != 0:
+            raise AVMError("only asset creation is supported")
+        asset_id = self._new_id()
+        self._create_asset(asset_id, t["Sender"], t.get("ConfigAssetTotal", 0), t.get("ConfigAssetDecimals", 0),
+                           t.get("ConfigAssetUnitName", b""), t.get("ConfigAssetName", b""))
+        t["CreatedAssetID"] = asset_id
+        group.created_assets.add(asset_id)
+
+    def _application_call(self, group: GroupContext, txns: list, index: int, caller, depth: int):
+        t = txns[index]
+        sender = t["Sender"]
+        app_id = t.get("ApplicationID", 0)
+        on_completion = t.get("OnCompletion", NO_OP)
+        self.app_calls += 1
+
+        if app_id == 0:
+            app = self._create_app(t)
+            group.created_apps.add(app.id)
+        else:
+            app = self.apps.get(app_id)
+            if app is None:
+                raise AVMError("app {} does not exist".format(app_id))
+
+        if on_completion == CLEAR_STATE:
+            self._clear_state(group, txns, index, app, caller, depth)
+            return
+
+        if on_completion == OPT_IN:
+            if (sender, app.id) in self.local:
+                raise AVMError("account {} has already opted in to app {}".format(self.encode_address(sender),
+                                                                                   app.id))
+            self.set(self.local, (sender, app.id), {})
+            self._add_min_balance(sender, self._schema_min_balance(app.local_schema))
+
+        if not self._run(app.approval, group, txns, index, app, caller, depth):
+            raise AVMError("rejected by ApprovalProgram of app {}".format(app.id))
+
+        if on_completion == CLOSE_OUT:
+            self._close_out(sender, app)
+        elif on_completion == DELETE_APPLICATION:
+            self.delete(self.apps, app.id)
+            self._add_min_balance(app.creator, -self._app_min_balance(app))
+        elif on_completion == UPDATE_APPLICATION:
+            self.set(self.apps, app.id, self._updated_app(app, t))
+
+    def _create_app(self, t: dict):
+        app_id = self._new_id()
+        approval = t.get("ApprovalProgram", b"")
+        clear = t.get("ClearStateProgram", b"")
+        app = App(app_id, t["Sender"], load_program(approval), load_program(clear), approval, clear,
+                  (t.get("GlobalNumUint", 0), t.get("GlobalNumByteSlice", 0)),
+                  (t.get("LocalNumUint", 0), t.get("LocalNumByteSlice", 0)), t.get("ExtraProgramPages", 0))
+        self.set(self.apps, app_id, app)
+        self._add_min_balance(app.creator, self._app_min_balance(app))
+        t["CreatedApplicationID"] = app_id
+        return app
+
+    def _updated_app(self, app: App, t: dict):
+        approval = t.get("ApprovalProgram", b"")
+        clear = t.get("ClearStateProgram", b"")
+        updated = App(app.id, app.creator, load_program(approval), load_program(clear), approval, clear,
+                      app.global_schema, app.local_schema, app.extra_pages)
+        updated.state = app.state
+        updated.boxes = app.boxes
+        return updated
+
+    @staticmethod
+    def _schema_min_balance(schema: tuple):
+        return APP_MIN_BALANCE + SCHEMA_UINT_MIN_BALANCE * schema[0] + SCHEMA_BYTES_MIN_BALANCE * schema[1]
+
+    def _app_min_balance(self, app: App):
+        return self._schema_min_balance(app.global_schema) + APP_MIN_BALANCE * app.extra_pages
+
+    def _close_out(self, sender: bytes, app: App):
+        if (sender, app.id) not in self.local:
+            raise AVMError("account {} is not opted in to app {}".format(self.encode_address(sender), app.id))
+        self.delete(self.local, (sender, app.id))
+        self._add_min_balance(sender, -self._schema_min_balance(app.local_schema))
+
+    # The clear state program can't reject the clearing - if it fails, only its changes are rolled back
+    def _clear_state(self, group: GroupContext, txns: list, index: int, app: App, caller, depth: int):
+        mark = len(self._journal)
+        try:
+            self._run(app.clear, group, txns, index, app, caller, depth)
+        except AVMError:
+            self._rollback(mark)
+        self._close_out(txns[index]["Sender"], app)
+
+    def _run(self, program, group: GroupContext, txns: list, index: int, app: App, caller, depth: int):
+        t = txns[index]
+        if isinstance(program, Program):
+            if self.profile is not None:
+                program = profiled(program, self.profile.setdefault(app.id, {}))
+            context = Evaluation(self, group, txns, index, app, program, caller, depth)
+            context.check_box_read_budget()
+            approved = context.run()
+        else:
+            context = FakeCall(self, group, txns, index, app, caller, depth)
+            approved = program.call(context)
+        t["Logs"] = context.logs
+        t["Cost"] = context.cost
+        return approved
+
+    # Function applies the inner transactions issued by the (fake) app call in context, as avm.Evaluation does on
+    # itxn_submit. Returns the applied transactions.
+    def submit_inner(self, context, itxns: list):
+        group = context.group
+        group.inner_txns += len(itxns)
+        if group.inner_txns > MAX_INNER_TXNS:
+            raise AVMError("too many inner transactions {} with {} left".format(len(itxns), 0))
+        group.fee_credit += sum(t.get("Fee", 0) for t in itxns) - self.min_fee * len(itxns)
+        if group.fee_credit < 0:
+            raise AVMError("fee too small: inner transactions are short of {}".format(-group.fee_credit))
+        for t in itxns:
+            if t.get("TypeEnum") == 6:
+                group.budget += APP_CALL_BUDGET
+        for i, t in enumerate(itxns):
+            try:
+                self._apply(group, itxns, i, context, context.depth + 1)
+            except AVMError as e:
+                raise AVMError("inner tx {} failed: {}".format(i, e)) from None
+        context.txn.setdefault("InnerTxns", []).extend(itxns)
+        return itxns
+
+    # -----    algod client methods    -----
+    def status(self):
+        with self._cond:
+            return {"last-round": self.last_round, "time-since-last-round": 0, "catchup-time": 0}
+
+    def status_after_block(self, block_num: int):
+        with self._cond:
+            self._cond.wait_for(lambda: self.last_round > block_num, 60)
+            return self.status()
+
+    def suggested_params(self):
+        with self._cond:
+            return transaction.SuggestedParams(0, self.last_round, self.last_round + 1000, GENESIS_HASH, GENESIS_ID,
+                                               min_fee=self.min_fee)
+
+    def send_transactions(self, txns: list, **kwargs):
+        tx_ids = [stxn.get_txid() for stxn in txns]
+        with self._cond:
+            for tx_id in tx_ids:
+                if tx_id in self.confirmed:
+                    raise error.AlgodHTTPError("transaction already in ledger: {}".format(tx_id), 400)
+            applied = self.evaluate([txn_fields(getattr(stxn, "transaction", stxn), tx_id)
+                                     for stxn, tx_id in zip(txns, tx_ids)])
+            for tx_id, t in zip(tx_ids, applied):
+                self.confirmed[tx_id] = _pending_info(t, self.round - 1 if self.dev_mode else self.round)
+        return tx_ids[0]
+
+    def send_transaction(self, txn, **kwargs):
+        return self.send_transactions([txn], **kwargs)
+
+    def pending_transaction_info(self, transaction_id: str, **kwargs):
+        with self._cond:
+            info = self.confirmed.get(transaction_id)
+            if info is None:
+                raise error.AlgodHTTPError("txn does not exist", 404)
+            return info
+
+    def application_info(self, application_id: int, **kwargs):
+        with self._cond:
+            app = self.apps.get(application_id)
+            if app is None:
+                raise error.AlgodHTTPError("application does not exist", 404)
+            return {"id": app.id, "params": {
+                "creator": self.encode_address(app.creator),
+                "approval-program": base64.b64encode(app.approval_bytecode).decode(),
+                "clear-state-program": base64.b64encode(app.clear_bytecode).decode(),
+                "extra-program-pages": app.extra_pages,
+                "global-state": encode_state(app.state),
+                "global-state-schema": {"num-uint": app.global_schema[0], "num-byte-slice": app.global_schema[1]},
+                "local-state-schema": {"num-uint": app.local_schema[0], "num-byte-slice": app.local_schema[1]},
+            }}
+
+    def account_info(self, address: str, exclude=None, **kwargs):
+        with self._cond:
+            key = encoding.decode_address(address)
+            return {
+                "address": address,
+                "amount": self.balances.get(key, 0),
+                "min-balance": self.min_balance(key) if key in self.balances else 0,
+                "assets": [{"asset-id": asset_id, "amount": amount, "is-frozen": False}
+                           for (holder, asset_id), amount in self.holdings.items() if holder == key],
+                "apps-local-state": [{"id": app_id, "key-value": encode_state(kv)}
+                                     for (holder, app_id), kv in self.local.items() if holder == key],
+            }
+
+    def account_application_info(self, address: str, application_id: int, **kwargs):
+        with self._cond:
+            kv = self.local.get((encoding.decode_address(address), application_id))
+            if kv is None:
+                raise error.AlgodHTTPError("account application info not found", 404)
+            return {"app-local-state": {"id": application_id, "key-value": encode_state(kv)}}
+
+    def account_asset_info(self, address: str, asset_id: int, **kwargs):
+        with self._cond:
+            amount = self.holdings.get((encoding.decode_address(address), asset_id))
+            if amount is None:
+                raise error.AlgodHTTPError("account asset info not found", 404)
+            return {"asset-holding": {"asset-id": asset_id, "amount": amount, "is-frozen": False}}
+
+    def application_boxes(self, application_id: int, limit: int = 0, **kwargs):
+        with self._cond:
+            app = self.apps.get(application_id)
+            names = list(app.boxes) if app is not None else []
+            return {"boxes": [{"name": base64.b64encode(name).decode()} for name in names]}
+
+    def application_box_by_name(self, application_id: int, box_name: bytes, **kwargs):
+        with self._cond:
+            app = self.apps.get(application_id)
+            value = app.boxes.get(box_name) if app is not None else None
+            if value is None:
+                raise error.AlgodHTTPError("box not found", 404)
+            return {"name": base64.b64encode(box_name).decode(), "round": self.last_round,
+                    "value": base64.b64encode(value).decode()}
+
+
+# Function returns the fields of the transaction (algosdk transaction.Transaction) by their names in TEAL, as the
+# ledger evaluates it
+def txn_fields(txn: transaction.Transaction, tx_id: str = None):
+    t = {
+        "Sender": encoding.decode_address(txn.sender),
+        "Fee": txn.fee,
+        "FirstValid": txn.first_valid_round,
+        "LastValid": txn.last_valid_round,
+        "Note": txn.note or b"",
+        "Lease": txn.lease or b"",
+        "Type": txn.type.encode(),
+        "TypeEnum": TYPE_ENUMS[txn.type.encode()],
+    }
+    if tx_id is not None:
+        t["TxID"] = base64.b32decode(tx_id + "====")
+    if txn.group:
+        t["Group"] = txn.group
+    if txn.rekey_to:
+        t["RekeyTo"] = encoding.decode_address(txn.rekey_to)
+
+    if txn.type == "pay":
+        t["Receiver"] = encoding.decode_address(txn.receiver)
+        t["Amount"] = txn.amt
+        if txn.close_remainder_to:
+            t["CloseRemainderTo"] = encoding.decode_address(txn.close_remainder_to)
+    elif txn.type == "axfer":
+        t["XferAsset"] = txn.index
+        t["AssetAmount"] = txn.amount
+        t["AssetReceiver"] = encoding.decode_address(txn.receiver)
+        if txn.close_assets_to:
+            t["AssetCloseTo"] = encoding.decode_address(txn.close_assets_to)
+        if txn.revocation_target:
+            t["AssetSender"] = encoding.decode_address(txn.revocation_target)
+    elif txn.type == "acfg":
+        t["ConfigAsset"] = txn.index or 0
+        t["ConfigAssetTotal"] = txn.total or 0
+        t["ConfigAssetDecimals"] = txn.decimals or 0
+        t["ConfigAssetUnitName"] = (txn.unit_name or "").encode()
+        t["ConfigAssetName"] = (txn.asset_name or "").encode()
+    elif txn.type == "appl":
+        t["ApplicationID"] = txn.index
+        t["OnCompletion"] = int(txn.on_complete)
+        t["ApplicationArgs"] = list(txn.app_args or [])
+        t["Accounts"] = [encoding.decode_address(a) for a in txn.accounts or []]
+        t["Assets"] = list(txn.foreign_assets or [])
+        t["Applications"] = list(txn.foreign_apps or [])
+        t["Boxes"] = [(txn.index if b.app_index == 0 else t["Applications"][b.app_index - 1], b.name)
+                      for b in txn.boxes or []]
+        if txn.index == 0:
+            t["ApprovalProgram"] = txn.approval_program or b""
+            t["ClearStateProgram"] = txn.clear_program or b""
+            if txn.global_schema:
+                t["GlobalNumUint"] = txn.global_schema.num_uints
+                t["GlobalNumByteSlice"] = txn.global_schema.num_byte_slices
+            if txn.local_schema:
+                t["LocalNumUint"] = txn.local_schema.num_uints
+                t["LocalNumByteSlice"] = txn.local_schema.num_byte_slices
+            t["ExtraProgramPages"] = txn.extra_pages or 0
+        elif txn.on_complete == UPDATE_APPLICATION:
+            t["ApprovalProgram"] = txn.approval_program or b""
+            t["ClearStateProgram"] = txn.clear_program or b""
+    return t
+
+
+# Function returns the pending transaction info of the applied transaction, as algod returns it
+def _pending_info(t: dict, confirmed_round: int):
+    info = {"confirmed-round": confirmed_round, "pool-error": ""}
+    if t.get("Logs"):
+        info["logs"] = [base64.b64encode(log).decode() for log in t["Logs"]]
+    if t.get("InnerTxns"):
+        info["inner-txns"] = [_pending_info(inner, confirmed_round) for inner in t["InnerTxns"]]
+    if "CreatedApplicationID" in t:
+        info["application-index"] = t["CreatedApplicationID"]
+    if "CreatedAssetID" in t:
+        info["asset-index"] = t["CreatedAssetID"]
+    if "Cost" in t:
+        info["app-budget-consumed"] = t["Cost"]
+    return info
+
+
+# Encode state (with bytes keys) in the same format as algod returns it
+def encode_state(state: dict):
+    encoded = []
+    for key, value in state.items():
+        if isinstance(value, bytes):
+            v = {"type": 1, "bytes": base64.b64encode(value).decode(), "uint": 0}
+        else:
+            v = {"type": 2, "bytes": "", "uint": value}
+        encoded.append({"key": base64.b64encode(key).decode(), "value": v})
+    return encoded
+
+
+# -----    Fakes of the apps called by the contracts     -----
+# Fake of the associated contract of the SC, which the contracts only reference
+class FakeAssociatedContract:
+
+    app_id = 0
+
+    def call(self, context: FakeCall):
+        return True
+
+
+# Fake of the Cometa staking contract. The calls of the contracts carry the arguments [0x00, 0x03, 8 zero bytes, op],
+# where op is 0x02 || amount to stake (preceded in the group by a transfer of the amount to the SC), 0x03 || amount to
+# unstake, or 9 zero bytes to claim the rewards - whose amount is logged in bytes 16-24 of the last log.
+# The rewards are distributed at reward_per_round among the stakers proportionally to their stakes from the start until
+# the end of the pool. The global state 0x00 holds the asset(s) and the rounds of the pool at the offsets the contracts
+# read them from.
+class FakeStakingContract:
+
+    # Precision of the accumulated rewards per staked unit
+    SCALE = 1 << 64
+    # Local state schema - the contracts fund one byte slice for their opt-in
+    LOCAL_SCHEMA = (0, 1)
+
+    def __init__(self, ledger: LocalLedger, s_asa_id: int, r_asa_id: int, start_round: int, end_round: int,
+                 reward_per_round: int, farm: bool):
+        self.app_id = 0
+        self.s_asa_id = s_asa_id
+        self.r_asa_id = r_asa_id
+        self.start_round = start_round
+        self.end_round = end_round
+        self.reward_per_round = reward_per_round
+        self.farm = farm
+        # Pool: total stake, accumulated rewards per staked unit and the round up to which they were accumulated
+        self.pool = {"total": 0, "acc": 0, "round": start_round}
+        # Stakes, accumulated rewards per unit at their last update, and unclaimed rewards of the stakers
+        self.stakes = {}
+        self.debts = {}
+        self.rewards = {}
+
+    def global_state(self):
+        state = bytearray(80)
+        fields = [self.s_asa_id, self.r_asa_id, self.start_round, self.end_round] if self.farm else \
+            [self.s_asa_id, self.start_round, self.end_round]
+        for i, value in enumerate(fields):
+            state[48 + 8 * i:56 + 8 * i] = value.to_bytes(8, 'big')
+        return {b"\x00": bytes(state)}
+
+    def call(self, context: FakeCall):
+        ledger = context.ledger
+        t = context.txn
+        sender = t["Sender"]
+        on_completion = t.get("OnCompletion", NO_OP)
+        if on_completion in (OPT_IN, CLEAR_STATE, CLOSE_OUT):
+            if on_completion != OPT_IN:
+                self._update(ledger)
+                ledger.set(self.pool, "total", self.pool["total"] - self.stakes.get(sender, 0))
+                for d in (self.stakes, self.debts, self.rewards):
+                    if sender in d:
+                        ledger.delete(d, sender)
+            return True
+
+        args = t.get("ApplicationArgs", ())
+        if len(args) != 4 or args[:3] != [b"\x00", b"\x03", bytes(8)]:
+            raise AVMError("SC: unknown call")
+        op = args[3]
+        self._update(ledger)
+        self._accrue(ledger, sender)
+        stake = self.stakes.get(sender, 0)
+
+        if op[:1] == b"\x02" and len(op) == 9:
+            amount = int.from_bytes(op[1:], 'big')
+            xfer = context.txns[context.index - 1] if context.index > 0 else {}
+            if xfer.get("TypeEnum") != 4 or xfer.get("XferAsset") != self.s_asa_id or \
+                    xfer.get("AssetReceiver") != ledger.app_address(self.app_id) or \
+                    xfer.get("AssetAmount") != amount:
+                raise AVMError("SC: stake must be preceded by the transfer of the staked amount")
+            ledger.set(self.stakes, sender, stake + amount)
+            ledger.set(self.pool, "total", self.pool["total"] + amount)
+        elif op[:1] == b"\x03" and len(op) == 9:
+            amount = int.from_bytes(op[1:], 'big')
+            if amount > stake:
+                raise AVMError("SC: unstaking more than staked")
+            ledger.set(self.stakes, sender, stake - amount)
+            ledger.set(self.pool, "total", self.pool["total"] - amount)
+            context.submit([_asset_transfer(sender, self.s_asa_id, amount)])
+        elif op == bytes(9):
+            amount = self.rewards.get(sender, 0)
+            ledger.set(self.rewards, sender, 0)
+            if amount:
+                context.submit([_asset_transfer(sender, self.r_asa_id, amount)])
+            context.logs.append(bytes(16) + amount.to_bytes(8, 'big'))
+        else:
+            raise AVMError("SC: unknown operation")
+        return True
+
+    # Accumulate the rewards per staked unit up to the current round (within the pool)
+    def _update(self, ledger: LocalLedger):
+        pool = self.pool
+        r = min(max(ledger.round, self.start_round), self.end_round)
+        if r > pool["round"]:
+            if pool["total"] > 0:
+                ledger.set(pool, "acc", pool["acc"] + self.reward_per_round * (r - pool["round"]) * self.SCALE //
+                           pool["total"])
+            ledger.set(pool, "round", r)
+
+    # Add the rewards of the staker accumulated since their last update
+    def _accrue(self, ledger: LocalLedger, staker: bytes):
+        acc = self.pool["acc"]
+        earned = self.stakes.get(staker, 0) * (acc - self.debts.get(staker, 0)) // self.SCALE
+        if earned:
+            ledger.set(self.rewards, staker, self.rewards.get(staker, 0) + earned)
+        if self.debts.get(staker) != acc:
+            ledger.set(self.debts, staker, acc)
+
+
+# Fake of the Tinyman AMM's single-sided liquidity addition, called with the arguments ["add_liquidity", "single",
+# minimum amount out] after the transfer of the added amount to the pool address. The pool tokens are paid out from the
+# pool address at tokens_per_unit of the added asset.
+class FakeAMM:
+
+    def __init__(self, pool_address: str, tokens_per_unit: float):
+        self.app_id = 0
+        self.pool_address = encoding.decode_address(pool_address)
+        self.tokens_per_unit = tokens_per_unit
+
+    def call(self, context: FakeCall):
+        t = context.txn
+        args = t.get("ApplicationArgs", ())
+        if len(args) != 3 or args[:2] != [b"add_liquidity", b"single"]:
+            raise AVMError("AMM: unknown call")
+        xfer = context.txns[context.index - 1] if context.index > 0 else {}
+        if xfer.get("TypeEnum") != 4 or xfer.get("AssetReceiver") != self.pool_address:
+            raise AVMError("AMM: liquidity addition must be preceded by the transfer to the pool")
+        pool_token = t.get("Assets", [0])[0]
+        amount_out = int(xfer.get("AssetAmount", 0) * self.tokens_per_unit)
+        if amount_out < int.from_bytes(args[2], 'big'):
+            raise AVMError("AMM: amount out below the minimum")
+        context.ledger.submit_inner(context, [dict(_asset_transfer(t["Sender"], pool_token, amount_out),
+                                                   Sender=self.pool_address, Fee=0)])
+        return True
+
+
+def _asset_transfer(receiver: bytes, asset_id: int, amount: int):
+    return {"Type": b"axfer", "TypeEnum": 4, "XferAsset": asset_id, "AssetReceiver": receiver,
+            "AssetAmount": amount}
+
+
+# Function creates the fake SC and its AC of a pool of the staking asset s_asa_id and reward asset r_asa_id (the same
+# for the compound contract), funded with the reward supply by reward_holder (address as string). Returns
+# [SC ID, AC ID, the fake SC].
+def create_staking_contract(
+    ledger: LocalLedger,
+    s_asa_id: int,
+    r_asa_id: int,
+    start_round: int,
+    end_round: int,
+    reward_per_round: int,
+    reward_holder: str,
+    farm: bool = False
+):
+    ac_id = ledger.create_fake_app(FakeAssociatedContract())
+    sc = FakeStakingContract(ledger, s_asa_id, r_asa_id, start_round, end_round, reward_per_round, farm)
+    sc_id = ledger.create_fake_app(sc, (0, 1), FakeStakingContract.LOCAL_SCHEMA)
+    ledger.apps[sc_id].state.update(sc.global_state())
+
+    sc_address = get_application_address(sc_id)
+    ledger.fund(sc_address, MIN_BALANCE + 2 * ASSET_MIN_BALANCE)
+    ledger.give_asset(sc_address, s_asa_id)
+    ledger.give_asset(sc_address, r_asa_id, reward_per_round * (end_round - start_round), reward_holder)
+    return [sc_id, ac_id, sc]
+
+
+# Function creates the fake AMM with its pool address (address as string), which holds the pool tokens s_asa_id and is
+# opted into the added asset r_asa_id. Returns the AMM ID.
+def create_amm(
+    ledger: LocalLedger,
+    pool_address: str,
+    s_asa_id: int,
+    r_asa_id: int,
+    pool_tokens: int,
+    token_holder: str,
+    tokens_per_unit: float = 1.0
+):
+    amm_id = ledger.create_fake_app(FakeAMM(pool_address, tokens_per_unit))
+    ledger.fund(pool_address, MIN_BALANCE + 2 * ASSET_MIN_BALANCE)
+    ledger.give_asset(pool_address, r_asa_id)
+    ledger.give_asset(pool_address, s_asa_id, pool_tokens, token_holder)
+    return amm_id
@@ -0,0 +1,213 @@
+# -----------------           Description          -----------------
+# Minimal stand-in for the algod REST API, serving boxes and global state of compounding contracts, the status and the
+# suggested transaction parameters, account balances and local states from memory, and compiling TEAL to stand-in bytecode. Sent transactions are accepted
+# without evaluation and confirmed in the next round. It is used for benchmarking the
+# off-chain tools without a live node. Each request can be delayed to emulate network latency, and rounds can advance in
+# real time.
+
+# -----------------           Imports          -----------------
+import base64
+import hashlib
+import json
+import threading
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from time import sleep
+from urllib.parse import urlparse, parse_qs
+
+import msgpack
+from algosdk.transaction import SignedTransaction
+
+# ---------------------------------------------------------------
+
+GENESIS_HASH = base64.b64encode(b"mock-algod-genesis-hash-32-bytes").decode()
+
+
+class _Server(ThreadingHTTPServer):
+    # Concurrent clients would otherwise overflow the default listen backlog of 5 connections
+    request_queue_size = 256
+    daemon_threads = True
+
+
+class MockAlgod:
+
+    def __init__(self, latency=0.0, round_time=None):
+        # Delay added to each response [s]
+        self.latency = latency
+        # Time between rounds [s] - if None, rounds only advance with advance()
+        self.round_time = round_time
+        # Boxes of each app: app_id -> {box name (bytes): box value (bytes)}
+        self.boxes = {}
+        # Global state of each app: app_id -> {key (str): int or bytes}
+        self.global_state = {}
+        # Balance and minimum balance of each account: address -> [balance, min balance]
+        self.accounts = {}
+        # Local state of each account opted into an app: (address, app_id) -> {key (str): int or bytes}
+        self.local_state = {}
+        # Holding of each account opted into an asset: (address, asa_id) -> amount
+        self.asset_holdings = {}
+        # Current round
+        self.round = 1
+        # Round in which each sent transaction was received: tx ID -> round
+        self.transactions = {}
+        # Number of served requests per endpoint
+        self.requests = Counter()
+
+        self._round_cond = threading.Condition()
+        self._stop = threading.Event()
+        self._server = _Server(("127.0.0.1", 0), self._handler())
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+
+    @property
+    def address(self):
+        return "http://127.0.0.1:{}".format(self._server.server_address[1])
+
+    def start(self):
+        self._thread.start()
+        if self.round_time is not None:
+            threading.Thread(target=self._advance_rounds, daemon=True).start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        self.advance(0)
+        self._server.shutdown()
+        self._server.server_close()
+
+    # Advance the current round
+    def advance(self, rounds=1):
+        with self._round_cond:
+            self.round += rounds
+            self._round_cond.notify_all()
+
+    def _advance_rounds(self):
+        while not self._stop.wait(self.round_time):
+            self.advance()
+
+    # Record a compounding contract with the supplied box entries, packed by per_box into boxes numbered from 1 onward
+    def add_compound_contract(self, app_id, increments, size=16, per_box=64):
+        self.boxes[app_id] = {
+            (box + 1).to_bytes(8, 'big'):
+                b"".join(inc.to_bytes(size, 'big') for inc in increments[box * per_box:(box + 1) * per_box])
+            for box in range((len(increments) + per_box - 1) // per_box)
+        }
+        self.global_state[app_id] = {"NB": len(increments)}
+
+    # Record the msgpack encoded signed transactions as received in the current round, returning their IDs
+    def _receive(self, body):
+        unpacker = msgpack.Unpacker(raw=False, strict_map_key=False)
+        unpacker.feed(body)
+        tx_ids = [SignedTransaction.undictify(stxn).get_txid() for stxn in unpacker]
+        with self._round_cond:
+            for tx_id in tx_ids:
+                self.transactions[tx_id] = self.round
+        return tx_ids
+
+    def _handler(self):
+        mock = self
+
+        class Handler(BaseHTTPRequestHandler):
+            # Keep connections alive for clients that reuse them
+            protocol_version = "HTTP/1.1"
+            disable_nagle_algorithm = True
+
+            def log_message(self, format, *args):
+                pass
+
+            def do_GET(self):
+                url = urlparse(self.path)
+                parts = url.path.strip("/").split("/")
+                mock.requests[_endpoint(parts)] += 1
+                if mock.latency:
+                    sleep(mock.latency)
+
+                if parts == ["versions"]:
+                    return self._reply({"genesis_hash_b64": GENESIS_HASH, "genesis_id": "mock-v1"})
+                if parts == ["v2", "status"]:
+                    return self._reply({"last-round": mock.round})
+                if parts[:3] == ["v2", "status", "wait-for-block-after"]:
+                    with mock._round_cond:
+                        mock._round_cond.wait_for(lambda: mock.round > int(parts[3]) or mock._stop.is_set(), 60)
+                    return self._reply({"last-round": mock.round})
+                if parts == ["v2", "transactions", "params"]:
+                    return self._reply({"consensus-version": "future", "fee": 0, "genesis-hash": GENESIS_HASH,
+                                        "genesis-id": "mock-v1", "last-round": mock.round, "min-fee": 1000})
+                if len(parts) == 4 and parts[:3] == ["v2", "transactions", "pending"]:
+                    if parts[3] not in mock.transactions:
+                        return self._reply({"message": "txn does not exist"}, 404)
+                    confirmed_round = mock.transactions[parts[3]] + 1
+                    return self._reply({"confirmed-round": confirmed_round if mock.round >= confirmed_round else 0,
+                                        "pool-error": ""})
+                if len(parts) >= 3 and parts[:2] == ["v2", "accounts"]:
+                    address = parts[2]
+                    if len(parts) == 3:
+                        amount, min_balance = mock.accounts.get(address, (0, 0))
+                        return self._reply({"address": address, "amount": amount, "min-balance": min_balance})
+                    if parts[3] == "applications" and (address, int(parts[4])) in mock.local_state:
+                        return self._reply({"app-local-state": {"id": int(parts[4]), "key-value": encode_state(
+                            mock.local_state[(address, int(parts[4]))])}})
+                    if parts[3] == "assets" and (address, int(parts[4])) in mock.asset_holdings:
+                        return self._reply({"asset-holding": {"asset-id": int(parts[4]), "amount": mock.asset_holdings[
+                            (address, int(parts[4]))], "is-frozen": False}})
+                    return self._reply({"message": "account application info not found"}, 404)
+                if len(parts) >= 3 and parts[:2] == ["v2", "applications"]:
+                    app_id = int(parts[2])
+                    if len(parts) == 3:
+                        return self._reply({"id": app_id, "params": {"global-state": encode_state(
+                            mock.global_state.get(app_id, {}))}})
+                    if parts[3] == "boxes":
+                        return self._reply({"boxes": [{"name": base64.b64encode(n).decode()}
+                                                      for n in mock.boxes.get(app_id, {})]})
+                    if parts[3] == "box":
+                        name = base64.b64decode(parse_qs(url.query)["name"][0][len("b64:"):])
+                        value = mock.boxes.get(app_id, {}).get(name)
+                        if value is None:
+                            return self._reply({"message": "box not found"}, 404)
+                        return self._reply({"name": base64.b64encode(name).decode(),
+                                            "value": base64.b64encode(value).decode()})
+                return self._reply({"message": "not found"}, 404)
+
+            def do_POST(self):
+                url = urlparse(self.path)
+                parts = url.path.strip("/").split("/")
+                mock.requests[_endpoint(parts)] += 1
+                body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+                if mock.latency:
+                    sleep(mock.latency)
+
+                if parts == ["v2", "teal", "compile"]:
+                    # Stand-in for the bytecode, of about the same size as the real one
+                    program = hashlib.sha256(body).digest() * (len(body) // 96 + 1)
+                    return self._reply({"hash": "", "result": base64.b64encode(program).decode()})
+                if parts == ["v2", "transactions"]:
+                    tx_ids = mock._receive(body)
+                    return self._reply({"txId": tx_ids[0]})
+                return self._reply({"message": "not found"}, 404)
+
+            def _reply(self, body, code=200):
+                data = json.dumps(body).encode()
+                self.send_response(code)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+        return Handler
+
+
+# Endpoint name used for counting the requests, e.g. "/v2/applications/{id}/box"
+def _endpoint(parts):
+    return "/" + "/".join("{id}" if p.isdigit() or len(p) in (52, 58) and p.isalnum() and p.isupper() else p
+                          for p in parts)
+
+
+# Encode state in the same format as algod returns it
+def encode_state(state):
+    encoded = []
+    for key, value in state.items():
+        if isinstance(value, bytes):
+            v = {"type": 1, "bytes": base64.b64encode(value).decode(), "uint": 0}
+        else:
+            v = {"type": 2, "bytes": "", "uint": value}
+        encoded.append({"key": base64.b64encode(key.encode()).decode(), "value": v})
+    return encoded
@@ -0,0 +1,242 @@
+# -----------------           Description          -----------------
+# Profiler of the opcode budget and fees of each method of the compound and farm compound contracts, which executes
+# them on the local ledger (benchmarks/local_ledger.py) through the whole life of a contract: creation, setup, opt-ins,
+# stakes and withdrawals before, during and after the pool, compoundings, local claims over different numbers of
+# increases, close-outs, deletion of boxes and deletion of the contract.
+# For each method (and case), it reports the opcode cost of the contract's call against the budget pooled by the group,
+# its inner transactions with the opcode cost of issuing one and their fees, and the change of the contract's minimum
+# balance. It derives the cost of a local claim per claimed increase and of deleting a box, and compares the fees and
+# deposits consumed by a compounding against CC_FEE_FOR_COMPOUND and FC_FEE_FOR_COMPOUND.
+# Fails if the cost of deleting boxes no longer matches the one the deletion is planned with (demo/batch_planner.py).
+# The output is deterministic, thus it can be diffed between commits - the profile of the current contracts is kept in
+# benchmarks/contract_profile.txt, which --check compares against.
+# Run from the repository root with: python -m benchmarks.profile_contracts [--output FILE | --check FILE]
+
+# -----------------           Imports          -----------------
+import argparse
+import difflib
+import sys
+
+from benchmarks.avm import TYPE_NAMES
+from benchmarks.contract_deployment import Deployment, STAKE, CLAIM_PERIOD
+from benchmarks.local_ledger import LocalLedger
+from demo.batch_planner import DELETE_BOXES_CALL_COST, DELETE_BOXES_BOX_COST
+
+from util import read_local_state
+
+import src.config as cfg
+
+# ---------------------------------------------------------------
+
+POOL_ROUNDS = 1_000
+# Number of compoundings between local claims, so that the claimed increases span several boxes
+INCREASES = 3 * cfg.BOX_INCREMENTS
+# Opcodes issuing inner transactions
+ITXN_OPS = {"itxn_begin", "itxn_next", "itxn_field", "itxn_submit"}
+
+BASELINE = "benchmarks/contract_profile.txt"
+
+
+class Call:
+
+    __slots__ = ("method", "case", "cost", "budget", "inner", "itxn_cost", "inner_fees", "deposit")
+
+    def __init__(self, method: str, case: str, cost: int, budget: int, inner: list, itxn_cost: int, inner_fees: int,
+                 deposit: int):
+        self.method = method
+        self.case = case
+        # Opcode cost of the contract's call and the budget pooled by its group
+        self.cost = cost
+        self.budget = budget
+        # Types of the inner transactions issued by the contract and the opcode cost of issuing them
+        self.inner = inner
+        self.itxn_cost = itxn_cost
+        # Fees of the inner transactions paid by the contract and the change of its minimum balance
+        self.inner_fees = inner_fees
+        self.deposit = deposit
+
+
+# Deployment that profiles each call of the contract
+class ProfiledDeployment(Deployment):
+
+    def __init__(self, *args):
+        # Profiled calls by (method, case) - only the first call of each is kept
+        self.profiled = {}
+        self.case = ""
+        super().__init__(*args)
+
+    def execute(self, atc, method: str):
+        ledger = self.ledger
+        app_id = getattr(self, "app_id", 0)
+        min_balance = ledger.min_balance(ledger.app_address(app_id)) if app_id else 0
+        case = self.case
+        if method == "local_claim":
+            # Local claims are profiled by the number of increases they claim
+            sender = atc.txn_list[-1].txn.sender
+            lnb = read_local_state(ledger, sender, app_id)["LNB"]
+            case = "{} increase(s) from {}".format(self.state()["NB"] - lnb, lnb)
+        ledger.profile = {}
+        try:
+            result = super().execute(atc, method)
+            profile = ledger.profile
+        finally:
+            ledger.profile = None
+
+        group = ledger.last_group
+        call = next(t for t in reversed(group) if t.get("ApplicationID") == app_id or "CreatedApplicationID" in t)
+        app_id = call.get("CreatedApplicationID", app_id)
+        inner = call.get("InnerTxns", [])
+        opcodes = profile.get(app_id, {})
+        if case is None:
+            return result
+        self.profiled.setdefault((method, case), Call(
+            method, case, call["Cost"], cfg.APP_CALL_BUDGET * _app_calls(group), [t["Type"].decode() for t in inner],
+            sum(cost for op, cost in opcodes.items() if op in ITXN_OPS), sum(t.get("Fee", 0) for t in inner),
+            ledger.min_balance(ledger.app_address(app_id)) - min_balance))
+        return result
+
+
+def _app_calls(txns: list):
+    return sum(1 + _app_calls(t.get("InnerTxns", [])) if TYPE_NAMES[t["TypeEnum"]] == b"appl" else 0 for t in txns)
+
+
+def withdraw_all(user):
+    user.local_claim()
+    user.withdraw(user.stake_amount())
+
+
+# Function runs the life of a contract, returns its profiled calls
+def profile(farm: bool):
+    ledger = LocalLedger()
+    d = ProfiledDeployment(ledger, farm, POOL_ROUNDS, STAKE // 10)
+    users = [d.add_user() for _ in range(4)]
+
+    d.case = "before pool start"
+    for user in users:
+        user.stake(10 * STAKE)
+    users[3].withdraw(STAKE)
+
+    # First compounding starts a box, the following ones are appended to it
+    ledger.advance(d.state()["PSR"] - ledger.last_round)
+    trigger = d.trigger_round()
+    if trigger > 0:
+        ledger.advance(trigger - ledger.round)
+    d.case = "first increase of a box"
+    d.trigger(users[0].sk, users[0].address)
+    ledger.advance()
+    d.case = "increase appended to a box"
+    d.compound_now(users[0].sk, users[0].address)
+
+    users[1].local_claim()
+    ledger.advance()
+    d.case = "pool live"
+    users[0].stake(STAKE)
+    ledger.advance()
+    users[0].withdraw(STAKE)
+
+    # Further compoundings are not profiled
+    d.case = None
+    for _ in range(INCREASES):
+        ledger.advance()
+        d.compound_now(users[0].sk, users[0].address)
+    d.case = ""
+    for user in users[1:3]:
+        user.local_claim()
+
+    ledger.advance(d.state()["PER"] - ledger.round + 1)
+    d.case = "after pool end, last compounding"
+    withdraw_all(users[1])
+    d.case = "after last compounding"
+    withdraw_all(users[2])
+    withdraw_all(users[0])
+    d.case = ""
+    for user in users[:3]:
+        user.close_out()
+    users[3].clear_state()
+
+    # Delete one box, then all the others
+    ledger.advance(CLAIM_PERIOD)
+    boxes = (d.state()["NB"] + cfg.BOX_INCREMENTS - 1) // cfg.BOX_INCREMENTS
+    d.case = "1 box"
+    d.delete_boxes(boxes - 1)
+    d.case = "{} boxes".format(boxes - 1)
+    d.delete_boxes(0)
+    d.case = ""
+    d.delete()
+    return d.profiled
+
+
+# Function returns the opcode cost of a delete_boxes call and of each box it deletes
+def delete_boxes_cost(calls: dict):
+    deletes = sorted((int(call.case.split()[0]), call.cost) for call in calls.values()
+                     if call.method == "delete_boxes")
+    (n1, c1), (n2, c2) = deletes[0], deletes[-1]
+    per_box = (c2 - c1) // (n2 - n1)
+    return c1 - n1 * per_box, per_box
+
+
+# Function returns the lines of the profile of the contract
+def report(name: str, calls: dict, fee_for_compound: int):
+    lines = ["{} - calls".format(name),
+             "{:<18} {:<34} {:>5} {:>6} {:>5} {:>9} {:>6} {:>8}  {}".format(
+                 "method", "case", "cost", "budget", "itxns", "cost/itxn", "fees", "deposit", "inner transactions")]
+    for call in calls.values():
+        lines.append("{:<18} {:<34} {:>5} {:>6} {:>5} {:>9} {:>6} {:>8}  {}".format(
+            call.method, call.case or "-", call.cost, call.budget, len(call.inner),
+            call.itxn_cost // len(call.inner) if call.inner else "-", call.inner_fees, call.deposit,
+            " ".join(call.inner) or "-"))
+
+    lines.append("")
+    lines.append("{} - derived".format(name))
+    # Claims from the first increase read one index less, thus only the others are compared
+    claims = sorted((int(call.case.split()[0]), call.cost) for call in calls.values()
+                    if call.method == "local_claim" and not call.case.endswith(" 0"))
+    (n1, c1), (n2, c2) = claims[0], claims[-1]
+    lines.append("local_claim cost per claimed increase: {:.2f} ({} for {}, {} for {} increases)".format(
+        (c2 - c1) / (n2 - n1), c1, n1, c2, n2))
+    call_cost, per_box = delete_boxes_cost(calls)
+    lines.append("delete_boxes cost per box: {} - the budget of one call allows {} boxes, its references {}".format(
+        per_box, (cfg.APP_CALL_BUDGET - call_cost) // per_box, cfg.MAX_REFERENCES))
+    lines.append("")
+    lines.append("{} - fees of a compounding (fee for compound {})".format(name, fee_for_compound))
+    lines.append("{:<18} {:<34} {:>8} {:>8}".format("method", "case", "consumed", "margin"))
+    for call in calls.values():
+        if call.method in ("trigger_compound", "compound_now"):
+            consumed = call.inner_fees + call.deposit
+            lines.append("{:<18} {:<34} {:>8} {:>8}".format(call.method, call.case, consumed,
+                                                            fee_for_compound - consumed))
+    return lines
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--output", help="write the profile to the file")
+    parser.add_argument("--check", nargs="?", const=BASELINE, help="compare the profile with the file")
+    args = parser.parse_args()
+
+    cc_calls, fc_calls = profile(False), profile(True)
+    lines = report("CompoundContract", cc_calls, cfg.CC_FEE_FOR_COMPOUND) + [""] + \
+        report("FarmCompoundContract", fc_calls, cfg.FC_FEE_FOR_COMPOUND)
+    text = "\n".join(lines) + "\n"
+
+    for name, calls in (("CompoundContract", cc_calls), ("FarmCompoundContract", fc_calls)):
+        if delete_boxes_cost(calls) != (DELETE_BOXES_CALL_COST, DELETE_BOXES_BOX_COST):
+            sys.exit("{}: delete_boxes costs {} per call and {} per box, demo/batch_planner.py plans with {} and {}"
+                     .format(name, *delete_boxes_cost(calls), DELETE_BOXES_CALL_COST, DELETE_BOXES_BOX_COST))
+
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text)
+    if args.check:
+        with open(args.check, "r") as f:
+            baseline = f.read()
+        if baseline != text:
+            sys.stdout.writelines(difflib.unified_diff(baseline.splitlines(True), text.splitlines(True), args.check,
+                                                       "current"))
+            sys.exit(1)
+    if not args.output and not args.check:
+        print(text, end="")
+
+
+if __name__ == "__main__":
+    main()
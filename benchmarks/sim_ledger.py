@@ -0,0 +1,163 @@
+# -----------------           Description          -----------------
+# In-process simulated ledger of compound contracts that advances rounds in real time. It provides the subset of the
+# algod client used by the keeper (status, status_after_block, account_info, application_info) and a trigger_compound
+# that checks and applies the schedule the same way as the contract does, as well as atomic groups of such triggers.
+# Optionally, triggers block until their round has been confirmed, as they do when submitted to a node.
+# The ledger also records when each contract became triggerable, thus the keeper's delays and missed triggers can be
+# measured.
+
+# -----------------           Imports          -----------------
+import threading
+
+from algosdk import error
+from algosdk.logic import get_application_address
+
+from benchmarks.mock_algod import encode_state
+
+# ---------------------------------------------------------------
+
+
+class SimulatedLedger:
+
+    def __init__(self, round_time: float, fee_for_compound: int, box_fee: int, confirm: bool = False):
+        # Time between rounds [s]
+        self.round_time = round_time
+        # Whether triggers wait for the confirmation of their round
+        self.confirm = confirm
+        self.fee_for_compound = fee_for_compound
+        self.box_fee = box_fee
+        # Current round
+        self.round = 1
+        # Global state of each app: app_id -> {key: int}
+        self.global_state = {}
+        # Balance and minimum balance of each app account: address -> [balance, min balance]
+        self.balances = {}
+        # Number of calls of each algod method
+        self.requests = {}
+        # Round since when each app can be triggered (if it can be)
+        self.ready_since = {}
+        # Delays between the app becoming triggerable and being triggered [rounds]
+        self.delays = []
+        # Number of triggers rejected by the contract checks
+        self.rejected = 0
+
+        self._cond = threading.Condition()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._advance, daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    # Record a compound contract, live from psr to per, with funds for the given number of triggers
+    def add_compound_contract(self, app_id: int, psr: int, per: int, triggers: int, min_balance: int = 100_000):
+        with self._cond:
+            self.global_state[app_id] = {"PSR": psr, "PER": per, "LCR": psr, "NB": 0, "TS": 1}
+            self.balances[get_application_address(app_id)] = \
+                [min_balance + triggers * self.fee_for_compound, min_balance]
+
+    # Add funds for additional triggers to the app, as new stakers do
+    def fund(self, app_id: int, triggers: int):
+        with self._cond:
+            self.balances[get_application_address(app_id)][0] += triggers * self.fee_for_compound
+            self._update_ready(app_id)
+
+    # Same checks and state changes as trigger_compound of the contract, evaluated in the next round
+    def trigger_compound(self, app_id: int):
+        self.wait_for_confirmation(self.submit_trigger_group([app_id]))
+        return 1
+
+    # Atomic group of trigger_compound calls of the apps, evaluated in the next round - either all of them pass the
+    # checks of the contract or the group is rejected. Returns the round of the group without waiting for it.
+    def submit_trigger_group(self, app_ids: list):
+        with self._cond:
+            self._count("trigger_compound", len(app_ids))
+            self._count("send_group")
+            global_round = self.round + 1
+            for app_id in app_ids:
+                state = self.global_state[app_id]
+                balance = self.balances[get_application_address(app_id)]
+                n = (balance[0] - balance[1]) // self.fee_for_compound
+                if n <= 0 or (state["PER"] - state["LCR"]) // n + state["LCR"] > global_round or \
+                        global_round <= state["PSR"]:
+                    self.rejected += 1
+                    raise error.AlgodHTTPError("logic eval error: assert failed - Trigger compounding", 400)
+
+            for app_id in app_ids:
+                state = self.global_state[app_id]
+                balance = self.balances[get_application_address(app_id)]
+                if app_id in self.ready_since:
+                    self.delays.append(self.round - self.ready_since.pop(app_id))
+                state["LCR"] = global_round
+                state["NB"] += 1
+                balance[0] -= self.fee_for_compound - self.box_fee
+                balance[1] += self.box_fee
+                self._update_ready(app_id)
+            return global_round
+
+    # Block until the round has been confirmed (if triggers wait for confirmation)
+    def wait_for_confirmation(self, round: int):
+        with self._cond:
+            if self.confirm:
+                self._cond.wait_for(lambda: self.round >= round or self._stop.is_set())
+
+    # Number of apps that are triggerable but have not been triggered
+    def pending(self):
+        with self._cond:
+            return len(self.ready_since)
+
+    # -----    algod client methods    -----
+    def status(self):
+        with self._cond:
+            self._count("status")
+            return {"last-round": self.round}
+
+    def status_after_block(self, block_num: int):
+        with self._cond:
+            self._count("status_after_block")
+            self._cond.wait_for(lambda: self.round > block_num or self._stop.is_set())
+            return {"last-round": self.round}
+
+    def account_info(self, address: str):
+        with self._cond:
+            self._count("account_info")
+            balance, min_balance = self.balances[address]
+            return {"address": address, "amount": balance, "min-balance": min_balance}
+
+    def application_info(self, app_id: int):
+        with self._cond:
+            self._count("application_info")
+            if app_id not in self.global_state:
+                raise error.AlgodHTTPError("application does not exist", 404)
+            return {"id": app_id, "params": {"global-state": encode_state(self.global_state[app_id])}}
+
+    # ---------------------------------
+
+    def _count(self, method, n: int = 1):
+        self.requests[method] = self.requests.get(method, 0) + n
+
+    # Mark the app as triggerable (by the convention of getTriggerRound, i.e. scheduled before PER)
+    def _update_ready(self, app_id):
+        state = self.global_state[app_id]
+        balance, min_balance = self.balances[get_application_address(app_id)]
+        n = (balance - min_balance) // self.fee_for_compound
+        ready = n > 0 and self.round >= state["PSR"] and \
+            (state["PER"] - state["LCR"]) // n + state["LCR"] <= min(self.round, state["PER"] - 1)
+        if not ready:
+            self.ready_since.pop(app_id, None)
+        elif app_id not in self.ready_since:
+            self.ready_since[app_id] = self.round
+
+    def _advance(self):
+        while not self._stop.wait(self.round_time):
+            with self._cond:
+                self.round += 1
+                for app_id in self.global_state:
+                    self._update_ready(app_id)
+                self._cond.notify_all()
+        with self._cond:
+            self._cond.notify_all()
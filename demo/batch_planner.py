@@ -0,0 +1,50 @@
+# -----------------           Description          -----------------
+# Planner of the batched deletion of the boxes of a contract (delete_boxes), sized by the measured opcode cost of the
+# calls instead of a fixed number of boxes per call.
+# Since local claims are done at once from the cumulative indices (two boxes per call, regardless of the number of
+# claimed increases), deleting the boxes is the only operation that has to walk over them.
+# The opcode budget (APP_CALL_BUDGET per app call) and the box references are both pooled by the whole group, thus a
+# group can delete as many boxes as it can reference (MAX_REFERENCES per call) or pay the opcode cost of. The boxes are
+# spread over the fewest calls that reference and pay for them - each call deletes at least one box, as long as a call
+# can pay for deleting a box.
+
+# -----------------           Imports          -----------------
+import src.config as cfg
+
+# ---------------------------------------------------------------
+
+# Opcode cost of a delete_boxes call and of each box it deletes, as measured by benchmarks/profile_contracts.py (see
+# benchmarks/contract_profile.txt), which fails if the contracts no longer match them
+DELETE_BOXES_CALL_COST = 100
+DELETE_BOXES_BOX_COST = 13
+
+
+# Function returns the groups of delete_boxes calls deleting boxes from (including) `boxes` down to (excluding)
+# `down_to_box`. Each group is a list of calls (down_to_box argument, [boxes to reference]), and the calls of a group
+# delete the boxes in order, from the highest one.
+def plan_box_deletion(
+    boxes: int,
+    down_to_box: int = 0,
+    group_size: int = cfg.MAX_GROUP_SIZE,
+    call_cost: int = DELETE_BOXES_CALL_COST,
+    box_cost: int = DELETE_BOXES_BOX_COST
+):
+    if box_cost > cfg.APP_CALL_BUDGET - call_cost:
+        raise ValueError("A call can't pay for deleting a box")
+    group_size = max(1, min(group_size, cfg.MAX_GROUP_SIZE))
+    # Boxes a group can reference and pay for
+    per_group = min(group_size * cfg.MAX_REFERENCES, group_size * (cfg.APP_CALL_BUDGET - call_cost) // box_cost)
+
+    groups = []
+    top = boxes
+    while top > down_to_box:
+        n = min(top - down_to_box, per_group)
+        # Fewest calls that reference the boxes and pay for them
+        calls = max(-(-n // cfg.MAX_REFERENCES), -(-(n * box_cost) // (cfg.APP_CALL_BUDGET - call_cost)))
+        group = []
+        for i in range(calls):
+            k = n // calls + (1 if i < n % calls else 0)
+            group.append((top - k, list(range(top, top - k, -1))))
+            top -= k
+        groups.append(group)
+    return groups
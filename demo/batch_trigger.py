@@ -0,0 +1,98 @@
+# -----------------           Description          -----------------
+# Batched triggering of the compounding of many compound and farm compound contracts. The trigger_compound calls of up
+# to MAX_GROUP_SIZE different contracts, each with its own foreign references and box, are packed into one atomic group.
+# All groups are first submitted back-to-back to the submission pipeline (see util.SubmissionPipeline) and only then
+# awaited, thus the groups are in flight in the same round(s) instead of waiting for the confirmation of each contract in
+# turn. Servicing a fleet of contracts thus takes about as long as triggering a single one.
+# A group is atomic - if the node rejects any of its calls (e.g. because someone else has triggered that contract in the
+# meantime), the whole group is rejected. A rejected group is thus split in halves which are resubmitted, isolating the
+# rejected calls with a number of submissions logarithmic in the group size.
+
+# -----------------           Imports          -----------------
+from algosdk.v2client import algod
+from algosdk import account, transaction, error, encoding
+from algosdk.atomic_transaction_composer import *
+
+from util import *
+from demo.interact_w_CompoundContract import addTriggerCompoundCall
+from demo.interact_w_FarmCompoundContract import addFarmTriggerCompoundCall
+
+import src.config as cfg
+
+# ---------------------------------------------------------------
+
+
+# Function adds the trigger_compound call of the (farm) compound contract with app_id and global state to atc
+def add_trigger_call(
+    atc: AtomicTransactionComposer,
+    user_address: str,
+    signer: AccountTransactionSigner,
+    sp: transaction.SuggestedParams,
+    app_id: int,
+    state: dict
+):
+    if "AMM_ID" not in state:
+        addTriggerCompoundCall(atc, user_address, signer, sp, app_id, state["SC_ID"], state["AC_ID"],
+                               state["S_ASA_ID"], state["NB"])
+    else:
+        addFarmTriggerCompoundCall(atc, user_address, signer, sp, app_id, state["SC_ID"], state["AC_ID"],
+                                   state["S_ASA_ID"], state["R_ASA_ID"], encoding.encode_address(state["P_ADDR"]),
+                                   state["AMM_ID"], state["NB"])
+
+
+# Function submits (without waiting for confirmation) the group triggering the contracts [(app_id, global state)].
+# Returns the future of the group's confirmation, or raises error.AlgodHTTPError if the node rejected it.
+def submit_trigger_group(
+    algod_client: algod.AlgodClient,
+    userSK: str,
+    contracts: list
+):
+    user_address = account.address_from_private_key(userSK)
+    sp = suggested_params(algod_client)
+    atc = AtomicTransactionComposer()
+    signer = AccountTransactionSigner(userSK)
+
+    for app_id, state in contracts:
+        add_trigger_call(atc, user_address, signer, sp, app_id, state)
+
+    log_gtx(atc.build_group())
+    return submission_pipeline(algod_client).submit(atc, cfg.TX_APPROVAL_WAIT)
+
+
+# Function triggers the compounding of all contracts [(app_id, global state)], which should all be due, in pipelined
+# groups of up to MAX_GROUP_SIZE calls. Returns {app_id: 1 if the compounding has been triggered and 0 otherwise}.
+def triggerCompoundingBatch(
+    algod_client: algod.AlgodClient,
+    userSK: str,
+    contracts: list,
+    group_size: int = cfg.MAX_GROUP_SIZE
+):
+    group_size = max(1, min(group_size, cfg.MAX_GROUP_SIZE))
+    results = {app_id: 0 for app_id, _ in contracts}
+
+    # Submit all groups, splitting the rejected ones
+    groups = [contracts[i:i + group_size] for i in range(0, len(contracts), group_size)]
+    submitted = []
+    while groups:
+        group = groups.pop()
+        try:
+            submitted.append((group, submit_trigger_group(algod_client, userSK, group)))
+        except error.AlgodHTTPError as e:
+            if len(group) == 1:
+                print("\tApp {} - Trigger rejected: {}".format(group[0][0], e))
+            else:
+                groups.append(group[len(group) // 2:])
+                groups.append(group[:len(group) // 2])
+
+    # Wait for confirmation of the submitted groups
+    for group, future in submitted:
+        try:
+            result = future.result()
+        except Exception as e:
+            print("\tApps {} - Not confirmed: {}".format([app_id for app_id, _ in group], e))
+            continue
+        for app_id, _ in group:
+            results[app_id] = 1
+        print("\tTx ID: {} - triggered apps: {}".format(result.tx_ids[0], [app_id for app_id, _ in group]))
+
+    return results
@@ -0,0 +1,113 @@
+# -----------------           Description          -----------------
+# Persistent local cache of the increases recorded in the boxes of compounding contracts. An increase is never changed
+# after the compounding has recorded it - it can only get deleted with its box at the end of the contract's life (which is
+# detected by the number of boxes `NB` dropping below the highest cached increase). Increases are thus cached on disk in
+# SQLite, keyed by (genesis hash, app ID, increase number), where the increases are numbered as `NB` counts them.
+# The increases of each app are always cached contiguously from increase 1 onward, thus only the increases above the
+# highest cached one ever need to be fetched from the network.
+# Each entry is the cumulative index recorded by the contract, i.e. the product of increases 1..n. A user's stake
+# projected from LNB to NB is thus LS * index[NB] / index[LNB] (exactly as the contract's local claim computes it),
+# regardless of the number of increases in between.
+
+# -----------------           Imports          -----------------
+import sqlite3
+import threading
+
+from algosdk.v2client import algod
+
+import src.config as cfg
+import src.fixed_point as fp
+
+# ---------------------------------------------------------------
+
+# Cache used by the box readers, initialized with init_box_cache()
+box_cache = None
+
+# Version of the cache schema - a cache with a different version is discarded
+SCHEMA_VERSION = 3
+
+
+class BoxCache:
+
+    def __init__(self, path: str, genesis_hash: str):
+        # Genesis hash of the network the cached boxes belong to
+        self.genesis_hash = genesis_hash
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        if self._db.execute("PRAGMA user_version").fetchone()[0] != SCHEMA_VERSION:
+            self._db.execute("DROP TABLE IF EXISTS boxes")
+            self._db.execute("PRAGMA user_version = {}".format(SCHEMA_VERSION))
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS boxes ("
+            "genesis_hash TEXT NOT NULL, app_id INTEGER NOT NULL, box INTEGER NOT NULL, value BLOB NOT NULL, "
+            "PRIMARY KEY (genesis_hash, app_id, box)) WITHOUT ROWID"
+        )
+        self._db.commit()
+
+    # Highest increase number cached for the app (0 if none is cached)
+    def max_box(self, app_id: int):
+        with self._lock:
+            row = self._db.execute(
+                "SELECT MAX(box) FROM boxes WHERE genesis_hash = ? AND app_id = ?", (self.genesis_hash, app_id)
+            ).fetchone()
+        return row[0] or 0
+
+    # List of (increase number, entry contents) of cached entries first..last (including)
+    def get(self, app_id: int, first: int, last: int):
+        with self._lock:
+            return self._db.execute(
+                "SELECT box, value FROM boxes WHERE genesis_hash = ? AND app_id = ? AND box BETWEEN ? AND ? "
+                "ORDER BY box", (self.genesis_hash, app_id, first, last)
+            ).fetchall()
+
+    # Store (increase number, entry contents) pairs, which must directly follow the highest cached one and be in order
+    def put(self, app_id: int, boxes):
+        rows = [(self.genesis_hash, app_id, box, value) for box, value in boxes]
+        if not rows:
+            return
+        with self._lock:
+            self._db.executemany(
+                "INSERT OR REPLACE INTO boxes (genesis_hash, app_id, box, value) VALUES (?, ?, ?, ?)", rows
+            )
+            self._db.commit()
+
+    # Cumulative index recorded with the increase (1 for increase 0)
+    def index(self, app_id: int, box: int):
+        if box == 0:
+            return fp.ONE
+        with self._lock:
+            row = self._db.execute(
+                "SELECT value FROM boxes WHERE genesis_hash = ? AND app_id = ? AND box = ?",
+                (self.genesis_hash, app_id, box)
+            ).fetchone()
+        if row is None:
+            raise KeyError("Box {} of app {} is not cached".format(box, app_id))
+        return int.from_bytes(row[0], 'big')
+
+    # Remove all cached boxes of the app
+    def invalidate(self, app_id: int):
+        with self._lock:
+            self._db.execute("DELETE FROM boxes WHERE genesis_hash = ? AND app_id = ?", (self.genesis_hash, app_id))
+            self._db.commit()
+
+    # Invalidate the cached boxes of the app if the contract's current number of boxes dropped below the highest cached
+    # box, i.e. the boxes have been deleted
+    def sync(self, app_id: int, number_of_boxes: int):
+        if number_of_boxes < self.max_box(app_id):
+            self.invalidate(app_id)
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+
+# Function opens the cache for the network the client is connected to and makes it used by the box readers
+def init_box_cache(
+    algod_client: algod.AlgodClient,
+    path: str = cfg.BOX_CACHE_PATH
+):
+    global box_cache
+    if box_cache is not None:
+        box_cache.close()
+    box_cache = BoxCache(path, algod_client.versions()["genesis_hash_b64"])
+    return box_cache
@@ -0,0 +1,190 @@
+# -----------------           Description          -----------------
+# Helpers for reading the boxes of a compounding contract. Each recorded increase is numbered the same way as the number
+# of boxes `NB` and local number of boxes `LNB` count them, and its entry holds the cumulative index after the increase
+# (i.e. the product of increases 1..n). Each box packs up to BOX_INCREMENTS entries, i.e. box n holds the entries
+# (n-1)*BOX_INCREMENTS+1 up to n*BOX_INCREMENTS.
+# Box contents are fetched concurrently with a bounded pool of workers and are streamed to the caller in the order of
+# the boxes, so that computation can start before all boxes have been downloaded. If the local box cache has been
+# initialized, entries are read from it and only the missing ones are fetched from the network (and added to the cache).
+
+# -----------------           Imports          -----------------
+import base64
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from algosdk.v2client import algod
+
+import src.config as cfg
+import src.fixed_point as fp
+import demo.box_cache as bc
+
+# ---------------------------------------------------------------
+
+
+# Function returns sorted numbers of all boxes that currently exist for the app, obtained with a single request
+def list_box_numbers(
+    algod_client: algod.AlgodClient,
+    app_id: int
+):
+    boxes = algod_client.application_boxes(app_id).get("boxes", [])
+    return sorted(int.from_bytes(base64.b64decode(b["name"]), 'big') for b in boxes)
+
+
+# Function returns the number of the box holding the increase with the sequential number
+def box_of_increase(increase: int):
+    return (increase - 1) // cfg.BOX_INCREMENTS + 1
+
+
+# Function returns the name of the box holding the increase with the sequential number
+def box_name_of_increase(increase: int):
+    return box_of_increase(increase).to_bytes(cfg.BOX_NAME_SIZE, 'big')
+
+
+# Function returns the box references (to the app itself) of the boxes holding the increases, without duplicates and
+# without the ones of increase 0 (i.e. of the start of the pool, which is not recorded in any box)
+def box_references(*increases):
+    boxes = sorted({box_of_increase(increase) for increase in increases if increase > 0})
+    return [(0, box.to_bytes(cfg.BOX_NAME_SIZE, 'big')) for box in boxes]
+
+
+# Function returns list of (increase number, entry contents) of the entries packed in the box contents
+def split_box(box: int, value: bytes):
+    first = (box - 1) * cfg.BOX_INCREMENTS + 1
+    size = cfg.LOCAL_STAKE_SIZE
+    return [(first + i, value[i * size:(i + 1) * size]) for i in range(len(value) // size)]
+
+
+# Function fetches contents of a single box, which is named by its sequential number
+def fetch_box(
+    algod_client: algod.AlgodClient,
+    app_id: int,
+    box: int
+):
+    response = algod_client.application_box_by_name(app_id, box.to_bytes(cfg.BOX_NAME_SIZE, 'big'))
+    return base64.b64decode(response.get("value"))
+
+
+# Generator yields (box number, box contents) for each of the requested boxes, in the requested order.
+# The boxes are fetched by at most `workers` threads, which run at most 2*`workers` requests ahead of the consumer.
+def stream_boxes(
+    algod_client: algod.AlgodClient,
+    app_id: int,
+    boxes,
+    workers: int = cfg.BOX_READ_WORKERS
+):
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        pending = deque()
+        for box in boxes:
+            pending.append((box, pool.submit(fetch_box, algod_client, app_id, box)))
+            if len(pending) >= 2 * workers:
+                done_box, future = pending.popleft()
+                yield done_box, future.result()
+
+        while pending:
+            done_box, future = pending.popleft()
+            yield done_box, future.result()
+
+
+# Generator yields (increase number, entry contents) for increases first..last (including), fetching the boxes that hold
+# them
+def _stream_increase_range(
+    algod_client: algod.AlgodClient,
+    app_id: int,
+    first: int,
+    last: int,
+    workers: int
+):
+    if first > last:
+        return
+    boxes = range(box_of_increase(first), box_of_increase(last) + 1)
+    for box, value in stream_boxes(algod_client, app_id, boxes, workers):
+        for increase, contents in split_box(box, value):
+            if first <= increase <= last:
+                yield increase, contents
+
+
+# Generator yields (increase number, entry contents) for increases first..last (including) of an app that currently has
+# number_of_boxes increases. Cached entries cost no network request, while the entries above the highest cached one are
+# fetched and added to the cache (if it has been initialized).
+def stream_box_range(
+    algod_client: algod.AlgodClient,
+    app_id: int,
+    first: int,
+    last: int,
+    number_of_boxes: int,
+    workers: int = cfg.BOX_READ_WORKERS
+):
+    cache = bc.box_cache
+    if cache is None:
+        yield from _stream_increase_range(algod_client, app_id, first, last, workers)
+        return
+
+    # Entries above current number of boxes are cached only if the boxes have been deleted in the meantime
+    cache.sync(app_id, number_of_boxes)
+    cached_max = cache.max_box(app_id)
+
+    yield from cache.get(app_id, first, last)
+
+    # Fetch the missing entries - from the highest cached one onward to keep the cache contiguous
+    fetched = []
+    try:
+        for increase, value in _stream_increase_range(algod_client, app_id, cached_max + 1, last, workers):
+            fetched.append((increase, value))
+            if increase >= first:
+                yield increase, value
+    finally:
+        # Keep also what has been fetched if the reading has been interrupted
+        cache.put(app_id, fetched)
+
+
+# Function fetches all entries of an app up to number_of_boxes that are not yet in the cache (which must be initialized)
+def sync_box_cache(
+    algod_client: algod.AlgodClient,
+    app_id: int,
+    number_of_boxes: int,
+    workers: int = cfg.BOX_READ_WORKERS
+):
+    for _ in stream_box_range(algod_client, app_id, number_of_boxes + 1, number_of_boxes, number_of_boxes, workers):
+        pass
+
+
+# Generator yields (increase number, index) for each entry in the requested boxes, where index is the raw fixed-point
+# integer recorded by the contract (i.e. with LOCAL_STAKE_N bytes of fractional part)
+def stream_indexes(
+    algod_client: algod.AlgodClient,
+    app_id: int,
+    boxes,
+    workers: int = cfg.BOX_READ_WORKERS
+):
+    for box, value in stream_boxes(algod_client, app_id, boxes, workers):
+        for increase, contents in split_box(box, value):
+            yield increase, int.from_bytes(contents, 'big')
+
+
+# Generator yields (increase number, index) for increases first..last (including), served from the cache when possible
+def stream_index_range(
+    algod_client: algod.AlgodClient,
+    app_id: int,
+    first: int,
+    last: int,
+    number_of_boxes: int,
+    workers: int = cfg.BOX_READ_WORKERS
+):
+    for increase, value in stream_box_range(algod_client, app_id, first, last, number_of_boxes, workers):
+        yield increase, int.from_bytes(value, 'big')
+
+
+# Function returns the cumulative index after the increase (1 for increase 0), read from the cache or from the box
+# holding it
+def read_index(
+    algod_client: algod.AlgodClient,
+    app_id: int,
+    increase: int
+):
+    if increase == 0:
+        return fp.ONE
+    if bc.box_cache is not None and increase <= bc.box_cache.max_box(app_id):
+        return bc.box_cache.index(app_id, increase)
+    box = box_of_increase(increase)
+    value = dict(split_box(box, fetch_box(algod_client, app_id, box)))[increase]
+    return int.from_bytes(value, 'big')
@@ -0,0 +1,112 @@
+# -----------------           Description          -----------------
+# Snapshot of everything the user screen shows about a (farm) compound contract: its global state, the user's local
+# state and projected stake, the contract's balances, the current round, the next scheduled trigger and the user's
+# holding of the staking asset.
+# The independent reads are made concurrently, followed only by the reads of the cumulative indices the stake is
+# projected from. The snapshot is immutable, thus the screen can be rendered from it without any further requests.
+
+# -----------------           Imports          -----------------
+from concurrent.futures import ThreadPoolExecutor
+from types import MappingProxyType
+
+from algosdk.v2client import algod
+from algosdk import error
+from algosdk.logic import get_application_address
+
+from util import *
+from demo.interact_w_CompoundContract import project_local_stake
+
+import src.config as cfg
+import src.schedule as schedule
+
+# ---------------------------------------------------------------
+
+# Threads making the reads of the snapshots
+_executor = ThreadPoolExecutor(max_workers=8)
+
+
+class ContractSnapshot:
+
+    __slots__ = ("app_id", "round", "state", "local_state", "balance", "min_balance", "trigger_round", "stake",
+                 "asset_amount")
+
+    def __init__(self, app_id: int, round: int, state: dict, local_state: dict, balance: int, min_balance: int,
+                 trigger_round: int, stake: int, asset_amount: int):
+        set_attr = object.__setattr__
+        set_attr(self, "app_id", app_id)
+        # Round at which the snapshot was taken
+        set_attr(self, "round", round)
+        # Global state of the contract and local state of the user (None if not opted in)
+        set_attr(self, "state", MappingProxyType(state))
+        set_attr(self, "local_state", MappingProxyType(local_state) if local_state is not None else None)
+        # Balance and minimum balance of the contract account
+        set_attr(self, "balance", balance)
+        set_attr(self, "min_balance", min_balance)
+        # Next trigger round of the contract or a code of schedule.trigger_round
+        set_attr(self, "trigger_round", trigger_round)
+        # Projected stake of the user (None if not opted in) and user's holding of the staking asset (None if not
+        # opted into it)
+        set_attr(self, "stake", stake)
+        set_attr(self, "asset_amount", asset_amount)
+
+    def __setattr__(self, name, value):
+        raise AttributeError("ContractSnapshot is immutable")
+
+    def __delattr__(self, name):
+        raise AttributeError("ContractSnapshot is immutable")
+
+    @property
+    def is_farm(self):
+        return "AMM_ID" in self.state
+
+    @property
+    def opted_in(self):
+        return self.local_state is not None
+
+    # Number of increases the user has not claimed yet
+    @property
+    def unclaimed_increases(self):
+        return self.state["NB"] - self.local_state["LNB"] if self.opted_in else 0
+
+
+def _read_local_state(algod_client, user_address, app_id):
+    try:
+        return read_local_state(algod_client, user_address, app_id)
+    except (KeyError, error.AlgodHTTPError):
+        return None
+
+
+def _read_asset_amount(algod_client, user_address, asa_id):
+    try:
+        return algod_client.account_asset_info(user_address, asa_id)['asset-holding']['amount']
+    except (KeyError, error.AlgodHTTPError):
+        return None
+
+
+# Function takes the snapshot of the (farm) compound contract with app_id for the user with user_address.
+# Raises error.AlgodHTTPError if the contract can't be read and KeyError if it isn't a compound contract.
+def takeContractSnapshot(
+    algod_client: algod.AlgodClient,
+    user_address: str,
+    app_id: int,
+    s_asa_id: int
+):
+    state = _executor.submit(read_global_state, algod_client, app_id)
+    local_state = _executor.submit(_read_local_state, algod_client, user_address, app_id)
+    info = _executor.submit(algod_client.account_info, get_application_address(app_id))
+    status = _executor.submit(algod_client.status)
+    asset_amount = _executor.submit(_read_asset_amount, algod_client, user_address, s_asa_id)
+
+    state = state.result()
+    local_state = local_state.result()
+    stake = None
+    if local_state is not None:
+        stake = project_local_stake(algod_client, app_id, local_state["LS"], local_state["LNB"], state["NB"])
+
+    info = info.result()
+    current_round = status.result().get('last-round')
+    fee_for_compound = cfg.FC_FEE_FOR_COMPOUND if "AMM_ID" in state else cfg.CC_FEE_FOR_COMPOUND
+    trigger_round = schedule.trigger_round(state, info["amount"], info["min-balance"], fee_for_compound, current_round)
+
+    return ContractSnapshot(app_id, current_round, state, local_state, info["amount"], info["min-balance"],
+                            trigger_round, stake, asset_amount.result())
@@ -14,8 +14,14 @@ from algosdk.atomic_transaction_composer import AtomicTransactionComposer, Accou
 from algosdk.logic import get_application_address
 
 from util import *
+from demo.box_reader import list_box_numbers, stream_boxes, stream_box_range, box_of_increase, \
+    box_references, split_box, read_index
+import demo.box_cache as bc
+from demo.batch_planner import plan_box_deletion
 
 import src.config as cfg
+import src.schedule as schedule
+import src.fixed_point as fp
 
 # ---------------------------------------------------------------
 
@@ -24,7 +30,8 @@ def createCompoundContract(
     creatorSK: str,
     sc_id: int,
     ac_id: int,
-    cp: int
+    cp: int,
+    schedule_policy: int = cfg.SCHEDULE_UNIFORM
 ):
     creator_address = account.address_from_private_key(creatorSK)
 
@@ -35,10 +42,14 @@ def createCompoundContract(
     app_args = [
         sc_id,
         ac_id,
-        cp
+        cp,
+        schedule_policy
     ]
 
-    sp = algod_client.suggested_params()
+    # Programs are compiled only when needed for deployment
+    cfg.init_CC_programs(algod_client)
+
+    sp = suggested_params(algod_client)
     atc = AtomicTransactionComposer()
     signer = AccountTransactionSigner(creatorSK)
 
@@ -55,7 +66,7 @@ def createCompoundContract(
         local_schema=local_schema,
         global_schema=global_schema,
         method_args=app_args,
-        # extra_pages=cfg.CC_ExtraProgramPages,
+        extra_pages=cfg.CC_ExtraProgramPages,
         foreign_assets=None,
         foreign_apps=[sc_id]
     )
@@ -87,7 +98,7 @@ def setupCompoundContract(
     # Get compound contract address
     CC_address = get_application_address(cc_id)
 
-    sp = algod_client.suggested_params()
+    sp = suggested_params(algod_client)
     atc = AtomicTransactionComposer()
     signer = AccountTransactionSigner(creatorSK)
 
@@ -160,7 +171,7 @@ def deleteCompoundContract(algod_client: algod.AlgodClient,
         # transaction to CC creator
         num_fees = 4
 
-    sp = algod_client.suggested_params()
+    sp = suggested_params(algod_client)
     atc = AtomicTransactionComposer()
     signer = AccountTransactionSigner(creatorSK)
 
@@ -189,6 +200,31 @@ def deleteCompoundContract(algod_client: algod.AlgodClient,
     return
 
 
+# Function adds to the atc the calls to the `delete_boxes` method of a group planned by plan_box_deletion
+def addDeleteBoxesCalls(
+    atc: AtomicTransactionComposer,
+    creator_address: str,
+    signer: AccountTransactionSigner,
+    sp: transaction.SuggestedParams,
+    cc_id: int,
+    group: list
+):
+    for down_to, boxes in group:
+        atc.add_method_call(
+            app_id=cc_id,
+            method=cfg.CC_contract.get_method_by_name("delete_boxes"),
+            sender=creator_address,
+            sp=sp,
+            signer=signer,
+            method_args=[down_to],
+            foreign_assets=None,
+            foreign_apps=None,
+            boxes=[(0, x.to_bytes(8, 'big')) for x in boxes]
+        )
+
+    return
+
+
 def deleteAllBoxes(
     algod_client: algod.AlgodClient,
     creatorSK: str,
@@ -196,50 +232,21 @@ def deleteAllBoxes(
 ):
     creator_address = account.address_from_private_key(creatorSK)
 
-    # Number of boxes in a batch to process
-    BB = 7
-
-    # Get current number of boxes in the contract
-    curr_boxes = read_global_state(algod_client, cc_id).get("NB")
+    # Get current number of increases in the contract, and thus the number of boxes holding them
+    curr_increases = read_global_state(algod_client, cc_id).get("NB")
 
-    if curr_boxes < 1:
+    if curr_increases < 1:
         raise Exception("There are no boxes, thus none can be deleted.")
+    curr_boxes = box_of_increase(curr_increases)
 
-    # Process all of them
-    while curr_boxes > 0:
+    # Process all of them, in the fewest groups the pooled budget and box references allow
+    for group in plan_box_deletion(curr_boxes):
 
-        sp = algod_client.suggested_params()
+        sp = suggested_params(algod_client)
         atc = AtomicTransactionComposer()
         signer = AccountTransactionSigner(creatorSK)
 
-        g = 0
-
-        while g < 16 and curr_boxes > 0:
-            # Process them in batches - try to add as many in a single group (i.e. max 16)
-            down_to = curr_boxes - BB
-            if down_to < 0:
-                down_to = 0
-
-            app_args = [down_to]
-
-            # Generate box array
-            box_array = [(0, x.to_bytes(8, 'big')) for x in range(curr_boxes, down_to, -1)]
-
-            # Call to the `delete_boxes` method
-            atc.add_method_call(
-                app_id=cc_id,
-                method=cfg.CC_contract.get_method_by_name("delete_boxes"),
-                sender=creator_address,
-                sp=sp,
-                signer=signer,
-                method_args=app_args,
-                foreign_assets=None,
-                foreign_apps=None,
-                boxes=box_array
-            )
-
-            g += 1
-            curr_boxes = down_to
+        addDeleteBoxesCalls(atc, creator_address, signer, sp, cc_id, group)
 
         log_gtx(atc.build_group())
         result = atc.execute(algod_client, cfg.TX_APPROVAL_WAIT)
@@ -257,7 +264,7 @@ def optinCompoundContract(
 ):
     user_address = account.address_from_private_key(userSK)
 
-    sp = algod_client.suggested_params()
+    sp = suggested_params(algod_client)
     atc = AtomicTransactionComposer()
     signer = AccountTransactionSigner(userSK)
 
@@ -285,7 +292,7 @@ def optoutCompoundContract(
 ):
     user_address = account.address_from_private_key(userSK)
 
-    sp = algod_client.suggested_params()
+    sp = suggested_params(algod_client)
     atc = AtomicTransactionComposer()
     signer = AccountTransactionSigner(userSK)
 
@@ -313,7 +320,7 @@ def clearStateCompoundContract(
 ):
     user_address = account.address_from_private_key(userSK)
 
-    sp = algod_client.suggested_params()
+    sp = suggested_params(algod_client)
     atc = AtomicTransactionComposer()
     signer = AccountTransactionSigner(userSK)
 
@@ -359,7 +366,7 @@ def stakeCompoundContract(
     # Get staking contract address
     SC_address = get_application_address(sc_id)
 
-    sp = algod_client.suggested_params()
+    sp = suggested_params(algod_client)
     atc = AtomicTransactionComposer()
     signer = AccountTransactionSigner(userSK)
 
@@ -403,12 +410,13 @@ def stakeCompoundContract(
 
     atc.add_transaction(tws)
 
-    # Staking can potentially create a new box, thus supply it preemptively
+    # Staking can potentially record a new increase and locally claim it, thus supply the boxes of the last and of the
+    # new increase preemptively
     #  Get current number of boxes in the contract
     num_boxes = read_global_state(algod_client, cc_id).get("NB")
     if not isinstance(num_boxes, int):
         raise Exception("Box supplied not int! " + str(num_boxes))
-    box_array = [(0, (num_boxes + 1).to_bytes(8, 'big'))]
+    box_array = box_references(num_boxes, num_boxes + 1)
 
     # Make the app call
     atc.add_method_call(
@@ -440,63 +448,46 @@ def localClaimCompoundContract(
 ):
     user_address = account.address_from_private_key(userSK)
 
-    # Number of boxes in a batch to process
-    BB = 7
+    # Get current number of boxes in the contract
+    cc_state = read_global_state(algod_client, cc_id)
+    curr_boxes = cc_state["NB"]
+    # Get local current number of boxes in the contract
+    local_boxes = read_local_state(algod_client, user_address, cc_id).get("LNB")
 
-    while True:
+    box_missing = curr_boxes - local_boxes
+    if box_missing == 0:
+        return
+    elif box_missing < 0:
+        raise Exception("Unfortunately you were too late to claim your stake...")
 
-        # Get current number of boxes in the contract
-        cc_state = read_global_state(algod_client, cc_id)
-        curr_boxes = cc_state["NB"]
-        # Get local current number of boxes in the contract
-        local_boxes = read_local_state(algod_client, user_address, cc_id).get("LNB")
+    sp = suggested_params(algod_client)
+    atc = AtomicTransactionComposer()
+    signer = AccountTransactionSigner(userSK)
 
-        box_missing = curr_boxes - local_boxes
-        if box_missing == 0:
-            break
-        elif box_missing < 0:
-            raise Exception("Unfortunately you were too late to claim your stake...")
-        else:
-            sp = algod_client.suggested_params()
-            atc = AtomicTransactionComposer()
-            signer = AccountTransactionSigner(userSK)
-
-            g = 0
-
-            while g < 16 and box_missing > 0:
-                # Process them in batches - try to group as many (i.e. max 16)
-                if box_missing < BB:
-                    up_to = curr_boxes
-                else:
-                    up_to = local_boxes + BB
-
-                app_args = [up_to]
-
-                # Generate box array
-                box_array = [(0, x.to_bytes(8, 'big')) for x in range(local_boxes+1, up_to+1, +1)]
-
-                # Call to the `local_claim` method
-                atc.add_method_call(
-                    app_id=cc_id,
-                    method=cfg.CC_contract.get_method_by_name("local_claim"),
-                    sender=user_address,
-                    sp=sp,
-                    signer=signer,
-                    method_args=app_args,
-                    foreign_assets=None,
-                    foreign_apps=None,
-                    boxes=box_array
-                )
-
-                g += 1
-                local_boxes = up_to
-                box_missing = curr_boxes - local_boxes
-
-            log_gtx(atc.build_group())
-            result = atc.execute(algod_client, cfg.TX_APPROVAL_WAIT)
-
-            for res in result.tx_ids:
-                print("\tTx ID: " + res)
+    app_args = [curr_boxes]
+
+    # All compoundings are claimed at once from the cumulative indices of the last claimed and the current increase,
+    # thus only the boxes holding these two need to be supplied
+    box_array = box_references(local_boxes, curr_boxes)
+
+    # Call to the `local_claim` method
+    atc.add_method_call(
+        app_id=cc_id,
+        method=cfg.CC_contract.get_method_by_name("local_claim"),
+        sender=user_address,
+        sp=sp,
+        signer=signer,
+        method_args=app_args,
+        foreign_assets=None,
+        foreign_apps=None,
+        boxes=box_array
+    )
+
+    log_gtx(atc.build_group())
+    result = atc.execute(algod_client, cfg.TX_APPROVAL_WAIT)
+
+    for res in result.tx_ids:
+        print("\tTx ID: " + res)
 
     return
 
@@ -531,7 +522,7 @@ def withdrawCompoundContract(
     # Get staking contract address
     SC_address = get_application_address(sc_id)
 
-    sp = algod_client.suggested_params()
+    sp = suggested_params(algod_client)
     atc = AtomicTransactionComposer()
     signer = AccountTransactionSigner(userSK)
 
@@ -571,10 +562,11 @@ def withdrawCompoundContract(
 
     args = [withdraw_amt]
 
-    # Withdrawal can potentially create a new box, thus supply it preemptively
+    # Withdrawal can potentially record a new increase and locally claim it, thus supply the boxes of the last and of the
+    # new increase preemptively
     #  Get current number of boxes in the contract
     num_boxes = read_global_state(algod_client, cc_id).get("NB")
-    box_array = [(0, (num_boxes + 1).to_bytes(8, 'big'))]
+    box_array = box_references(num_boxes, num_boxes + 1)
 
     # Make the app call
     atc.add_method_call(
@@ -603,6 +595,40 @@ def withdrawCompoundContract(
     return result.abi_results[0].return_value
 
 
+# Function adds the call to the `trigger_compound` method of the contract with num_boxes recorded increases to atc
+def addTriggerCompoundCall(
+    atc: AtomicTransactionComposer,
+    user_address: str,
+    signer: AccountTransactionSigner,
+    sp: transaction.SuggestedParams,
+    cc_id: int,
+    sc_id: int,
+    ac_id: int,
+    a_id: int,
+    num_boxes: int
+):
+    # Get compound contract address
+    CC_address = get_application_address(cc_id)
+    # Get staking contract address
+    SC_address = get_application_address(sc_id)
+
+    # Compounding can potentially record a new increase, thus supply its box preemptively
+    box_array = box_references(num_boxes + 1)
+
+    atc.add_method_call(
+        app_id=cc_id,
+        method=cfg.CC_contract.get_method_by_name("trigger_compound"),
+        sender=user_address,
+        sp=sp,
+        signer=signer,
+        method_args=None,
+        foreign_assets=[a_id],
+        foreign_apps=[sc_id, ac_id],
+        accounts=[CC_address, SC_address],
+        boxes=box_array
+    )
+
+
 def triggerCompoundingCompoundContract(
     algod_client: algod.AlgodClient,
     userSK: str,
@@ -612,10 +638,6 @@ def triggerCompoundingCompoundContract(
     a_id: int
 ):
     user_address = account.address_from_private_key(userSK)
-    # Get compound contract address
-    CC_address = get_application_address(cc_id)
-    # Get staking contract address
-    SC_address = get_application_address(sc_id)
 
     next_trig_round = getTriggerRound(algod_client, cc_id)
     if next_trig_round > 0:
@@ -636,28 +658,12 @@ def triggerCompoundingCompoundContract(
 
     CC_state = read_global_state(algod_client, cc_id)
 
-    sp = algod_client.suggested_params()
+    sp = suggested_params(algod_client)
     atc = AtomicTransactionComposer()
     signer = AccountTransactionSigner(userSK)
 
-    # Compounding can potentially create a new box, thus supply it preemptively
-    #  Get current number of boxes in the contract
-    num_boxes = CC_state.get("NB")
-    box_array = [(0, (num_boxes + 1).to_bytes(8, 'big'))]
-
     # Make the app call
-    atc.add_method_call(
-        app_id=cc_id,
-        method=cfg.CC_contract.get_method_by_name("trigger_compound"),
-        sender=user_address,
-        sp=sp,
-        signer=signer,
-        method_args=None,
-        foreign_assets=[a_id],
-        foreign_apps=[sc_id, ac_id],
-        accounts=[CC_address, SC_address],
-        boxes=box_array
-    )
+    addTriggerCompoundCall(atc, user_address, signer, sp, cc_id, sc_id, ac_id, a_id, CC_state.get("NB"))
 
     log_gtx(atc.build_group())
     result = atc.execute(algod_client, cfg.TX_APPROVAL_WAIT)
@@ -683,7 +689,7 @@ def compoundNowCompoundContract(
     # Get staking contract address
     SC_address = get_application_address(sc_id)
 
-    sp = algod_client.suggested_params()
+    sp = suggested_params(algod_client)
     atc = AtomicTransactionComposer()
     signer = AccountTransactionSigner(userSK)
 
@@ -706,10 +712,10 @@ def compoundNowCompoundContract(
     atc.add_transaction(tws)
     sp.fee = 0
 
-    # Compounding will create a new box, thus supply it preemptively
+    # Compounding can record a new increase, thus supply its box preemptively
     #  Get current number of boxes in the contract
     num_boxes = read_global_state(algod_client, cc_id).get("NB")
-    box_array = [(0, (num_boxes + 1).to_bytes(8, 'big'))]
+    box_array = box_references(num_boxes + 1)
 
     # Make the app call
     atc.add_method_call(
@@ -746,7 +752,7 @@ def sheduleAdditionalCompounding(
     # Get compound contract address
     CC_address = get_application_address(cc_id)
 
-    sp = algod_client.suggested_params()
+    sp = suggested_params(algod_client)
     atc = AtomicTransactionComposer()
     signer = AccountTransactionSigner(userSK)
 
@@ -771,6 +777,22 @@ def sheduleAdditionalCompounding(
     return
 
 
+# Function returns the rounded down local stake ls_bytes recorded at local_boxes increases, compounded up to curr_boxes
+def project_local_stake(
+    algod_client: algod.AlgodClient,
+    cc_id: int,
+    ls_bytes: bytes,
+    local_boxes: int,
+    curr_boxes: int
+):
+    # Compound the stake exactly as the contract would - from the cumulative indices of the two increases
+    local_stake = fp.local_claim_box(int.from_bytes(ls_bytes, 'big'),
+                                     read_index(algod_client, cc_id, local_boxes),
+                                     read_index(algod_client, cc_id, curr_boxes))
+
+    return fp.floor_local_stake(local_stake)
+
+
 def getUsersCompoundStake(
     algod_client: algod.AlgodClient,
     user_address: str,
@@ -787,18 +809,8 @@ def getUsersCompoundStake(
 
         # Get user's local stake
         ls_bytes = cc_local_state.get("LS")
-        local_stake = Decimal(int.from_bytes(ls_bytes, 'big'))
 
-        # Go through each yet unclaimed box and compound the result
-        for box in range(local_boxes + 1, curr_boxes + 1, +1):
-            # Fetch the increase amount from the box
-            increment = algod_client.application_box_by_name(cc_id, box.to_bytes(8, 'big'))
-            increment = Decimal(int.from_bytes(base64.b64decode(increment.get("value")), 'big'))\
-                        / Decimal(2 ** (8 * cfg.LOCAL_STAKE_N))
-
-            local_stake = local_stake*increment
-
-        return (Decimal(local_stake) / Decimal(2 ** (8 * cfg.LOCAL_STAKE_N))).quantize(Decimal('1'), rounding=ROUND_DOWN)
+        return project_local_stake(algod_client, cc_id, ls_bytes, local_boxes, curr_boxes)
 
     except error.AlgodHTTPError as e:
         print("\tError: " + str(e))
@@ -823,14 +835,25 @@ def readAllCompoundingContributions(
             print('\t There has been no compounding done yet')
             return
 
-        # Go through each box and print the increment
-        for box in range(1, curr_boxes + 1, +1):
-            # Fetch the increase amount from the box
-            increment = algod_client.application_box_by_name(cc_id, box.to_bytes(8, 'big'))
-            increment_float = Decimal(int.from_bytes(base64.b64decode(increment.get("value")), 'big')) \
-                              / Decimal(2 ** (8 * cfg.LOCAL_STAKE_N))
-
-            print("\tBox number {:04d}: b64='{}' = {:.30f}".format(box, increment.get("value"), increment_float))
+        # Go through each increase (cached or fetched concurrently) and print it
+        if bc.box_cache is not None:
+            increases = stream_box_range(algod_client, cc_id, 1, curr_boxes, curr_boxes)
+        else:
+            # List all box names once
+            last_box = box_of_increase(curr_boxes)
+            boxes = stream_boxes(algod_client, cc_id,
+                                 [box for box in list_box_numbers(algod_client, cc_id) if box <= last_box])
+            increases = ((increase, value) for box, contents in boxes for increase, value in split_box(box, contents)
+                         if increase <= curr_boxes)
+        # Each box entry is the cumulative index, thus the increase of a compounding is the ratio to the previous one
+        prev_index = Decimal(1)
+        for increase, value in increases:
+            index_float = Decimal(int.from_bytes(value, 'big')) / Decimal(2 ** (8 * cfg.LOCAL_STAKE_N))
+            increment_float = index_float / prev_index
+            prev_index = index_float
+
+            print("\tBox {:04d}, increase number {:04d}: b64='{}' = index {:.30f}, increase {:.30f}".format(
+                box_of_increase(increase), increase, base64.b64encode(value).decode(), index_float, increment_float))
 
     except error.AlgodHTTPError as e:
         print("\tError: " + str(e))
@@ -851,22 +874,8 @@ def getTriggerRound(
         CC_MRB = CC_info.get("min-balance")
         currentRound = algod_client.status().get('last-round')
         CC_state = read_global_state(algod_client, cc_id)
-        num_triggers = math.floor((CC_balance - CC_MRB) / cfg.CC_FEE_FOR_COMPOUND)
 
-        if num_triggers != 0:
-            next_compound_round = math.floor((CC_state["PER"] - CC_state["LCR"]) / num_triggers) + CC_state["LCR"]
-            if next_compound_round >= CC_state["PER"]:
-                return -3
-            else:
-                if CC_state["LCR"] > CC_state["PER"]:
-                    return -1
-                else:
-                    if next_compound_round <= currentRound:
-                        return 0
-                    else:
-                        return next_compound_round
-        else:
-            return -2
+        return schedule.trigger_round(CC_state, CC_balance, CC_MRB, cfg.CC_FEE_FOR_COMPOUND, currentRound)
 
     except error.AlgodHTTPError as e:
         print("\tError: " + str(e))
@@ -15,7 +15,9 @@ from algosdk.logic import get_application_address
 from util import *
 
 import src.config as cfg
+import src.schedule as schedule
 from demo.interact_w_CompoundContract import localClaimCompoundContract, getTriggerRound
+from demo.box_reader import box_references
 
 # ---------------------------------------------------------------
 
@@ -28,7 +30,8 @@ def createFarmCompoundContract(
     p_addr: str,
     amm_id: int,
     cp: int,
-    mraal: int
+    mraal: int,
+    schedule_policy: int = cfg.SCHEDULE_UNIFORM
 ):
     creator_address = account.address_from_private_key(creatorSK)
 
@@ -42,10 +45,14 @@ def createFarmCompoundContract(
         p_addr,
         amm_id,
         cp,
-        mraal
+        mraal,
+        schedule_policy
     ]
 
-    sp = algod_client.suggested_params()
+    # Programs are compiled only when needed for deployment
+    cfg.init_FC_programs(algod_client)
+
+    sp = suggested_params(algod_client)
     atc = AtomicTransactionComposer()
     signer = AccountTransactionSigner(creatorSK)
 
@@ -96,7 +103,7 @@ def setupFarmCompoundContract(
     # Get farm compound contract address
     FC_address = get_application_address(fc_id)
 
-    sp = algod_client.suggested_params()
+    sp = suggested_params(algod_client)
     atc = AtomicTransactionComposer()
     signer = AccountTransactionSigner(creatorSK)
 
@@ -171,7 +178,7 @@ def deleteFarmCompoundContract(algod_client: algod.AlgodClient,
         # clear state from SC, and account close out transaction to CC creator
         num_fees = 5
 
-    sp = algod_client.suggested_params()
+    sp = suggested_params(algod_client)
     atc = AtomicTransactionComposer()
     signer = AccountTransactionSigner(creatorSK)
 
@@ -228,7 +235,7 @@ def stakeFarmCompoundContract(
     # Get staking contract address
     SC_address = get_application_address(sc_id)
 
-    sp = algod_client.suggested_params()
+    sp = suggested_params(algod_client)
     atc = AtomicTransactionComposer()
     signer = AccountTransactionSigner(userSK)
 
@@ -272,12 +279,13 @@ def stakeFarmCompoundContract(
 
     atc.add_transaction(tws)
 
-    # Staking can potentially create a new box, thus supply it preemptively
+    # Staking can potentially record a new increase and locally claim it, thus supply the boxes of the last and of the
+    # new increase preemptively
     #  Get current number of boxes in the contract
     num_boxes = read_global_state(algod_client, fc_id).get("NB")
     if not isinstance(num_boxes, int):
         raise Exception("Box supplied not int! " + str(num_boxes))
-    box_array = [(0, (num_boxes + 1).to_bytes(8, 'big'))]
+    box_array = box_references(num_boxes, num_boxes + 1)
 
     # Make the app call
     atc.add_method_call(
@@ -335,7 +343,7 @@ def withdrawFarmCompoundContract(
     # Get staking contract address
     SC_address = get_application_address(sc_id)
 
-    sp = algod_client.suggested_params()
+    sp = suggested_params(algod_client)
     atc = AtomicTransactionComposer()
     signer = AccountTransactionSigner(userSK)
 
@@ -375,10 +383,11 @@ def withdrawFarmCompoundContract(
 
     args = [withdraw_amt]
 
-    # Withdrawal can potentially create a new box, thus supply it preemptively
+    # Withdrawal can potentially record a new increase and locally claim it, thus supply the boxes of the last and of the
+    # new increase preemptively
     #  Get current number of boxes in the contract
     num_boxes = read_global_state(algod_client, fc_id).get("NB")
-    box_array = [(0, (num_boxes + 1).to_bytes(8, 'big'))]
+    box_array = box_references(num_boxes, num_boxes + 1)
 
     # Make the app call
     atc.add_method_call(
@@ -407,6 +416,41 @@ def withdrawFarmCompoundContract(
     return result.abi_results[0].return_value
 
 
+# Function adds the call to the `trigger_compound` method of the farm contract with num_boxes recorded increases to atc
+def addFarmTriggerCompoundCall(
+    atc: AtomicTransactionComposer,
+    user_address: str,
+    signer: AccountTransactionSigner,
+    sp: transaction.SuggestedParams,
+    fc_id: int,
+    sc_id: int,
+    ac_id: int,
+    s_asa_id: int,
+    r_asa_id: int,
+    p_addr: str,
+    amm_id: int,
+    num_boxes: int
+):
+    # Get farm compound contract address
+    FC_address = get_application_address(fc_id)
+
+    # Compounding can potentially record a new increase, thus supply its box preemptively
+    box_array = box_references(num_boxes + 1)
+
+    atc.add_method_call(
+        app_id=fc_id,
+        method=cfg.FC_contract.get_method_by_name("trigger_compound"),
+        sender=user_address,
+        sp=sp,
+        signer=signer,
+        method_args=None,
+        foreign_assets=[r_asa_id, s_asa_id],
+        foreign_apps=[sc_id, ac_id, amm_id],
+        accounts=[p_addr, FC_address],
+        boxes=box_array
+    )
+
+
 def triggerFarmCompoundingCompoundContract(
     algod_client: algod.AlgodClient,
     userSK: str,
@@ -419,10 +463,6 @@ def triggerFarmCompoundingCompoundContract(
     amm_id: int,
 ):
     user_address = account.address_from_private_key(userSK)
-    # Get farm compound contract address
-    FC_address = get_application_address(fc_id)
-    # Get staking contract address
-    SC_address = get_application_address(sc_id)
 
     next_trig_round = getFarmTriggerRound(algod_client, fc_id)
     if next_trig_round > 0:
@@ -443,28 +483,13 @@ def triggerFarmCompoundingCompoundContract(
 
     CC_state = read_global_state(algod_client, fc_id)
 
-    sp = algod_client.suggested_params()
+    sp = suggested_params(algod_client)
     atc = AtomicTransactionComposer()
     signer = AccountTransactionSigner(userSK)
 
-    # Compounding can potentially create a new box, thus supply it preemptively
-    #  Get current number of boxes in the contract
-    num_boxes = CC_state.get("NB")
-    box_array = [(0, (num_boxes + 1).to_bytes(8, 'big'))]
-
     # Make the app call
-    atc.add_method_call(
-        app_id=fc_id,
-        method=cfg.FC_contract.get_method_by_name("trigger_compound"),
-        sender=user_address,
-        sp=sp,
-        signer=signer,
-        method_args=None,
-        foreign_assets=[r_asa_id, s_asa_id],
-        foreign_apps=[sc_id, ac_id, amm_id],
-        accounts=[p_addr, FC_address],
-        boxes=box_array
-    )
+    addFarmTriggerCompoundCall(atc, user_address, signer, sp, fc_id, sc_id, ac_id, s_asa_id, r_asa_id, p_addr, amm_id,
+                               CC_state.get("NB"))
 
     log_gtx(atc.build_group())
     result = atc.execute(algod_client, cfg.TX_APPROVAL_WAIT)
@@ -493,7 +518,7 @@ def compoundNowFarmCompoundContract(
     # Get staking contract address
     SC_address = get_application_address(sc_id)
 
-    sp = algod_client.suggested_params()
+    sp = suggested_params(algod_client)
     atc = AtomicTransactionComposer()
     signer = AccountTransactionSigner(userSK)
 
@@ -516,10 +541,10 @@ def compoundNowFarmCompoundContract(
     atc.add_transaction(tws)
     sp.fee = 0
 
-    # Compounding will create a new box, thus supply it preemptively
+    # Compounding can record a new increase, thus supply its box preemptively
     #  Get current number of boxes in the contract
     num_boxes = read_global_state(algod_client, fc_id).get("NB")
-    box_array = [(0, (num_boxes + 1).to_bytes(8, 'big'))]
+    box_array = box_references(num_boxes + 1)
 
     # Make the app call
     atc.add_method_call(
@@ -558,22 +583,8 @@ def getFarmTriggerRound(
         CC_MRB = CC_info.get("min-balance")
         currentRound = algod_client.status().get('last-round')
         CC_state = read_global_state(algod_client, cc_id)
-        num_triggers = math.floor((CC_balance - CC_MRB) / cfg.FC_FEE_FOR_COMPOUND)
 
-        if num_triggers != 0:
-            next_compound_round = math.floor((CC_state["PER"] - CC_state["LCR"]) / num_triggers) + CC_state["LCR"]
-            if next_compound_round >= CC_state["PER"]:
-                return -3
-            else:
-                if CC_state["LCR"] > CC_state["PER"]:
-                    return -1
-                else:
-                    if next_compound_round <= currentRound:
-                        return 0
-                    else:
-                        return next_compound_round
-        else:
-            return -2
+        return schedule.trigger_round(CC_state, CC_balance, CC_MRB, cfg.FC_FEE_FOR_COMPOUND, currentRound)
 
     except error.AlgodHTTPError as e:
         print("\tError: " + str(e))
@@ -0,0 +1,308 @@
+# -----------------           Description          -----------------
+# Keeper service which watches many compound and farm compound contracts and triggers their compounding as soon as it
+# is scheduled.
+# The keeper caches the global state and the balances of each contract and computes locally from them the round of its
+# next scheduled compounding (see src/schedule.py). The contracts are kept in a priority queue (heap) ordered by that
+# round, thus the keeper only sleeps until the earliest one is due instead of polling all contracts. The state of a
+# contract is re-read only when it is due, after it has been triggered, or at the latest every KEEPER_RECHECK_ROUNDS
+# (e.g. to notice new stakers that added funds for additional compoundings).
+# All contracts are handled on a single asyncio event loop, while the blocking algod calls run in the default executor.
+# New rounds are awaited through the round follower shared with the rest of the tools (see util.RoundFollower).
+# With a batch trigger function (e.g. demo/batch_trigger.py), the contracts that become due together are triggered
+# together - their triggers are collected until all due contracts have been checked and then submitted in one call, which
+# packs them into pipelined atomic groups.
+#
+# Run from the repository root with:
+#   python -m demo.keeper <algod address> <algod token> <path to mnemonic .txt> <app ID> [<app ID> ...] [--batch]
+
+# -----------------           Imports          -----------------
+import argparse
+import asyncio
+import heapq
+import itertools
+
+from algosdk.v2client import algod
+from algosdk import account, mnemonic, error, encoding
+from algosdk.logic import get_application_address
+
+from util import *
+from demo.interact_w_CompoundContract import triggerCompoundingCompoundContract
+from demo.interact_w_FarmCompoundContract import triggerFarmCompoundingCompoundContract
+from demo.batch_trigger import triggerCompoundingBatch
+
+import src.config as cfg
+import src.schedule as schedule
+
+# ---------------------------------------------------------------
+
+
+class KeptContract:
+
+    def __init__(self, app_id: int, fee_for_compound: int, trigger):
+        self.app_id = app_id
+        # Fees the contract pays for one compounding
+        self.fee_for_compound = fee_for_compound
+        # Function which submits the trigger_compound group of the contract - called with the algod client, it returns 1
+        # if the compounding has been triggered and 0 otherwise
+        self.trigger = trigger
+        # Cached global state, balance and minimum balance of the contract (state is None until first read)
+        self.state = None
+        self.balance = 0
+        self.min_balance = 0
+        # Number of successful triggers and of consecutive failures
+        self.triggers = 0
+        self.failures = 0
+
+
+class Keeper:
+
+    def __init__(
+        self,
+        algod_client: algod.AlgodClient,
+        max_concurrent_triggers: int = cfg.KEEPER_MAX_CONCURRENT_TRIGGERS,
+        recheck_rounds: int = cfg.KEEPER_RECHECK_ROUNDS,
+        batch_trigger=None
+    ):
+        self.algod_client = algod_client
+        self.max_concurrent_triggers = max_concurrent_triggers
+        self.recheck_rounds = recheck_rounds
+        # Function which triggers many contracts at once (or None to trigger each contract on its own) - called with the
+        # algod client and [(app_id, global state)], it returns {app_id: 1 if triggered and 0 otherwise}
+        self.batch_trigger = batch_trigger
+        # Watched contracts: app_id -> KeptContract
+        self.contracts = {}
+        # Last round seen by the keeper
+        self.last_round = 0
+
+        # Heap of (due round, sequence number, contract) - each watched contract is in it at most once, except while it
+        # is being serviced
+        self._heap = []
+        self._seq = itertools.count()
+        self._tasks = set()
+        self._semaphore = None
+        self._wakeup = None
+        self._follower = None
+        # Collected triggers [(contract, future)] and number of serviced contracts that have not been checked yet
+        self._batch = []
+        self._preparing = 0
+
+    # Start watching the contract with the given app ID, fees for compounding and trigger function
+    def add_contract(self, app_id: int, fee_for_compound: int, trigger):
+        if app_id in self.contracts:
+            return
+        contract = KeptContract(app_id, fee_for_compound, trigger)
+        self.contracts[app_id] = contract
+        # State is not known yet, thus service it right away
+        self._schedule(contract, self.last_round)
+
+    # Stop watching the contract
+    def remove_contract(self, app_id: int):
+        self.contracts.pop(app_id, None)
+
+    # Run the keeper until until_round (or forever if None)
+    async def run(self, until_round: int = None):
+        loop = asyncio.get_running_loop()
+        self._semaphore = asyncio.Semaphore(self.max_concurrent_triggers)
+        self._wakeup = asyncio.Event()
+        self._follower = round_follower(self.algod_client)
+        self.last_round = (await loop.run_in_executor(None, self._follower.start)).last_round
+
+        try:
+            while until_round is None or self.last_round < until_round:
+                due = self._heap[0][0] if self._heap else self.last_round + self.recheck_rounds
+                if until_round is not None:
+                    due = min(due, until_round)
+
+                if due > self.last_round:
+                    await self._wait_for_round(due)
+                    continue
+
+                # Service all contracts that are due, without waiting for them to finish
+                while self._heap and self._heap[0][0] <= self.last_round:
+                    _, _, contract = heapq.heappop(self._heap)
+                    if self.contracts.get(contract.app_id) is not contract:
+                        # Contract is not watched anymore
+                        continue
+                    task = asyncio.create_task(self._service(contract, self.last_round))
+                    self._tasks.add(task)
+                    task.add_done_callback(self._tasks.discard)
+        finally:
+            if self._tasks:
+                await asyncio.gather(*self._tasks, return_exceptions=True)
+
+    def _schedule(self, contract: KeptContract, due: int):
+        heapq.heappush(self._heap, (due, next(self._seq), contract))
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    # Wait until the round has been reached or until a contract has been (re)scheduled
+    async def _wait_for_round(self, due: int):
+        round_reached = asyncio.ensure_future(self._follower.wait_for_round_async(due))
+        wakeup = asyncio.ensure_future(self._wakeup.wait())
+        _, pending = await asyncio.wait({round_reached, wakeup}, return_when=asyncio.FIRST_COMPLETED)
+        for task in pending:
+            task.cancel()
+        self._wakeup.clear()
+        self.last_round = max(self.last_round, self._follower.last_round)
+
+    # Read the global state and balances of the contract
+    def _read(self, contract: KeptContract):
+        info = self.algod_client.account_info(get_application_address(contract.app_id))
+        contract.state = read_contract_state(self.algod_client, contract.app_id)
+        contract.balance = info["amount"]
+        contract.min_balance = info["min-balance"]
+
+    # Trigger code of the contract at current_round from the cached state (see schedule.trigger_round)
+    def _trigger_code(self, contract: KeptContract, current_round: int):
+        code = schedule.trigger_round(
+            contract.state, contract.balance, contract.min_balance, contract.fee_for_compound, current_round
+        )
+        # Compounding can't be triggered before the pool is live, i.e. in rounds up to and including PSR
+        if code == schedule.TRIGGER_NOW and current_round < contract.state["PSR"]:
+            return contract.state["PSR"]
+        return code
+
+    # Round at which the contract should next be serviced
+    def _due_round(self, contract: KeptContract, current_round: int):
+        if contract.failures > 0:
+            # Back off after failed reads or triggers
+            return current_round + min(2 ** contract.failures, self.recheck_rounds)
+
+        code = self._trigger_code(contract, current_round)
+        if code == schedule.TRIGGER_NOW:
+            return current_round
+        if code > 0:
+            return min(code, current_round + self.recheck_rounds)
+        # Nothing is scheduled, but new funds could change that
+        return current_round + self.recheck_rounds
+
+    # Trigger the compounding of the contract - on its own or collected with the others in a batch
+    async def _trigger(self, contract: KeptContract):
+        loop = asyncio.get_running_loop()
+        if self.batch_trigger is None:
+            async with self._semaphore:
+                return await loop.run_in_executor(None, contract.trigger, self.algod_client)
+
+        future = loop.create_future()
+        self._batch.append((contract, future))
+        self._flush_batch()
+        return await future
+
+    # Submit the collected triggers once all serviced contracts have been checked
+    def _flush_batch(self):
+        if self._preparing > 0 or not self._batch:
+            return
+        batch, self._batch = self._batch, []
+        task = asyncio.create_task(self._trigger_batch(batch))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _trigger_batch(self, batch: list):
+        loop = asyncio.get_running_loop()
+        try:
+            async with self._semaphore:
+                results = await loop.run_in_executor(
+                    None, self.batch_trigger, self.algod_client, [(c.app_id, c.state) for c, _ in batch]
+                )
+        except Exception as e:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        for contract, future in batch:
+            if not future.done():
+                future.set_result(results.get(contract.app_id, 0))
+
+    async def _service(self, contract: KeptContract, current_round: int):
+        loop = asyncio.get_running_loop()
+        try:
+            self._preparing += 1
+            try:
+                if contract.state is None or self._trigger_code(contract, current_round) != schedule.TRIGGER_NOW:
+                    await loop.run_in_executor(None, self._read, contract)
+                due = self._trigger_code(contract, current_round) == schedule.TRIGGER_NOW
+            finally:
+                self._preparing -= 1
+                self._flush_batch()
+
+            if due:
+                triggered = await self._trigger(contract)
+                contract.triggers += triggered
+                # Schedule has changed with the compounding (or by someone else in the meantime)
+                await loop.run_in_executor(None, self._read, contract)
+
+            contract.failures = 0
+        except error.AlgodHTTPError as e:
+            if e.code == 404:
+                # Contract has been deleted
+                print("\tApp {} does not exist anymore.".format(contract.app_id))
+                self.remove_contract(contract.app_id)
+                return
+            print("\tApp {} - Error: {}".format(contract.app_id, e))
+            contract.failures += 1
+        except Exception as e:
+            print("\tApp {} - Error: {}".format(contract.app_id, e))
+            contract.failures += 1
+
+        if self.contracts.get(contract.app_id) is contract:
+            self._schedule(contract, self._due_round(contract, max(current_round, self.last_round)))
+
+
+# Function adds the (farm) compound contract with app_id to the keeper, whose compounding will be triggered by the user
+def watchCompoundContract(
+    keeper: Keeper,
+    userSK: str,
+    app_id: int
+):
+    state = read_global_state(keeper.algod_client, app_id)
+    sc_id = state["SC_ID"]
+    ac_id = state["AC_ID"]
+    s_asa_id = state["S_ASA_ID"]
+
+    if "AMM_ID" not in state:
+        def trigger(algod_client):
+            return triggerCompoundingCompoundContract(algod_client, userSK, app_id, sc_id, ac_id, s_asa_id)
+
+        keeper.add_contract(app_id, cfg.CC_FEE_FOR_COMPOUND, trigger)
+    else:
+        r_asa_id = state["R_ASA_ID"]
+        amm_id = state["AMM_ID"]
+        p_addr = encoding.encode_address(state["P_ADDR"])
+
+        def trigger(algod_client):
+            return triggerFarmCompoundingCompoundContract(algod_client, userSK, app_id, sc_id, ac_id, s_asa_id,
+                                                          r_asa_id, p_addr, amm_id)
+
+        keeper.add_contract(app_id, cfg.FC_FEE_FOR_COMPOUND, trigger)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Keeper triggering compounding of compound contracts on schedule")
+    parser.add_argument("algod_address")
+    parser.add_argument("algod_token")
+    parser.add_argument("mnemonic_path", help="path to .txt file with mnemonic (FOR TEST PURPOSES ONLY!)")
+    parser.add_argument("app_ids", type=int, nargs="+")
+    parser.add_argument("--batch", action="store_true", help="trigger contracts due together in batched groups")
+    args = parser.parse_args()
+
+    algod_client = CachedAlgodClient(args.algod_token, args.algod_address)
+    cfg.init_global_vars(algod_client)
+
+    with open(args.mnemonic_path, 'r') as f:
+        user_sk = mnemonic.to_private_key(f.read())
+    print("Keeper account: " + account.address_from_private_key(user_sk))
+
+    batch_trigger = None
+    if args.batch:
+        def batch_trigger(client, contracts):
+            return triggerCompoundingBatch(client, user_sk, contracts)
+
+    keeper = Keeper(algod_client, batch_trigger=batch_trigger)
+    for app_id in args.app_ids:
+        watchCompoundContract(keeper, user_sk, app_id)
+
+    asyncio.run(keeper.run())
+
+
+if __name__ == "__main__":
+    main()
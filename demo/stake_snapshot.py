@@ -0,0 +1,126 @@
+# -----------------           Description          -----------------
+# Snapshot of the projected compounded stakes of all accounts opted into a compounding contract, written to a CSV file
+# for reporting.
+# Local states of all accounts are fetched in bulk from the indexer (or any stand-in providing the same `accounts`
+# query) and the cumulative indices recorded in the boxes are read only once for all accounts. The local claims are then
+# computed for all accounts together with the same truncating fixed-point arithmetic as `local_claim_box` in the
+# contract, i.e. LS * index[NB] / index[LNB].
+#
+# Run from the repository root with:
+#   python -m demo.stake_snapshot <algod address> <algod token> <indexer address> <indexer token> <app ID> <CSV path>
+
+# -----------------           Imports          -----------------
+import argparse
+import csv
+
+from algosdk.v2client import algod, indexer
+
+from util import *
+from demo.box_reader import stream_index_range
+
+import src.fixed_point as fp
+
+# ---------------------------------------------------------------
+
+# Columns of the snapshot file
+SNAPSHOT_COLUMNS = ["address", "LNB", "LS", "projected_LS", "projected_stake"]
+
+
+# Function returns (address, LS, LNB) of all accounts opted into the app, where LS is the raw fixed-point integer
+def read_all_local_states(
+    indexer_client: indexer.IndexerClient,
+    app_id: int
+):
+    local_states = []
+    next_page = None
+    while True:
+        response = indexer_client.accounts(application_id=app_id, next_page=next_page)
+        for acc in response.get("accounts", []):
+            for app in acc.get("apps-local-state", []):
+                if app["id"] != app_id or app.get("deleted", False):
+                    continue
+                state = format_state(app.get("key-value", []))
+                local_states.append((acc["address"], int.from_bytes(state.get("LS", b""), 'big'),
+                                     state.get("LNB", 0)))
+
+        next_page = response.get("next-token")
+        if not next_page or not response.get("accounts"):
+            break
+
+    return local_states
+
+
+# Function computes local claims up to the current increase for all local stakes together. Stake i has already claimed
+# all increases up to local_boxes[i], and indexes maps each of these (and the current one) to its cumulative index.
+# A stake that has claimed beyond the current increase (since delete_boxes lowered NB below its LNB) has nothing left to
+# claim, thus it is kept as it is.
+# Returns the list of the resulting local stakes.
+def project_local_claims(
+    local_stakes,
+    local_boxes,
+    indexes,
+    curr_boxes: int
+):
+    to_index = indexes[curr_boxes]
+
+    # Same as fp.local_claim_box(), i.e. local_claim_box in the contract: LS = LS * index[NB] / index[LNB], truncated
+    return [ls * to_index // indexes[lnb] if lnb <= curr_boxes else ls for ls, lnb in zip(local_stakes, local_boxes)]
+
+
+# Function writes a snapshot of projected stakes of all users of the compound contract to a CSV file at path.
+# Returns the number of accounts in the snapshot.
+def snapshotCompoundStakes(
+    algod_client: algod.AlgodClient,
+    indexer_client: indexer.IndexerClient,
+    cc_id: int,
+    path: str
+):
+    # Get current number of boxes in the contract
+    curr_boxes = read_global_state(algod_client, cc_id)["NB"]
+
+    # Get local states of all users
+    local_states = read_all_local_states(indexer_client, cc_id)
+    local_stakes = [ls for _, ls, _ in local_states]
+    local_boxes = [lnb for _, _, lnb in local_states]
+
+    # Accounts that have claimed beyond the current increase, i.e. whose boxes have since been deleted
+    ahead = sum(lnb > curr_boxes for lnb in local_boxes)
+    if ahead:
+        print("{} accounts have claimed beyond the current increase {} (boxes deleted), their stakes are not "
+              "projected".format(ahead, curr_boxes))
+
+    # Read only the boxes from the oldest increase that a user has yet to claim onward
+    first_box = max(min(min(local_boxes, default=curr_boxes), curr_boxes), 1)
+    indexes = {0: fp.ONE}
+    indexes.update(stream_index_range(algod_client, cc_id, first_box, curr_boxes, curr_boxes))
+
+    projected = project_local_claims(local_stakes, local_boxes, indexes, curr_boxes)
+
+    with open(path, "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(SNAPSHOT_COLUMNS)
+        for (address, ls, lnb), p_ls in zip(local_states, projected):
+            writer.writerow([address, lnb, ls, p_ls, fp.floor_local_stake(p_ls)])
+
+    return len(local_states)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Snapshot of projected stakes of all users of a compound contract")
+    parser.add_argument("algod_address")
+    parser.add_argument("algod_token")
+    parser.add_argument("indexer_address")
+    parser.add_argument("indexer_token")
+    parser.add_argument("app_id", type=int)
+    parser.add_argument("path")
+    args = parser.parse_args()
+
+    algod_client = PooledAlgodClient(args.algod_token, args.algod_address)
+    indexer_client = indexer.IndexerClient(args.indexer_token, args.indexer_address)
+
+    n = snapshotCompoundStakes(algod_client, indexer_client, args.app_id, args.path)
+    print("Written snapshot of {} accounts to {}".format(n, args.path))
+
+
+if __name__ == "__main__":
+    main()
@@ -13,6 +13,8 @@ from algosdk.atomic_transaction_composer import AtomicTransactionComposer, Accou
 from algosdk.logic import get_application_address
 from demo.interact_w_CompoundContract import *
 from demo.interact_w_FarmCompoundContract import *
+from demo.box_cache import init_box_cache
+from demo.contract_snapshot import takeContractSnapshot
 from util import *
 
 import src.config as cfg
@@ -107,7 +109,7 @@ def init():
         algod_token = input("Enter algod token: ")
 
         # Initialize an algodClient
-        algod_client = algod.AlgodClient(algod_token, algod_address)
+        algod_client = CachedAlgodClient(algod_token, algod_address)
 
         try:
             algod_client.health()
@@ -121,6 +123,9 @@ def init():
 
     cfg.init_global_vars(algod_client)
 
+    # Open the local cache of boxes for the network of the node
+    init_box_cache(algod_client)
+
 
 def choose_user():
     global cs, ns, ps, cc_id, sc_id, ac_id, contract_type, amm_id, p_addr, s_asa_id, r_asa_id, user_sk, user_address, user_address_short, algod_client
@@ -264,13 +269,24 @@ def deploy_new_CC():
             print("You did not enter a valid number!")
             continue
 
+        policies = [cfg.SCHEDULE_UNIFORM, cfg.SCHEDULE_FRONT_LOADED]
+        names = {cfg.SCHEDULE_UNIFORM: "uniform", cfg.SCHEDULE_FRONT_LOADED: "front-loaded"}
+        schedule_policy = input("Compounding schedule (" + ", ".join(str(p) + " - " + names[p] for p in policies) + "): ")
+        try:
+            schedule_policy = int(schedule_policy)
+            if schedule_policy not in policies:
+                raise ValueError
+        except ValueError:
+            print("You did not enter a valid number!")
+            continue
+
         try:
             print("")
             if contract_type == FC_TYPE:
                 [cc_id, s_asa_id, r_asa_id] = createFarmCompoundContract(algod_client, user_sk, sc_id, ac_id, p_addr,
-                                                                         amm_id, cp, mraal)
+                                                                         amm_id, cp, mraal, schedule_policy)
             else:
-                [cc_id, s_asa_id] = createCompoundContract(algod_client, user_sk, sc_id, ac_id, cp)
+                [cc_id, s_asa_id] = createCompoundContract(algod_client, user_sk, sc_id, ac_id, cp, schedule_policy)
             print("\nCreated compound contract with app ID: " + str(cc_id))
             print("For asset with ID: " + str(s_asa_id))
             break
@@ -456,7 +472,9 @@ def user_interact():
     print("You are interacting with contract with ID " + str(cc_id) + " and following parameters:")
 
     try:
-        cc_state = read_global_state(algod_client, cc_id)
+        # Read everything the screen shows at once
+        snapshot = takeContractSnapshot(algod_client, user_address, cc_id, s_asa_id)
+        cc_state = snapshot.state
         print("\tConnected to staking contract ID: {}".format(cc_state["SC_ID"]))
         print("\tConnected to associated contract ID: {}".format(cc_state["AC_ID"]))
         print("\tStaking ASA ID: {}".format(cc_state["S_ASA_ID"]))
@@ -477,10 +495,7 @@ def user_interact():
         print("\tNumber of stakers: {}".format(cc_state["NS"]))
         print("\tNumber of boxes: {}".format(cc_state["NB"]))
 
-        if contract_type == FC_TYPE:
-            next_trig_round = getFarmTriggerRound(algod_client, cc_id)
-        else:
-            next_trig_round = getTriggerRound(algod_client, cc_id)
+        next_trig_round = snapshot.trigger_round
         if next_trig_round == 0:
             print("\n\tCompounding can be triggered!")
         elif next_trig_round > 0:
@@ -498,30 +513,19 @@ def user_interact():
         return
     print("")
 
-    opted_in_already = True
-    try:
-        cc_local_state = read_local_state(algod_client, user_address, cc_id)
-    except KeyError:
-        opted_in_already = False
-        print("\tIf you are a new user, please opt in!")
-    except error.AlgodHTTPError as e:
-        print("\tError: " + str(e))
-        opted_in_already = False
+    opted_in_already = snapshot.opted_in
+    if not opted_in_already:
         print("\tIf you are a new user, please opt in!")
-
-    if opted_in_already:
-        your_stake = getUsersCompoundStake(algod_client, user_address, cc_id)
+    else:
         print("\nYou have {} [base unit] of ASA ID '{}' in the contract".format(
-            your_stake, s_asa_id))
-        NB_diff = cc_state["NB"] - cc_local_state["LNB"]
+            snapshot.stake, s_asa_id))
+        NB_diff = snapshot.unclaimed_increases
         if NB_diff > 0:
             print("\t**For advance users:** You have {} results to claim".format(NB_diff))
 
-    try:
-        ai = algod_client.account_asset_info(user_address, s_asa_id)
-        print("\nYou are holding {} [base unit] of staking asset".format(ai['asset-holding']['amount']))
-    except error.AlgodHTTPError as e:
-        print("\tError: " + str(e))
+    if snapshot.asset_amount is not None:
+        print("\nYou are holding {} [base unit] of staking asset".format(snapshot.asset_amount))
+    else:
         print("\tAre you opted-in the staking asset?")
 
     print("\nYour options are:")
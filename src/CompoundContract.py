@@ -3,7 +3,8 @@ import math
 from pyteal import *
 from typing import Literal
 from util import *
-from src.config import *
+from src.teal_config import *
+import src.teal_schedule as teal_schedule
 from algosdk.v2client import algod
 
 
@@ -136,7 +137,8 @@ def stake_to_SC(amt: Expr, payFee: Expr) -> Expr:
     )
 
 # claim_stake_record(amt: Expr, payFee: Expr) -> Expr:
-#  First, claim rewards from SC. Then create the recording of the claimed amount by storing it in a newly created box.
+#  First, claim rewards from SC. Then record the increase of the stakes due to the claimed amount, if it is not 1, by
+#  compounding the cumulative index with it and appending the new index to the packed boxes of BOX_INCREMENTS entries.
 #  Lastly, stake the claimed amount plus any additional amount to SC, and update the total stake as well as the last
 #  compound round.
 #  If payFee == PAY_FEE, CC.address will pay the fee for the operations. Otherwise, the fee needs to be pooled.
@@ -150,12 +152,18 @@ def claim_stake_record(amt: Expr, payFee: Expr) -> Expr:
     # Variable for storing the amount to stake
     stake_amt = ScratchVar()
 
-    # Boxes are sequentially numbered
-    box_name = Itob(App.globalGet(CC_number_of_boxes))
+    # Variable for storing the increase
+    increase_b = ScratchVar()
+
+    # Increases are sequentially numbered and packed by BOX_INCREMENTS into sequentially numbered boxes
+    box_name = Itob((App.globalGet(CC_number_of_boxes) - Int(1)) / Int(BOX_INCREMENTS) + Int(1))
+
+    # Contents of the box
+    box_contents = App.box_get(box_name)
 
     # Amount of increase: 1 + (claim_amt / total stake)
     increase = BytesAdd(
-        Concat(Itob(Int(1)), BytesZero(Int(LOCAL_STAKE_N))),
+        LOCAL_STAKE_ONE_BYTES,
         BytesDiv(
             Concat(Itob(claim_amt.load()), BytesZero(Int(LOCAL_STAKE_N))),
             Concat(BytesZero(Int(LOCAL_STAKE_N)), Itob(App.globalGet(CC_total_stake)))
@@ -197,12 +205,43 @@ def claim_stake_record(amt: Expr, payFee: Expr) -> Expr:
         # byte 16
         claim_amt.store(Btoi(Extract(InnerTxn.last_log(), Int(16), Int(8)))),
 
-        # Increase the counter of boxes created
-        App.globalPut(CC_number_of_boxes, App.globalGet(CC_number_of_boxes) + Int(1)),
+        # Record the compounding only if it increases the stakes, i.e. if the increase is not 1 (which it is when
+        # nothing has been claimed or when the claimed amount is below the precision of the local stake). Such
+        # compounding would not change any local stake, thus boxes are sequentially numbered only for the increases
+        # that do, saving the box deposit.
+        increase_b.store(increase),
+        If(BytesGt(increase_b.load(), LOCAL_STAKE_ONE_BYTES)).Then(
+            Seq(
+                # Increase the counter of recorded increases
+                App.globalPut(CC_number_of_boxes, App.globalGet(CC_number_of_boxes) + Int(1)),
+
+                # Compound the cumulative index with the increase. The result of byte math has no leading zeros,
+                # thus it is padded to LOCAL_STAKE_SIZE (b| zero-extends the shorter operand) to keep the indices
+                # packed in the boxes at fixed offsets.
+                App.globalPut(CC_cumulative_index, BytesOr(
+                        BytesZero(Int(LOCAL_STAKE_SIZE)),
+                        BytesDiv(
+                            BytesMul(App.globalGet(CC_cumulative_index), increase_b.load()),
+                            LOCAL_STAKE_ONE_BYTES
+                        )
+                    )
+                ),
 
-        # Create a new box with name equal to the number of boxes and populate it with the increase from this
-        # compounding
-        App.box_put(box_name, increase),
+                # Append the new cumulative index to its box. The first index of a box creates it, otherwise the box is
+                # recreated with the index appended to its contents - thus the minimum balance grows only by the bytes
+                # of one index.
+                If((App.globalGet(CC_number_of_boxes) - Int(1)) % Int(BOX_INCREMENTS) == Int(0)).Then(
+                    App.box_put(box_name, App.globalGet(CC_cumulative_index)),
+                ).Else(
+                    Seq(
+                        box_contents,
+                        Assert(box_contents.hasValue()),
+                        Pop(App.box_delete(box_name)),
+                        App.box_put(box_name, Concat(box_contents.value(), App.globalGet(CC_cumulative_index))),
+                    )
+                ),
+            )
+        ),
 
         # Stake the claimed amount plus any additional stake - if they are non-zero
         stake_amt.store(claim_amt.load() + amt),
@@ -270,36 +309,39 @@ def sendAssetToSender(amt: Expr) -> Expr:
         )
     )
 
-# local_claim_box(box_i: Expr) -> Expr:
-#  Adds amount received by user from a compounding that was done and recorded in box
+# get_index(box_int: Expr) -> Expr:
+#  Get the cumulative index recorded by the compounding with sequential number box_int (1 for box_int of 0, i.e. before
+#  any compounding). Indices are packed by BOX_INCREMENTS into boxes, i.e. box n holds the indices
+#  (n-1)*BOX_INCREMENTS+1 up to n*BOX_INCREMENTS. Reading an index that has not been recorded fails.
+#
+@Subroutine(TealType.bytes)
+def get_index(box_int: Expr) -> Expr:
+    return If(box_int == Int(0)).Then(
+        LOCAL_STAKE_ONE_BYTES
+    ).Else(
+        App.box_extract(
+            Itob((box_int - Int(1)) / Int(BOX_INCREMENTS) + Int(1)),
+            ((box_int - Int(1)) % Int(BOX_INCREMENTS)) * Int(LOCAL_STAKE_SIZE),
+            Int(LOCAL_STAKE_SIZE)
+        )
+    )
+
+# local_claim_box(box_int: Expr) -> Expr:
+#  Adds amount received by user from all compoundings that were done (and recorded in boxes) since user's last local
+#  claim up to (including) box_int
 #
 @Subroutine(TealType.none)
 def local_claim_box(box_int: Expr) -> Expr:
-
-    # Box name = sequential number of the box (uint64)
-    box_name = Itob(box_int)
-
-    # Box contents
-    contents = App.box_get(box_name)
-    # Get increase from the box
-    increase = contents.value()
-
     return Seq(
-        # Assert the box already exists
-        contents,
-        Assert(contents.hasValue()),
-        # Claims must be done in a strictly increasing order, without skipping any claim.
-        # This is checked by asserting the local number of boxes is one smaller than the current box_int
-        # This is needed to be able to track what has already been (locally) claimed and what not, without having to
-        # record this info explicitly for each user.
-        Assert(box_int == App.localGet(Txn.sender(), CC_local_number_of_boxes) + Int(1)),
-
-        # Increase local stake for the contribution of the user to the time the compounding has been done,
-        # i.e. += (box[round].claimed * LS) / box[round].total_stake_at_time_of_compounding, which equals
-        # *= box[round].increase
+        # Claims can only move forward - the local number of boxes tracks what has already been (locally) claimed and
+        # what not, without having to record this info explicitly for each user.
+        Assert(box_int >= App.localGet(Txn.sender(), CC_local_number_of_boxes)),
+
+        # Increase local stake for the contribution of the user to all the compoundings done since the last claim, i.e.
+        # *= product of their increases, which equals index[box_int] / index[local_number_of_boxes]
         App.localPut(Txn.sender(), CC_local_stake, BytesDiv(
-                BytesMul(App.localGet(Txn.sender(), CC_local_stake), increase),
-                Concat(Itob(Int(1)), BytesZero(Int(LOCAL_STAKE_N)))
+                BytesMul(App.localGet(Txn.sender(), CC_local_stake), get_index(box_int)),
+                get_index(App.localGet(Txn.sender(), CC_local_number_of_boxes))
             )
         ),
 
@@ -401,8 +443,8 @@ clear_state = Seq(
 )
 
 # -----    Calculation of next round to compound      -----
-number_of_triggers = (Balance(Global.current_application_address()) - MinBalance(Global.current_application_address()))/Int(CC_FEE_FOR_COMPOUND)
-next_compound_round = (App.globalGet(CC_pool_end_round) - App.globalGet(CC_last_compound_round))/number_of_triggers + App.globalGet(CC_last_compound_round)
+# The schedule policy of the contract divides the rounds until the pool end among the triggers it can pay the fees for
+next_compound_round = teal_schedule.next_compound_round(CC_FEE_FOR_COMPOUND)
 
 
 # -----       Router      -----
@@ -429,7 +471,7 @@ def getRouter():
 
 
     @router.method(no_op=CallConfig.CREATE)
-    def create_app(SC_ID: abi.Uint64, AC_ID: abi.Uint64, claimPeriod: abi.Uint64):
+    def create_app(SC_ID: abi.Uint64, AC_ID: abi.Uint64, claimPeriod: abi.Uint64, schedulePolicy: abi.Uint64):
 
         # Get global state of SC at key value of 0x00
         SC_glob_state = App.globalGetEx(App.globalGet(CC_SC_ID), Bytes("base64", "AA=="))
@@ -439,6 +481,9 @@ def getRouter():
             App.globalPut(CC_SC_ID, SC_ID.get()),
             App.globalPut(CC_AC_ID, AC_ID.get()),
             App.globalPut(CC_claiming_period, claimPeriod.get()),
+            # Assert the schedule policy is one of the supported ones
+            Assert(schedulePolicy.get() <= Int(SCHEDULE_FRONT_LOADED)),
+            App.globalPut(CC_schedule_policy, schedulePolicy.get()),
 
             # Fetch start round for the pool from the SC
             #  Assert SC has a global state
@@ -459,6 +504,7 @@ def getRouter():
             App.globalPut(CC_last_compound_round, Int(0)),
             App.globalPut(CC_number_of_stakers, Int(0)),
             App.globalPut(CC_number_of_boxes, Int(0)),
+            App.globalPut(CC_cumulative_index, LOCAL_STAKE_ONE_BYTES),
 
             Approve()
         )
@@ -565,7 +611,8 @@ def getRouter():
 
             # If request to stake is done when the pool is already live and a stake has already been deposited, it is
             # necessary to claim the amount first. For this claiming, the new staker needs to pay the fees, including
-            # additional deposit for the newly created box while claiming.
+            # the deposit for recording the increase - the box deposit applies only when the increase is the first
+            # entry of a box, otherwise only the bytes of the appended entry, and nothing if the increase is 1.
             If(
                 And(
                     Global.round() > App.globalGet(CC_pool_start_round),
@@ -580,8 +627,11 @@ def getRouter():
                     # Everything also get recorded in total stake.
                     claim_stake_record(amt_xfer, Int(PAY_FEE)),
 
-                    # Local claim the results of this compounding (it is still with respect to user's old stake)
-                    local_claim_box(App.globalGet(CC_number_of_boxes)),
+                    # Local claim the results of this compounding, if it has been recorded in a box (it is still with respect
+                    # to user's old stake)
+                    If(App.localGet(Txn.sender(), CC_local_number_of_boxes) < App.globalGet(CC_number_of_boxes)).Then(
+                        local_claim_box(App.globalGet(CC_number_of_boxes)),
+                    ),
                 )
             ).Else(
                 Seq(
@@ -688,8 +738,10 @@ def getRouter():
                         # Everything also get recorded in total stake.
                         claim_stake_record(Int(0), Int(PAY_FEE)),
 
-                        # Local claim the results of this compounding
-                        local_claim_box(App.globalGet(CC_number_of_boxes)),
+                        # Local claim the results of this compounding, if it has been recorded in a box
+                        If(App.localGet(Txn.sender(), CC_local_number_of_boxes) < App.globalGet(CC_number_of_boxes)).Then(
+                            local_claim_box(App.globalGet(CC_number_of_boxes)),
+                        ),
 
                         # Unstake correct amount from SC
                         #  If withdraw amt equaled the whole local stake, interpret as a request to withdraw also the
@@ -713,8 +765,10 @@ def getRouter():
                             # Everything also get recorded in total stake.
                             claim_stake_record(Int(0), Int(PAY_FEE)),
 
-                            # Local claim the results of this compounding
-                            local_claim_box(App.globalGet(CC_number_of_boxes)),
+                            # Local claim the results of this compounding, if it has been recorded in a box
+                            If(App.localGet(Txn.sender(), CC_local_number_of_boxes) < App.globalGet(CC_number_of_boxes)).Then(
+                                local_claim_box(App.globalGet(CC_number_of_boxes)),
+                            ),
                             #  If withdraw amt equaled the whole local stake, interpret as a request to withdraw also
                             #  the effect of the last claim - which requires to call floor_local_stake() again
                             If(amt.get() == local_stake_b.load()).Then(
@@ -766,19 +820,14 @@ def getRouter():
 
     @router.method(no_op=CallConfig.CALL)
     def local_claim(up_to_box: abi.Uint64):
-        # Make a local claim of the compounding contribution for each box from last claimed one (i.e.
+        # Make a local claim of the compounding contribution of all compoundings from the last claimed one (i.e.
         # local_number_of_boxes) up to (including) up_to_box.
-        # All the boxes need to be provided in the box array call.
-
-        idx = ScratchVar()
-        init = idx.store(App.localGet(Txn.sender(), CC_local_number_of_boxes) + Int(1))
-        cond = idx.load() <= up_to_box.get()
-        iter = idx.store(idx.load() + Int(1))
+        # The boxes holding the indices of both need to be provided in the box array call.
 
         return Seq(
-            # Process each supplied box
-            For(init, cond, iter).Do(
-                local_claim_box(idx.load())
+            # Claim at once, regardless of the number of compoundings in between
+            If(up_to_box.get() > App.localGet(Txn.sender(), CC_local_number_of_boxes)).Then(
+                local_claim_box(up_to_box.get())
             ),
 
             # Approve the call
@@ -787,11 +836,11 @@ def getRouter():
 
     @router.method(no_op=CallConfig.CALL)
     def delete_boxes(down_to_box: abi.Uint64):
-        # Delete each box from (including) number_of_boxes down to (excluding) down_to_box
+        # Delete each box from (including) the last one down to (excluding) down_to_box
         # All need to be supplied in the box array
 
         idx = ScratchVar()
-        init = idx.store(App.globalGet(CC_number_of_boxes))
+        init = idx.store((App.globalGet(CC_number_of_boxes) + Int(BOX_INCREMENTS - 1)) / Int(BOX_INCREMENTS))
         cond = idx.load() > down_to_box.get()
         iter = idx.store(idx.load() - Int(1))
 
@@ -811,8 +860,10 @@ def getRouter():
                 Assert(App.box_delete(Itob(idx.load()))),
             ),
 
-            # Update new number of boxes
-            App.globalPut(CC_number_of_boxes, idx.load()),
+            # Update new number of boxes, i.e. of the increases in the remaining boxes
+            If(App.globalGet(CC_number_of_boxes) > idx.load() * Int(BOX_INCREMENTS)).Then(
+                App.globalPut(CC_number_of_boxes, idx.load() * Int(BOX_INCREMENTS)),
+            ),
 
             # Approve the call
             Approve(),
@@ -822,27 +873,6 @@ def getRouter():
 
 
 def compileCompoundContract(algod_client):
-    # Compile the program
-    approval_program, clear_program, contract = getRouter().compile_program(version=8)
-
-    with open("./compiled_files/CompoundContract_approval.teal", "w") as f:
-        f.write(approval_program)
-
-    with open("./compiled_files/CompoundContract_clear.teal", "w") as f:
-        f.write(clear_program)
-
-    with open("./compiled_files/CompoundContract.json", "w") as f:
-        import json
-
-        f.write(json.dumps(contract.dictify()))
-
-    # Compile program to binary
-    approval_program_compiled = compile_program(algod_client, approval_program)
-    # Compile program to binary
-    clear_state_program_compiled = compile_program(algod_client, clear_program)
-
-    approval_program_compiled_b64 = compile_program_b64(algod_client, approval_program)
-    ExtraProgramPages = math.ceil(len(base64.b64decode(approval_program_compiled_b64)) / 2048) - 1
-
-    return [approval_program_compiled, clear_state_program_compiled,
-            ExtraProgramPages, contract]
+    # Compile the program - or get it from the artifact cache if neither PyTeal sources nor versions have changed
+    from src.artifact_cache import compile_contract
+    return compile_contract(algod_client, "CompoundContract", __name__)
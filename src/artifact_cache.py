@@ -0,0 +1,156 @@
+# -----------------           Description          -----------------
+# Content-addressed cache of the compiled contracts. An artifact holds everything the off-chain tools need from a
+# compilation - the TEAL, the ABI JSON, the compiled bytecode and the number of extra program pages - and is stored under
+# a key derived from the PyTeal sources of the contract, the source of the offline assembler, the PyTeal version, the
+# TEAL version and the assembly mode. A warm start thus needs neither building of the routers nor compilation. A cold
+# start assembles the programs offline, unless disabled with cfg.OFFLINE_ASSEMBLY.
+# An artifact also records whether its bytecode has been verified, i.e. compiled by algod or cross-checked against it.
+# Offline tools store artifacts without an algod client, thus unverified - these are cross-checked (and stored again as
+# verified) on the first use with a client, e.g. on deployment, unless disabled with cfg.ASSEMBLY_CROSS_CHECK.
+
+# -----------------           Imports          -----------------
+import base64
+import hashlib
+import importlib
+import importlib.util
+import json
+import math
+import os
+from importlib.metadata import version, PackageNotFoundError
+
+from algosdk.abi import Contract
+
+from util import *
+from src.teal_assembler import AssemblyError, assemble_b64, cross_check
+import src.config as cfg
+
+# ---------------------------------------------------------------
+
+# Maximum size of a program page [B]
+PROGRAM_PAGE_SIZE = 2048
+
+
+def _pyteal_version():
+    try:
+        return version("pyteal")
+    except PackageNotFoundError:
+        return "unknown"
+
+
+# Function returns the paths of the PyTeal sources the contract module is compiled from and of the assembler of its
+# bytecode, found without importing them
+def contract_sources(module: str):
+    return [importlib.util.find_spec(m).origin
+            for m in (module, "src.teal_schedule", "src.teal_config", "src.config", "src.teal_assembler")]
+
+
+# Function returns the mode the programs are assembled in
+def assembly_mode():
+    if not cfg.OFFLINE_ASSEMBLY:
+        return "algod"
+    return "offline, cross-checked" if cfg.ASSEMBLY_CROSS_CHECK else "offline"
+
+
+# Function returns the key of the artifact compiled from the source files with the TEAL version, in the assembly mode
+def artifact_key(name: str, sources, teal_version: int = cfg.TEAL_VERSION):
+    h = hashlib.sha256()
+    h.update(name.encode())
+    h.update(_pyteal_version().encode())
+    h.update(str(teal_version).encode())
+    h.update(assembly_mode().encode())
+    for source in sources:
+        with open(source, "rb") as f:
+            h.update(hashlib.sha256(f.read()).digest())
+    return h.hexdigest()
+
+
+def _artifact_path(key: str):
+    return os.path.join(cfg.ARTIFACT_CACHE_DIR, key + ".json")
+
+
+# Function returns the cached artifact with the key, or None if it is not cached
+def load_artifact(key: str):
+    try:
+        with open(_artifact_path(key), "r") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+# Function stores the artifact with the key
+def store_artifact(key: str, artifact: dict):
+    os.makedirs(cfg.ARTIFACT_CACHE_DIR, exist_ok=True)
+    path = _artifact_path(key)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(artifact, f)
+    # Replace atomically, thus concurrent starts never read a partially written artifact
+    os.replace(tmp_path, path)
+
+
+# Function assembles the TEAL source to base64 encoded bytecode - offline (optionally checked against algod) or by algod
+def assemble_program_b64(algod_client, source: str):
+    if not cfg.OFFLINE_ASSEMBLY:
+        return compile_program_b64(algod_client, source)
+    if cfg.ASSEMBLY_CROSS_CHECK and algod_client is not None:
+        return cross_check(algod_client, source)
+    return assemble_b64(source)
+
+
+# Function returns whether the artifact assembled with the algod client has to be cross-checked against algod
+def _needs_cross_check(algod_client, artifact: dict):
+    return cfg.OFFLINE_ASSEMBLY and cfg.ASSEMBLY_CROSS_CHECK and algod_client is not None and \
+        not artifact.get("verified", False)
+
+
+# Function compiles the contract of the module (unless its artifact is already cached) and returns
+# [approval program, clear state program, ExtraProgramPages, ABI contract], as used by cfg.init_CC_programs
+def compile_contract(
+    algod_client,
+    name: str,
+    module: str
+):
+    key = artifact_key(name, contract_sources(module))
+    artifact = load_artifact(key)
+
+    if artifact is None:
+        # Import PyTeal and build the router only now
+        approval_program, clear_program, contract = \
+            importlib.import_module(module).getRouter().compile_program(version=cfg.TEAL_VERSION)
+
+        with open(cfg.COMPILED_FILES_DIR + "/" + name + "_approval.teal", "w") as f:
+            f.write(approval_program)
+
+        with open(cfg.COMPILED_FILES_DIR + "/" + name + "_clear.teal", "w") as f:
+            f.write(clear_program)
+
+        with open(cfg.COMPILED_FILES_DIR + "/" + name + ".json", "w") as f:
+            f.write(json.dumps(contract.dictify()))
+
+        # Compile programs to binary - once each
+        approval_program_compiled_b64 = assemble_program_b64(algod_client, approval_program)
+        clear_state_program_compiled_b64 = assemble_program_b64(algod_client, clear_program)
+
+        artifact = {
+            # Compiled by algod, or assembled offline and cross-checked against it
+            "verified": algod_client is not None and (not cfg.OFFLINE_ASSEMBLY or cfg.ASSEMBLY_CROSS_CHECK),
+            "approval_teal": approval_program,
+            "clear_teal": clear_program,
+            "contract": contract.dictify(),
+            "approval": approval_program_compiled_b64,
+            "clear": clear_state_program_compiled_b64,
+            "extra_pages":
+                math.ceil(len(base64.b64decode(approval_program_compiled_b64)) / PROGRAM_PAGE_SIZE) - 1,
+        }
+        store_artifact(key, artifact)
+
+    elif _needs_cross_check(algod_client, artifact):
+        # Cached by a tool without an algod client - the bytecode is checked before it is used with the client
+        for program in ("approval", "clear"):
+            if cross_check(algod_client, artifact[program + "_teal"]) != artifact[program]:
+                raise AssemblyError("Cached bytecode differs from the assembly of its TEAL")
+        artifact["verified"] = True
+        store_artifact(key, artifact)
+
+    return [base64.b64decode(artifact["approval"]), base64.b64decode(artifact["clear"]),
+            artifact["extra_pages"], Contract.undictify(artifact["contract"])]
@@ -1,9 +1,41 @@
-from pyteal import *
 # ----- ----- -----    Constants     ----- ----- -----
 
 # How many rounds to wait for a transaction approval after submission
 TX_APPROVAL_WAIT = 3
 
+# Maximum number of boxes fetched from algod in parallel when reading compounding contributions
+BOX_READ_WORKERS = 16
+
+# Path to the local (SQLite) cache of boxes recording the compoundings
+BOX_CACHE_PATH = "box_cache.sqlite"
+
+# Maximum number of persistent (keep-alive) connections of a pooled algod client (see util.PooledAlgodClient)
+ALGOD_POOL_SIZE = 16
+
+# Maximum number of compounding triggers the keeper submits in parallel
+KEEPER_MAX_CONCURRENT_TRIGGERS = 16
+
+# Maximum number of rounds the keeper waits before re-reading the state of a contract (e.g. to notice new funds that
+# shorten its schedule)
+KEEPER_RECHECK_ROUNDS = 20
+
+# TEAL version the contracts are compiled to
+TEAL_VERSION = 8
+
+# Directory of the generated TEAL and ABI JSON of the contracts
+COMPILED_FILES_DIR = "./compiled_files"
+
+# Directory of the cache of compiled contracts (TEAL, ABI, bytecode), keyed by PyTeal sources and versions
+ARTIFACT_CACHE_DIR = "./compiled_files/artifacts"
+
+# Assemble the contracts offline (see src/teal_assembler.py) instead of with algod's compile, which needs a node with
+# EnableDeveloperAPI
+OFFLINE_ASSEMBLY = True
+
+# Check the offline assembly against algod's compile whenever an algod client is given (i.e. on deployment, which thus
+# needs a node with EnableDeveloperAPI unless disabled). Offline tools that pass no client assemble without the check.
+ASSEMBLY_CROSS_CHECK = True
+
 # ----- -----    General     ----- -----
 LAST_COMPOUND_NOT_DONE = 0
 LAST_COMPOUND_DONE = 1
@@ -12,66 +44,99 @@ LAST_COMPOUND_DONE = 1
 LOCAL_STAKE_M = 8
 LOCAL_STAKE_N = 8
 LOCAL_STAKE_SIZE = LOCAL_STAKE_M + LOCAL_STAKE_N
-LOCAL_STAKE_ZERO_BYTES = BytesZero(Int(LOCAL_STAKE_SIZE))
 
 # Number of bytes needed for the box name
 BOX_NAME_SIZE = 8
+# Number of increases packed into one box - a box of BOX_MAX_SIZE thus fits the box I/O budget of one box reference
+BOX_INCREMENTS = 64
 # Maximum number of bytes needed for the box
-BOX_MAX_SIZE = LOCAL_STAKE_SIZE
+BOX_MAX_SIZE = BOX_INCREMENTS * LOCAL_STAKE_SIZE
 
 MIN_TX_FEE = 1_000
 STAKE_TO_SC_FEE = 3 * MIN_TX_FEE
 UNSTAKE_FROM_SC_FEE = 3 * MIN_TX_FEE
 CLAIM_FROM_SC_FEE = 4 * MIN_TX_FEE
-BOX_FEE = 2_500 + 400*(BOX_NAME_SIZE+BOX_MAX_SIZE)
+# Increase of the minimum balance due to one recorded increase - at most, i.e. when it is the first one of a new box
+BOX_FEE = 2_500 + 400*(BOX_NAME_SIZE+LOCAL_STAKE_SIZE)
 ZAP_FEE = 4 * MIN_TX_FEE
 
+# Maximum number of transactions in an atomic group
+MAX_GROUP_SIZE = 16
+# Opcode budget of an app call, pooled by all app calls of a group
+APP_CALL_BUDGET = 700
+# Maximum number of references (accounts, assets, apps and boxes) of an app call
+MAX_REFERENCES = 8
+
 PAY_FEE = 1
 DO_NOT_PAY_FEE = 0
 
+# ----- -----    Schedule     ----- -----
+# Policies of the compounding schedule, i.e. of how the rounds between the last compounding and the pool end are divided
+# among the triggers the contract can pay the fees for (see src/schedule.py). The policy is selected at the creation of
+# the contract.
+# Uniform: the rounds are divided equally among the triggers
+SCHEDULE_UNIFORM = 0
+# Front-loaded: the next interval is 1/SCHEDULE_FRONT_LOAD_FACTOR of each of the ones after it, i.e. the rounds are
+# divided by (triggers - 1) * SCHEDULE_FRONT_LOAD_FACTOR + 1, thus the intervals grow towards the pool end - compounding
+# more often at the start of the pool, when it commonly pays more. The last interval, as the uniform one, closes at the
+# pool end.
+SCHEDULE_FRONT_LOADED = 1
+
+SCHEDULE_FRONT_LOAD_FACTOR = 2
+
 # ----- -----    Compound Contract     ----- -----
 # Fees for one trigger = fee for box + fee for claiming from SC + fee for staking to SC
 CC_FEE_FOR_COMPOUND = BOX_FEE + CLAIM_FROM_SC_FEE + STAKE_TO_SC_FEE
 
 # ----- Global variables  -----
+# Keys of the state are plain strings here - the contracts use them as PyTeal expressions from src/teal_config.py
+
 # Number of global variables
-CC_NUM_GLOBAL_UINT = 11
-CC_NUM_GLOBAL_BYTES = 0
+CC_NUM_GLOBAL_UINT = 12
+CC_NUM_GLOBAL_BYTES = 1
 
 # Total Stake: deposited by all users (accumulated through compounding)
-CC_total_stake = Bytes("TS")
+CC_total_stake = "TS"
 
 # Pool End Round: round number of when the staking pool ends
-CC_pool_end_round = Bytes("PER")
+CC_pool_end_round = "PER"
 
 # Pool Start Round: round number of when the staking pool starts
-CC_pool_start_round = Bytes("PSR")
+CC_pool_start_round = "PSR"
 
 # Last Compound Done: set to LAST_COMPOUND_DONE when the pool has been compounded after the pool has ended, and thus it
 # is not necessary to continue compounding
-CC_last_compound_done = Bytes("LCD")
+CC_last_compound_done = "LCD"
 
 # Last Compound Round: round number of when the stake has been last compounded
-CC_last_compound_round = Bytes("LCR")
+CC_last_compound_round = "LCR"
 
 # Number of Stakers
-CC_number_of_stakers = Bytes("NS")
+CC_number_of_stakers = "NS"
 
 # Claiming Period: number of rounds after the pool has ended that creator has to wait before the contract can be deleted
 # i.e. the number of rounds users have to withdraw their stakes and rewards
-CC_claiming_period = Bytes("CP")
+CC_claiming_period = "CP"
 
-# Number of Boxes: number of boxes created by the contract
-CC_number_of_boxes = Bytes("NB")
+# Number of Boxes: number of increases recorded by the contract in the boxes (BOX_INCREMENTS per box)
+CC_number_of_boxes = "NB"
+
+# Cumulative Index: product of all recorded increases, i.e. the factor by which a stake has been compounded since the
+# start of the pool (QM.N bytes). The boxes record its value at each increase.
+CC_cumulative_index = "CI"
 
 # Staking Contract ID: ID of the staking pool to compound
-CC_SC_ID = Bytes("SC_ID")
+CC_SC_ID = "SC_ID"
 
 # Associated Contract ID: app ID with which SC interacts
-CC_AC_ID = Bytes("AC_ID")
+CC_AC_ID = "AC_ID"
 
 # S_ASA ID: ID of the staking asset
-CC_S_ASA_ID = Bytes("S_ASA_ID")
+CC_S_ASA_ID = "S_ASA_ID"
+
+# Schedule Policy: policy of the compounding schedule (SCHEDULE_UNIFORM or SCHEDULE_FRONT_LOADED), selected at the
+# creation of the contract
+CC_schedule_policy = "SP"
 
 
 # -----  Local variables  -----
@@ -80,11 +145,11 @@ CC_S_ASA_ID = Bytes("S_ASA_ID")
 CC_NUM_LOCAL_UINT = 1
 CC_NUM_LOCAL_BYTES = 1
 
-# Local Number of Boxes: Number of box when the user has last compounded their rewards
-CC_local_number_of_boxes = Bytes("LNB")
+# Local Number of Boxes: Number of the increase up to which the user has last compounded their rewards
+CC_local_number_of_boxes = "LNB"
 
 # Local Stake: amount staked by the users (accumulated through compounding) - a fractional number!
-CC_local_stake = Bytes("LS")
+CC_local_stake = "LS"
 
 
 # ----- ----- -----                ----- ----- -----
@@ -102,17 +167,17 @@ FC_NUM_GLOBAL_UINT = CC_NUM_GLOBAL_UINT + 3
 FC_NUM_GLOBAL_BYTES = CC_NUM_GLOBAL_BYTES + 1
 
 # R_ASA ID: ID of the reward asset
-FC_R_ASA_ID = Bytes("R_ASA_ID")
+FC_R_ASA_ID = "R_ASA_ID"
 
 # AMM ID: ID of the AMM contract which issues the farming token
-FC_AMM_ID = Bytes("AMM_ID")
+FC_AMM_ID = "AMM_ID"
 
 # Pool address belonging to AMM ID and farming token
-FC_P_ADDR = Bytes("P_ADDR")
+FC_P_ADDR = "P_ADDR"
 
 # Minimum Reward Amount Add Liquidity: the minimum amount of R_ASA_ID that is needed to be added to the farming pool
 # P_ADDR of AMM_ID
-FC_MRAAL = Bytes("MRAAL")
+FC_MRAAL = "MRAAL"
 
 # -----  Local variables  -----
 # Same as for normal Compound Contract
@@ -121,25 +186,46 @@ FC_NUM_LOCAL_BYTES = CC_NUM_LOCAL_BYTES
 
 # ----- ----- -----                ----- ----- -----
 
+# ABI of the contracts, loaded by init_global_vars()
+CC_contract = None
+FC_contract = None
+
+# Programs of the contracts, compiled only when needed for deployment by init_CC_programs() and init_FC_programs()
 CC_approval_program = None
 CC_clear_state_program = None
 CC_ExtraProgramPages = None
-CC_contract = None
 
 FC_approval_program = None
 FC_clear_state_program = None
 FC_ExtraProgramPages = None
-FC_contract = None
 
-def init_global_vars(algod_client):
-    # Get info about CompoundContract
-    import src.CompoundContract as CC
+
+# Function loads the ABI of the contracts from the prebuilt JSON - without importing PyTeal or building the routers
+def init_global_vars(algod_client=None):
+    import json
+    from algosdk.abi import Contract
+    global CC_contract, FC_contract
+
+    with open(COMPILED_FILES_DIR + "/CompoundContract.json", "r") as f:
+        CC_contract = Contract.undictify(json.load(f))
+
+    with open(COMPILED_FILES_DIR + "/FarmCompoundContract.json", "r") as f:
+        FC_contract = Contract.undictify(json.load(f))
+
+
+# Function compiles the CompoundContract (or gets it from the artifact cache), as needed for its deployment
+def init_CC_programs(algod_client):
+    from src.artifact_cache import compile_contract
     global CC_approval_program, CC_clear_state_program, CC_ExtraProgramPages, CC_contract
-    [CC_approval_program, CC_clear_state_program, CC_ExtraProgramPages, CC_contract] = \
-        CC.compileCompoundContract(algod_client)
+    if CC_approval_program is None:
+        [CC_approval_program, CC_clear_state_program, CC_ExtraProgramPages, CC_contract] = \
+            compile_contract(algod_client, "CompoundContract", "src.CompoundContract")
+
 
-    # Get info about FarmCompoundContract
-    import src.FarmCompoundContract as FC
+# Function compiles the FarmCompoundContract (or gets it from the artifact cache), as needed for its deployment
+def init_FC_programs(algod_client):
+    from src.artifact_cache import compile_contract
     global FC_approval_program, FC_clear_state_program, FC_ExtraProgramPages, FC_contract
-    [FC_approval_program, FC_clear_state_program, FC_ExtraProgramPages, FC_contract] = \
-        FC.compileFarmCompoundContract(algod_client)
+    if FC_approval_program is None:
+        [FC_approval_program, FC_clear_state_program, FC_ExtraProgramPages, FC_contract] = \
+            compile_contract(algod_client, "FarmCompoundContract", "src.FarmCompoundContract")
@@ -0,0 +1,111 @@
+# -----------------           Description          -----------------
+# Fast decoder of the global state of the compound and farm compound contracts, as returned by algod, into compact typed
+# objects. The keys of the state (see src/config.py) are matched in their base64 encoding as algod returns them, thus
+# only the byte values need to be decoded. Decoded states also support item access with the keys of the state, e.g.
+# state["NB"], thus they can be used wherever the dict returned by util.format_state is used.
+# The values are decoded in a single pass directly into the positional arguments of the state, since the fields of the
+# compound state are the leading fields of the farm compound state.
+
+# -----------------           Imports          -----------------
+import base64
+from binascii import a2b_base64
+from dataclasses import dataclass, fields
+
+import src.config as cfg
+
+# ---------------------------------------------------------------
+
+
+@dataclass
+class CompoundState:
+    __slots__ = ("total_stake", "pool_end_round", "pool_start_round", "last_compound_done", "last_compound_round",
+                 "number_of_stakers", "claiming_period", "number_of_boxes", "cumulative_index", "sc_id", "ac_id",
+                 "s_asa_id", "schedule_policy")
+    total_stake: int
+    pool_end_round: int
+    pool_start_round: int
+    last_compound_done: int
+    last_compound_round: int
+    number_of_stakers: int
+    claiming_period: int
+    number_of_boxes: int
+    cumulative_index: bytes
+    sc_id: int
+    ac_id: int
+    s_asa_id: int
+    schedule_policy: int
+
+    def __getitem__(self, key: str):
+        try:
+            return getattr(self, _FIELDS[key])
+        except (KeyError, AttributeError):
+            raise KeyError(key) from None
+
+    def __contains__(self, key: str):
+        return hasattr(self, _FIELDS.get(key, ""))
+
+    def get(self, key: str, default=None):
+        return getattr(self, _FIELDS.get(key, ""), default)
+
+
+@dataclass
+class FarmCompoundState(CompoundState):
+    __slots__ = ("reward_asa_id", "amm_id", "pool_address", "mraal")
+    reward_asa_id: int
+    amm_id: int
+    pool_address: bytes
+    mraal: int
+
+
+# State key -> field of the decoded state
+_FIELDS = {
+    cfg.CC_total_stake: "total_stake",
+    cfg.CC_pool_end_round: "pool_end_round",
+    cfg.CC_pool_start_round: "pool_start_round",
+    cfg.CC_last_compound_done: "last_compound_done",
+    cfg.CC_last_compound_round: "last_compound_round",
+    cfg.CC_number_of_stakers: "number_of_stakers",
+    cfg.CC_claiming_period: "claiming_period",
+    cfg.CC_number_of_boxes: "number_of_boxes",
+    cfg.CC_cumulative_index: "cumulative_index",
+    cfg.CC_SC_ID: "sc_id",
+    cfg.CC_AC_ID: "ac_id",
+    cfg.CC_S_ASA_ID: "s_asa_id",
+    cfg.CC_schedule_policy: "schedule_policy",
+    cfg.FC_R_ASA_ID: "reward_asa_id",
+    cfg.FC_AMM_ID: "amm_id",
+    cfg.FC_P_ADDR: "pool_address",
+    cfg.FC_MRAAL: "mraal",
+}
+
+_FC_FIELDS = fields(FarmCompoundState)
+_FC_POSITIONS = {f.name: i for i, f in enumerate(_FC_FIELDS)}
+_NUM_CC_FIELDS = len(fields(CompoundState))
+_AMM_ID_POSITION = _FC_POSITIONS["amm_id"]
+
+# Base64 encoded state key (as returned by algod) -> (position of its field, whether its value is bytes)
+_ENCODED_KEYS = {
+    base64.b64encode(key.encode()).decode(): (_FC_POSITIONS[field], _FC_FIELDS[_FC_POSITIONS[field]].type is bytes)
+    for key, field in _FIELDS.items()
+}
+
+# Values of the fields that are not (yet) set in the state
+_DEFAULTS = [b"" if f.type is bytes else 0 for f in _FC_FIELDS]
+
+
+# Function decodes the global state as returned by algod (list of key-value items) into a CompoundState, or a
+# FarmCompoundState if the state belongs to a farm compound contract. Keys of other contracts are ignored.
+def decode_state(global_state: list):
+    values = _DEFAULTS.copy()
+    farm = False
+    for item in global_state:
+        key = _ENCODED_KEYS.get(item["key"])
+        if key is not None:
+            position, is_bytes = key
+            value = item["value"]
+            values[position] = a2b_base64(value["bytes"]) if is_bytes else value["uint"]
+            farm = farm or position == _AMM_ID_POSITION
+
+    if farm:
+        return FarmCompoundState(*values)
+    return CompoundState(*values[:_NUM_CC_FIELDS])
@@ -0,0 +1,80 @@
+# -----------------           Description          -----------------
+# Exact off-chain emulation of the fixed-point arithmetic of the compounding contracts.
+# Local stake `LS`, the increases and the cumulative indices recorded in the boxes are QM.N numbers (M = LOCAL_STAKE_M,
+# N = LOCAL_STAKE_N bytes)
+# that the contract handles with the truncating byte-math opcodes (b+, b-, b*, b/). The functions below mirror the
+# contract expressions on Python integers, thus the results are bit-exact with the contract, including the cases where
+# the contract would fail (which raise OverflowError or ValueError).
+
+# -----------------           Imports          -----------------
+from src.config import LOCAL_STAKE_N
+
+# ---------------------------------------------------------------
+
+# Number of bits of the fractional part
+SHIFT = 8 * LOCAL_STAKE_N
+# Fixed-point representation of 1.0, i.e. Concat(Itob(Int(1)), BytesZero(Int(LOCAL_STAKE_N)))
+ONE = 1 << SHIFT
+# Byte-math opcodes accept inputs of at most 64 bytes
+MAX_BYTE_MATH_INPUT = 1 << (8 * 64)
+# Itob and Btoi operate on uint64
+MAX_UINT64 = (1 << 64) - 1
+
+
+def _check_byte_math_input(x: int):
+    if x >= MAX_BYTE_MATH_INPUT:
+        raise OverflowError("Byte-math input exceeds 64 bytes")
+
+
+# Fixed-point representation of an integer amount, i.e. Concat(Itob(amt), BytesZero(Int(LOCAL_STAKE_N)))
+def to_fixed(amt: int):
+    if not 0 <= amt <= MAX_UINT64:
+        raise OverflowError("Itob of a value that is not uint64")
+    return amt << SHIFT
+
+
+# Same as floor_local_stake(): rounded down integer amount of local stake
+def floor_local_stake(ls: int):
+    amt = ls >> SHIFT
+    if amt > MAX_UINT64:
+        raise OverflowError("Btoi of more than 8 bytes")
+    return amt
+
+
+# Same as the increase in claim_stake_record(): 1 + (claim_amt / total stake), truncated to N fractional bytes
+def compound_increase(claim_amt: int, total_stake: int):
+    if total_stake == 0:
+        raise ValueError("Claiming makes sense only if current total stake was non-zero")
+    return ONE + to_fixed(claim_amt) // total_stake
+
+
+# Same as the update of the cumulative index in claim_stake_record(): CI * increase / 1, truncated to N fractional bytes
+def compound_index(index: int, increase: int):
+    _check_byte_math_input(index)
+    _check_byte_math_input(increase)
+    product = index * increase
+    _check_byte_math_input(product)
+    return product >> SHIFT
+
+
+# Same as local_claim_box(): LS * index[box] / index[LNB], truncated to N fractional bytes
+def local_claim_box(ls: int, from_index: int, to_index: int):
+    _check_byte_math_input(ls)
+    _check_byte_math_input(from_index)
+    _check_byte_math_input(to_index)
+    product = ls * to_index
+    _check_byte_math_input(product)
+    return product // from_index
+
+
+# Same as the update of local stake in stake(): LS + amt
+def add_stake(ls: int, amt: int):
+    return ls + to_fixed(amt)
+
+
+# Same as the update of local stake in withdraw(): LS - amt
+def withdraw_stake(ls: int, amt: int):
+    amt = to_fixed(amt)
+    if amt > ls:
+        raise ValueError("Byte-math result would be negative")
+    return ls - amt
@@ -0,0 +1,54 @@
+# -----------------           Description          -----------------
+# Off-chain mirror of the compounding schedule of the contracts, i.e. of `number_of_triggers` and `next_compound_round`
+# that `trigger_compound` asserts against (see src/teal_schedule.py for the policies of the schedule). Used to find out
+# locally (from the global state and the balances of the contract) when the contract can next be triggered.
+
+# -----------------           Imports          -----------------
+import src.config as cfg
+
+# ---------------------------------------------------------------
+
+# Codes returned by trigger_round() when compounding can't be triggered at a specific round
+TRIGGER_NOW = 0
+POOL_ENDED = -1
+NO_TRIGGERS = -2
+NO_TRIGGERS_BEFORE_END = -3
+
+
+# Same as number_of_triggers: number of compoundings the contract can still pay the fees for
+def number_of_triggers(balance: int, min_balance: int, fee_for_compound: int):
+    return (balance - min_balance) // fee_for_compound
+
+
+# Same as the interval in next_compound_round: rounds from the last compounding to the next trigger according to the
+# schedule policy of the contract. Contracts created without a policy are scheduled uniformly.
+def compound_interval(state: dict, triggers: int):
+    rounds = state["PER"] - state["LCR"]
+
+    if state.get(cfg.CC_schedule_policy, cfg.SCHEDULE_UNIFORM) == cfg.SCHEDULE_FRONT_LOADED:
+        # The next interval is 1/SCHEDULE_FRONT_LOAD_FACTOR of each of the ones after it
+        return rounds // ((triggers - 1) * cfg.SCHEDULE_FRONT_LOAD_FACTOR + 1)
+
+    return rounds // triggers
+
+
+# Same as next_compound_round: the next trigger is the compound interval after the last compounding
+def next_compound_round(state: dict, triggers: int):
+    return compound_interval(state, triggers) + state["LCR"]
+
+
+# Function returns TRIGGER_NOW if the contract can be triggered at current_round, the round of its next scheduled
+# trigger, or one of the codes POOL_ENDED, NO_TRIGGERS, NO_TRIGGERS_BEFORE_END
+def trigger_round(state: dict, balance: int, min_balance: int, fee_for_compound: int, current_round: int):
+    triggers = number_of_triggers(balance, min_balance, fee_for_compound)
+    if triggers <= 0:
+        return NO_TRIGGERS
+
+    next_round = next_compound_round(state, triggers)
+    if next_round >= state["PER"]:
+        return NO_TRIGGERS_BEFORE_END
+    if state["LCR"] > state["PER"]:
+        return POOL_ENDED
+    if next_round <= current_round:
+        return TRIGGER_NOW
+    return next_round
@@ -0,0 +1,446 @@
+# -----------------           Description          -----------------
+# Offline assembler of TEAL (up to version 8) into bytecode, thus the contracts can be compiled without a node with
+# EnableDeveloperAPI. It follows the assembler of go-algorand, including its optimization of constants (for version 4
+# onward): values of the `int`/`byte`/`addr`/`method` pseudo-ops are counted, the ones used more than once are put into
+# intcblock/bytecblock ordered by descending frequency (ties by first occurrence), and the ones used only once are
+# pushed with pushint/pushbytes. The resulting bytecode is therefore identical to the one of algod's compile, which is
+# checked with cross_check() whenever the contracts are compiled for deployment (cfg.ASSEMBLY_CROSS_CHECK).
+
+# -----------------           Imports          -----------------
+import base64
+import re
+
+from algosdk import encoding
+
+# ---------------------------------------------------------------
+
+
+class AssemblyError(Exception):
+    pass
+
+
+# -----    Named values of immediates     -----
+TXN_FIELDS = [
+    "Sender", "Fee", "FirstValid", "FirstValidTime", "LastValid", "Note", "Lease", "Receiver", "Amount",
+    "CloseRemainderTo", "VotePK", "SelectionPK", "VoteFirst", "VoteLast", "VoteKeyDilution", "Type", "TypeEnum",
+    "XferAsset", "AssetAmount", "AssetSender", "AssetReceiver", "AssetCloseTo", "GroupIndex", "TxID", "ApplicationID",
+    "OnCompletion", "ApplicationArgs", "NumAppArgs", "Accounts", "NumAccounts", "ApprovalProgram", "ClearStateProgram",
+    "RekeyTo", "ConfigAsset", "ConfigAssetTotal", "ConfigAssetDecimals", "ConfigAssetDefaultFrozen",
+    "ConfigAssetUnitName", "ConfigAssetName", "ConfigAssetURL", "ConfigAssetMetadataHash", "ConfigAssetManager",
+    "ConfigAssetReserve", "ConfigAssetFreeze", "ConfigAssetClawback", "FreezeAsset", "FreezeAssetAccount",
+    "FreezeAssetFrozen", "Assets", "NumAssets", "Applications", "NumApplications", "GlobalNumUint",
+    "GlobalNumByteSlice", "LocalNumUint", "LocalNumByteSlice", "ExtraProgramPages", "Nonparticipation", "Logs",
+    "NumLogs", "CreatedAssetID", "CreatedApplicationID", "LastLog", "StateProofPK", "ApprovalProgramPages",
+    "NumApprovalProgramPages", "ClearStateProgramPages", "NumClearStateProgramPages",
+]
+GLOBAL_FIELDS = [
+    "MinTxnFee", "MinBalance", "MaxTxnLife", "ZeroAddress", "GroupSize", "LogicSigVersion", "Round", "LatestTimestamp",
+    "CurrentApplicationID", "CreatorAddress", "CurrentApplicationAddress", "GroupID", "OpcodeBudget",
+    "CallerApplicationID", "CallerApplicationAddress",
+]
+ASSET_HOLDING_FIELDS = ["AssetBalance", "AssetFrozen"]
+ASSET_PARAMS_FIELDS = [
+    "AssetTotal", "AssetDecimals", "AssetDefaultFrozen", "AssetUnitName", "AssetName", "AssetURL", "AssetMetadataHash",
+    "AssetManager", "AssetReserve", "AssetFreeze", "AssetClawback", "AssetCreator",
+]
+APP_PARAMS_FIELDS = [
+    "AppApprovalProgram", "AppClearStateProgram", "AppGlobalNumUint", "AppGlobalNumByteSlice", "AppLocalNumUint",
+    "AppLocalNumByteSlice", "AppExtraProgramPages", "AppCreator", "AppAddress",
+]
+ACCT_PARAMS_FIELDS = [
+    "AcctBalance", "AcctMinBalance", "AcctAuthAddr", "AcctTotalNumUint", "AcctTotalNumByteSlice",
+    "AcctTotalExtraAppPages", "AcctTotalAppsCreated", "AcctTotalAppsOptedIn", "AcctTotalAssetsCreated",
+    "AcctTotalAssets", "AcctTotalBoxes", "AcctTotalBoxBytes",
+]
+BASE64_ENCODINGS = ["URLEncoding", "StdEncoding"]
+JSON_REF_TYPES = ["JSONString", "JSONUint64", "JSONObject"]
+ECDSA_CURVES = ["Secp256k1", "Secp256r1"]
+VRF_STANDARDS = ["VrfAlgorand"]
+BLOCK_FIELDS = ["BlkSeed", "BlkTimestamp"]
+
+# Named integer constants usable with `int`
+NAMED_INTS = {
+    # OnCompletion
+    "NoOp": 0, "OptIn": 1, "CloseOut": 2, "ClearState": 3, "UpdateApplication": 4, "DeleteApplication": 5,
+    # TypeEnum
+    "unknown": 0, "pay": 1, "keyreg": 2, "acfg": 3, "axfer": 4, "afrz": 5, "appl": 6,
+}
+
+# -----    Opcodes     -----
+# Kinds of immediates: "u8" - byte, "i8" - signed byte, "label" - 2-byte branch offset, "labels" - count and branch
+# offsets, "varuint", "bytes", "varuints", "bytess", or a list of names of a field group
+TXN, GLOBAL = TXN_FIELDS, GLOBAL_FIELDS
+OPS = {
+    "err": (0x00, []), "sha256": (0x01, []), "keccak256": (0x02, []), "sha512_256": (0x03, []),
+    "ed25519verify": (0x04, []), "ecdsa_verify": (0x05, [ECDSA_CURVES]), "ecdsa_pk_decompress": (0x06, [ECDSA_CURVES]),
+    "ecdsa_pk_recover": (0x07, [ECDSA_CURVES]),
+    "+": (0x08, []), "-": (0x09, []), "/": (0x0a, []), "*": (0x0b, []), "<": (0x0c, []), ">": (0x0d, []),
+    "<=": (0x0e, []), ">=": (0x0f, []), "&&": (0x10, []), "||": (0x11, []), "==": (0x12, []), "!=": (0x13, []),
+    "!": (0x14, []), "len": (0x15, []), "itob": (0x16, []), "btoi": (0x17, []), "%": (0x18, []), "|": (0x19, []),
+    "&": (0x1a, []), "^": (0x1b, []), "~": (0x1c, []), "mulw": (0x1d, []), "addw": (0x1e, []), "divmodw": (0x1f, []),
+    "intcblock": (0x20, ["varuints"]), "intc": (0x21, ["u8"]), "intc_0": (0x22, []), "intc_1": (0x23, []),
+    "intc_2": (0x24, []), "intc_3": (0x25, []),
+    "bytecblock": (0x26, ["bytess"]), "bytec": (0x27, ["u8"]), "bytec_0": (0x28, []), "bytec_1": (0x29, []),
+    "bytec_2": (0x2a, []), "bytec_3": (0x2b, []),
+    "arg": (0x2c, ["u8"]), "arg_0": (0x2d, []), "arg_1": (0x2e, []), "arg_2": (0x2f, []), "arg_3": (0x30, []),
+    "txn": (0x31, [TXN]), "global": (0x32, [GLOBAL]), "gtxn": (0x33, ["u8", TXN]), "load": (0x34, ["u8"]),
+    "store": (0x35, ["u8"]), "txna": (0x36, [TXN, "u8"]), "gtxna": (0x37, ["u8", TXN, "u8"]),
+    "gtxns": (0x38, [TXN]), "gtxnsa": (0x39, [TXN, "u8"]), "gload": (0x3a, ["u8", "u8"]), "gloads": (0x3b, ["u8"]),
+    "gaid": (0x3c, ["u8"]), "gaids": (0x3d, []), "loads": (0x3e, []), "stores": (0x3f, []),
+    "bnz": (0x40, ["label"]), "bz": (0x41, ["label"]), "b": (0x42, ["label"]), "return": (0x43, []),
+    "assert": (0x44, []), "bury": (0x45, ["u8"]), "popn": (0x46, ["u8"]), "dupn": (0x47, ["u8"]), "pop": (0x48, []),
+    "dup": (0x49, []), "dup2": (0x4a, []), "dig": (0x4b, ["u8"]), "swap": (0x4c, []), "select": (0x4d, []),
+    "cover": (0x4e, ["u8"]), "uncover": (0x4f, ["u8"]),
+    "concat": (0x50, []), "substring": (0x51, ["u8", "u8"]), "substring3": (0x52, []), "getbit": (0x53, []),
+    "setbit": (0x54, []), "getbyte": (0x55, []), "setbyte": (0x56, []), "extract": (0x57, ["u8", "u8"]),
+    "extract3": (0x58, []), "extract_uint16": (0x59, []), "extract_uint32": (0x5a, []), "extract_uint64": (0x5b, []),
+    "replace2": (0x5c, ["u8"]), "replace3": (0x5d, []), "base64_decode": (0x5e, [BASE64_ENCODINGS]),
+    "json_ref": (0x5f, [JSON_REF_TYPES]),
+    "balance": (0x60, []), "app_opted_in": (0x61, []), "app_local_get": (0x62, []), "app_local_get_ex": (0x63, []),
+    "app_global_get": (0x64, []), "app_global_get_ex": (0x65, []), "app_local_put": (0x66, []),
+    "app_global_put": (0x67, []), "app_local_del": (0x68, []), "app_global_del": (0x69, []),
+    "asset_holding_get": (0x70, [ASSET_HOLDING_FIELDS]), "asset_params_get": (0x71, [ASSET_PARAMS_FIELDS]),
+    "app_params_get": (0x72, [APP_PARAMS_FIELDS]), "acct_params_get": (0x73, [ACCT_PARAMS_FIELDS]),
+    "min_balance": (0x78, []),
+    "pushbytes": (0x80, ["bytes"]), "pushint": (0x81, ["varuint"]), "pushbytess": (0x82, ["bytess"]),
+    "pushints": (0x83, ["varuints"]), "ed25519verify_bare": (0x84, []),
+    "callsub": (0x88, ["label"]), "retsub": (0x89, []), "proto": (0x8a, ["u8", "u8"]), "frame_dig": (0x8b, ["i8"]),
+    "frame_bury": (0x8c, ["i8"]), "switch": (0x8d, ["labels"]), "match": (0x8e, ["labels"]),
+    "shl": (0x90, []), "shr": (0x91, []), "sqrt": (0x92, []), "bitlen": (0x93, []), "exp": (0x94, []),
+    "expw": (0x95, []), "bsqrt": (0x96, []), "divw": (0x97, []), "sha3_256": (0x98, []),
+    "b+": (0xa0, []), "b-": (0xa1, []), "b/": (0xa2, []), "b*": (0xa3, []), "b<": (0xa4, []), "b>": (0xa5, []),
+    "b<=": (0xa6, []), "b>=": (0xa7, []), "b==": (0xa8, []), "b!=": (0xa9, []), "b%": (0xaa, []), "b|": (0xab, []),
+    "b&": (0xac, []), "b^": (0xad, []), "b~": (0xae, []), "bzero": (0xaf, []),
+    "log": (0xb0, []), "itxn_begin": (0xb1, []), "itxn_field": (0xb2, [TXN]), "itxn_submit": (0xb3, []),
+    "itxn": (0xb4, [TXN]), "itxna": (0xb5, [TXN, "u8"]), "itxn_next": (0xb6, []), "gitxn": (0xb7, ["u8", TXN]),
+    "gitxna": (0xb8, ["u8", TXN, "u8"]), "box_create": (0xb9, []), "box_extract": (0xba, []),
+    "box_replace": (0xbb, []), "box_del": (0xbc, []), "box_len": (0xbd, []), "box_get": (0xbe, []),
+    "box_put": (0xbf, []),
+    "txnas": (0xc0, [TXN]), "gtxnas": (0xc1, ["u8", TXN]), "gtxnsas": (0xc2, [TXN]), "args": (0xc3, []),
+    "gloadss": (0xc4, []), "itxnas": (0xc5, [TXN]), "gitxnas": (0xc6, ["u8", TXN]),
+    "vrf_verify": (0xd0, [VRF_STANDARDS]), "block": (0xd1, [BLOCK_FIELDS]),
+}
+
+# Ops that with one more immediate (an array index) are assembled as their "a" variant
+ARRAY_VARIANTS = {"txn": "txna", "gtxn": "gtxna", "gtxns": "gtxnsa", "itxn": "itxna", "gitxn": "gitxna"}
+
+# Version from which the assembler optimizes the constants
+OPTIMIZE_CONSTANTS_VERSION = 4
+
+INTC, BYTEC, PUSHINT, PUSHBYTES = 0x21, 0x27, 0x81, 0x80
+INTC_0, BYTEC_0 = 0x22, 0x28
+
+
+# -----    Encoding helpers     -----
+def _varuint(x: int):
+    out = bytearray()
+    while x >= 0x80:
+        out.append((x & 0x7f) | 0x80)
+        x >>= 7
+    out.append(x)
+    return bytes(out)
+
+
+def _varbytes(b: bytes):
+    return _varuint(len(b)) + b
+
+
+# Token regex: quoted string (with escapes) or a run of non-space characters
+_TOKEN = re.compile(r'"(?:[^"\\]|\\.)*"|\S+')
+
+
+def _tokenize(line: str):
+    tokens = []
+    for m in _TOKEN.finditer(line):
+        token = m.group(0)
+        if token.startswith("//"):
+            break
+        tokens.append(token)
+    return tokens
+
+
+def _parse_int(token: str):
+    if token in NAMED_INTS:
+        return NAMED_INTS[token]
+    try:
+        if token.startswith(("0x", "0X")):
+            value = int(token[2:], 16)
+        elif token.startswith(("0b", "0B")):
+            value = int(token[2:], 2)
+        elif token.startswith(("0o", "0O")):
+            value = int(token[2:], 8)
+        elif len(token) > 1 and token.startswith("0"):
+            value = int(token[1:], 8)
+        else:
+            value = int(token, 10)
+    except ValueError:
+        raise AssemblyError("Unable to parse integer: " + token)
+    if not 0 <= value < 1 << 64:
+        raise AssemblyError("Integer out of range: " + token)
+    return value
+
+
+_ESCAPES = {"n": b"\n", "r": b"\r", "t": b"\t", "\\": b"\\", '"': b'"'}
+
+
+def _parse_string(token: str):
+    body = token[1:-1]
+    out = bytearray()
+    i = 0
+    while i < len(body):
+        c = body[i]
+        if c != "\\":
+            out += c.encode()
+            i += 1
+            continue
+        e = body[i + 1]
+        if e in _ESCAPES:
+            out += _ESCAPES[e]
+            i += 2
+        elif e == "x":
+            out.append(int(body[i + 2:i + 4], 16))
+            i += 4
+        else:
+            raise AssemblyError("Invalid escape sequence in string: " + token)
+    return bytes(out)
+
+
+# Parse the byte constant at the start of args, returns (value, number of consumed args)
+def _parse_bytes(args):
+    if not args:
+        raise AssemblyError("Missing byte constant")
+    token = args[0]
+    if token.startswith('"'):
+        return _parse_string(token), 1
+    if token.startswith(("0x", "0X")):
+        return bytes.fromhex(token[2:]), 1
+    for prefix, decode in (("base64", base64.b64decode), ("b64", base64.b64decode),
+                           ("base32", base64.b32decode), ("b32", base64.b32decode)):
+        if token == prefix:
+            return decode(_pad(args[1], prefix)), 2
+        if token.startswith(prefix + "(") and token.endswith(")"):
+            return decode(_pad(token[len(prefix) + 1:-1], prefix)), 1
+    raise AssemblyError("Unable to parse byte constant: " + token)
+
+
+def _pad(s: str, prefix: str):
+    block = 8 if prefix in ("base32", "b32") else 4
+    return s + "=" * (-len(s) % block)
+
+
+def _field(names, token: str):
+    if token in names:
+        return names.index(token)
+    try:
+        index = int(token)
+    except ValueError:
+        raise AssemblyError("Unknown field: " + token)
+    if not 0 <= index < len(names):
+        raise AssemblyError("Field index out of range: " + token)
+    return index
+
+
+def _u8(token: str, signed: bool = False):
+    value = int(token, 0)
+    low, high = (-128, 127) if signed else (0, 255)
+    if not low <= value <= high:
+        raise AssemblyError("Immediate out of range: " + token)
+    return value & 0xff
+
+
+# -----    Assembler     -----
+class _Program:
+
+    def __init__(self):
+        self.version = 1
+        # Assembled instructions: (kind, data, line number), where kind is "op" (bytes), "int"/"byte" (pseudo-op value)
+        # or a branch (opcode, [labels])
+        self.instructions = []
+        self.labels = {}
+        self.intcblock = None
+        self.bytecblock = None
+
+
+def _parse(source: str):
+    program = _Program()
+    for line_number, line in enumerate(source.splitlines(), start=1):
+        tokens = _tokenize(line)
+        if not tokens:
+            continue
+        op, args = tokens[0], tokens[1:]
+        try:
+            if op == "#pragma":
+                if args[:1] == ["version"]:
+                    if program.instructions:
+                        raise AssemblyError("#pragma version is only allowed before instructions")
+                    program.version = int(args[1])
+                continue
+            if op.endswith(":") and not args:
+                program.labels[op[:-1]] = len(program.instructions)
+                continue
+            program.instructions.append(_parse_instruction(program, op, args) + (line_number,))
+        except (AssemblyError, IndexError, ValueError) as e:
+            raise AssemblyError("{}: {}: {}".format(line_number, line.strip(), e))
+    return program
+
+
+def _parse_instruction(program: _Program, op: str, args):
+    # Pseudo-ops of constants
+    if op == "int":
+        return "int", _parse_int(args[0])
+    if op == "byte":
+        return "byte", _parse_bytes(args)[0]
+    if op == "addr":
+        return "byte", encoding.decode_address(args[0])
+    if op == "method":
+        return "byte", encoding.checksum(_parse_string(args[0]))[:4]
+
+    if op in ARRAY_VARIANTS and len(args) == len(OPS[op][1]) + 1:
+        op = ARRAY_VARIANTS[op]
+    if op not in OPS:
+        raise AssemblyError("Unknown opcode: " + op)
+    opcode, immediates = OPS[op]
+
+    if immediates == ["label"]:
+        return "branch", (opcode, [args[0]], False)
+    if immediates == ["labels"]:
+        return "branch", (opcode, list(args), True)
+
+    out = bytearray([opcode])
+    if immediates == ["varuint"]:
+        out += _varuint(_parse_int(args[0]))
+    elif immediates == ["bytes"]:
+        out += _varbytes(_parse_bytes(args)[0])
+    elif immediates == ["varuints"]:
+        values = [_parse_int(a) for a in args]
+        out += _varuint(len(values)) + b"".join(_varuint(v) for v in values)
+        if op == "intcblock":
+            program.intcblock = values
+    elif immediates == ["bytess"]:
+        values = []
+        while args:
+            value, n = _parse_bytes(args)
+            values.append(value)
+            args = args[n:]
+        out += _varuint(len(values)) + b"".join(_varbytes(v) for v in values)
+        if op == "bytecblock":
+            program.bytecblock = values
+    else:
+        if len(args) != len(immediates):
+            raise AssemblyError("{} expects {} immediate arguments".format(op, len(immediates)))
+        for kind, arg in zip(immediates, args):
+            if kind == "u8":
+                out.append(_u8(arg))
+            elif kind == "i8":
+                out.append(_u8(arg, signed=True))
+            else:
+                out.append(_field(kind, arg))
+    return "op", bytes(out)
+
+
+# Function returns the constant block and the encoding of each of its values, either from an explicit block or by
+# optimizing the constants as the go-algorand assembler does
+def _constants(values, block, optimize: bool):
+    if block is not None:
+        missing = [v for v in values if v not in block]
+        if missing:
+            raise AssemblyError("Value not found in constant block: {}".format(missing[0]))
+        return block, {v: block.index(v) for v in values}
+
+    first_occurrence = list(dict.fromkeys(values))
+    if not optimize:
+        return first_occurrence, {v: i for i, v in enumerate(first_occurrence)}
+
+    freq = {v: 0 for v in first_occurrence}
+    for v in values:
+        freq[v] += 1
+    # Descending frequency, ties broken by first occurrence (stable sort)
+    ordered = sorted(first_occurrence, key=lambda v: -freq[v])
+    block = [v for v in ordered if freq[v] > 1]
+    return block, {v: i for i, v in enumerate(block)}
+
+
+def _constant_ref(value, index, block_ref: int, block_ref_0: int, push: int, encode):
+    if index is None:
+        return bytes([push]) + encode(value)
+    if index < 4:
+        return bytes([block_ref_0 + index])
+    return bytes([block_ref, index])
+
+
+# Function assembles the TEAL source into bytecode
+def assemble(source: str):
+    program = _parse(source)
+    optimize = program.version >= OPTIMIZE_CONSTANTS_VERSION
+
+    ints = [data for kind, data, _ in program.instructions if kind == "int"]
+    byte_values = [data for kind, data, _ in program.instructions if kind == "byte"]
+    intc, int_index = _constants(ints, program.intcblock, optimize)
+    bytec, byte_index = _constants(byte_values, program.bytecblock, optimize)
+
+    # Encode all instructions except the branches, whose sizes are known
+    chunks = []
+    for kind, data, line_number in program.instructions:
+        if kind == "int":
+            chunks.append(_constant_ref(data, int_index.get(data), INTC, INTC_0, PUSHINT, _varuint))
+        elif kind == "byte":
+            chunks.append(_constant_ref(data, byte_index.get(data), BYTEC, BYTEC_0, PUSHBYTES, _varbytes))
+        elif kind == "op":
+            chunks.append(data)
+        else:
+            opcode, labels, counted = data
+            chunks.append((opcode, labels, counted, line_number))
+
+    def size(chunk):
+        if isinstance(chunk, bytes):
+            return len(chunk)
+        _, labels, counted, _ = chunk
+        return 1 + (1 if counted else 0) + 2 * len(labels)
+
+    positions = []
+    pc = 0
+    for chunk in chunks:
+        positions.append(pc)
+        pc += size(chunk)
+    positions.append(pc)
+
+    # Resolve the branch offsets, relative to the end of the branch instruction
+    code = bytearray()
+    for i, chunk in enumerate(chunks):
+        if isinstance(chunk, bytes):
+            code += chunk
+            continue
+        opcode, labels, counted, line_number = chunk
+        end = positions[i] + size(chunk)
+        code.append(opcode)
+        if counted:
+            code.append(len(labels))
+        for label in labels:
+            if label not in program.labels:
+                raise AssemblyError("{}: reference to undefined label {}".format(line_number, label))
+            offset = positions[program.labels[label]] - end
+            if not -0x8000 <= offset <= 0x7fff:
+                raise AssemblyError("{}: label {} is too far away".format(line_number, label))
+            code += (offset & 0xffff).to_bytes(2, 'big')
+
+    # Prepend version and constant blocks (unless given explicitly in the program)
+    header = bytearray(_varuint(program.version))
+    if intc and program.intcblock is None:
+        header += bytes([0x20]) + _varuint(len(intc)) + b"".join(_varuint(v) for v in intc)
+    if bytec and program.bytecblock is None:
+        header += bytes([0x26]) + _varuint(len(bytec)) + b"".join(_varbytes(v) for v in bytec)
+    return bytes(header + code)
+
+
+# Function assembles the TEAL source and returns the bytecode base64 encoded, i.e. same as algod's compile result
+def assemble_b64(source: str):
+    return base64.b64encode(assemble(source)).decode()
+
+
+# Function assembles the TEAL source offline and checks that algod's compile returns the same bytecode
+def cross_check(algod_client, source: str):
+    offline = assemble_b64(source)
+    online = algod_client.compile(source)["result"]
+    if offline != online:
+        raise AssemblyError("Offline assembly differs from algod's compile")
+    return offline
@@ -0,0 +1,41 @@
+# -----------------           Description          -----------------
+# Configuration of the contracts (src/config.py) with the state keys and constants as PyTeal expressions. It is kept
+# separate from src/config.py, thus the off-chain tools can import the configuration without importing PyTeal.
+
+# -----------------           Imports          -----------------
+from pyteal import *
+from src.config import *
+import src.config as cfg
+
+# ---------------------------------------------------------------
+
+LOCAL_STAKE_ZERO_BYTES = BytesZero(Int(LOCAL_STAKE_SIZE))
+# Local stake representation of 1
+LOCAL_STAKE_ONE_BYTES = Bytes("base16", (1 << (8 * LOCAL_STAKE_N)).to_bytes(LOCAL_STAKE_SIZE, 'big').hex())
+
+# ----- -----    Compound Contract     ----- -----
+# ----- Global variables  -----
+CC_total_stake = Bytes(cfg.CC_total_stake)
+CC_pool_end_round = Bytes(cfg.CC_pool_end_round)
+CC_pool_start_round = Bytes(cfg.CC_pool_start_round)
+CC_last_compound_done = Bytes(cfg.CC_last_compound_done)
+CC_last_compound_round = Bytes(cfg.CC_last_compound_round)
+CC_number_of_stakers = Bytes(cfg.CC_number_of_stakers)
+CC_claiming_period = Bytes(cfg.CC_claiming_period)
+CC_number_of_boxes = Bytes(cfg.CC_number_of_boxes)
+CC_cumulative_index = Bytes(cfg.CC_cumulative_index)
+CC_SC_ID = Bytes(cfg.CC_SC_ID)
+CC_AC_ID = Bytes(cfg.CC_AC_ID)
+CC_S_ASA_ID = Bytes(cfg.CC_S_ASA_ID)
+CC_schedule_policy = Bytes(cfg.CC_schedule_policy)
+
+# -----  Local variables  -----
+CC_local_number_of_boxes = Bytes(cfg.CC_local_number_of_boxes)
+CC_local_stake = Bytes(cfg.CC_local_stake)
+
+# ----- -----    Farm Compound Contract     ----- -----
+# ----- Global variables  -----
+FC_R_ASA_ID = Bytes(cfg.FC_R_ASA_ID)
+FC_AMM_ID = Bytes(cfg.FC_AMM_ID)
+FC_P_ADDR = Bytes(cfg.FC_P_ADDR)
+FC_MRAAL = Bytes(cfg.FC_MRAAL)
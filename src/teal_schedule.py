@@ -0,0 +1,39 @@
+# -----------------           Description          -----------------
+# Compounding schedule of the contracts as PyTeal expressions: the number of triggers the contract can still pay the
+# fees for, and the round from which `trigger_compound` can be called, according to the schedule policy selected at the
+# creation of the contract (see the policies in src/config.py). Mirrored off-chain by src/schedule.py.
+
+# -----------------           Imports          -----------------
+from pyteal import *
+from src.teal_config import *
+
+# ---------------------------------------------------------------
+
+
+# number_of_triggers(fee_for_compound: int) -> Expr:
+#  Number of compoundings the contract can still pay the fees for
+#
+def number_of_triggers(fee_for_compound: int) -> Expr:
+    return (Balance(Global.current_application_address()) - MinBalance(Global.current_application_address())) / \
+        Int(fee_for_compound)
+
+
+# next_compound_round(fee_for_compound: int) -> Expr:
+#  Round from which compounding can be triggered - the last compound round plus the interval of the schedule policy
+#
+def next_compound_round(fee_for_compound: int) -> Expr:
+
+    # Number of triggers, stored as the balance is read only once
+    triggers = ScratchVar()
+
+    rounds = App.globalGet(CC_pool_end_round) - App.globalGet(CC_last_compound_round)
+
+    return Seq(
+        triggers.store(number_of_triggers(fee_for_compound)),
+        If(App.globalGet(CC_schedule_policy) == Int(SCHEDULE_FRONT_LOADED)).Then(
+            # The next interval is 1/SCHEDULE_FRONT_LOAD_FACTOR of each of the ones after it
+            rounds / ((triggers.load() - Int(1)) * Int(SCHEDULE_FRONT_LOAD_FACTOR) + Int(1)),
+        ).Else(
+            rounds / triggers.load(),
+        ) + App.globalGet(CC_last_compound_round),
+    )
@@ -0,0 +1,142 @@
+# -----------------           Description          -----------------
+# References of the contract's fixed-point arithmetic, which the exact integer emulation (src/fixed_point.py) is checked
+# against by tests/test_fixed_point.py and benchmarks/bench_fixed_point.py:
+#  - a byte-level reference that evaluates the contract expressions literally on big-endian byte strings,
+#  - an exact Decimal reference that truncates only where the contract does,
+#  - the Decimal path originally used for the off-chain stake estimate, and claiming the increases one by one, as the
+#    contract did before recording the cumulative indices (both only approximate the cumulative index).
+
+# -----------------           Imports          -----------------
+from decimal import Decimal, Context, ROUND_DOWN
+
+import src.fixed_point as fp
+from src.config import LOCAL_STAKE_N
+
+# ---------------------------------------------------------------
+
+
+# -----    Byte-level reference of the TEAL opcodes     -----
+def btoi_big(b):
+    return int.from_bytes(b, 'big')
+
+
+def to_bytes(x):
+    return x.to_bytes((x.bit_length() + 7) // 8, 'big')
+
+
+def itob(x):
+    return x.to_bytes(8, 'big')
+
+
+def bzero(n):
+    return bytes(n)
+
+
+def b_add(a, b):
+    return to_bytes(btoi_big(a) + btoi_big(b))
+
+
+def b_div(a, b):
+    assert len(a) <= 64 and len(b) <= 64
+    return to_bytes(btoi_big(a) // btoi_big(b))
+
+
+def b_mul(a, b):
+    assert len(a) <= 64 and len(b) <= 64
+    return to_bytes(btoi_big(a) * btoi_big(b))
+
+
+# increase in claim_stake_record()
+def ref_increase(claim_amt, total_stake):
+    return b_add(
+        itob(1) + bzero(LOCAL_STAKE_N),
+        b_div(itob(claim_amt) + bzero(LOCAL_STAKE_N), bzero(LOCAL_STAKE_N) + itob(total_stake))
+    )
+
+
+# cumulative index update in claim_stake_record()
+def ref_compound_index(index, increase):
+    return b_div(b_mul(index, increase), itob(1) + bzero(LOCAL_STAKE_N))
+
+
+# local stake update in local_claim_box()
+def ref_local_claim_box(ls, from_index, to_index):
+    return b_div(b_mul(ls, to_index), from_index)
+
+
+# -----    Exact Decimal reference     -----
+# Precision suffices for the exact product of two 64-byte numbers, thus only the explicit truncations round
+_EXACT = Context(prec=400, rounding=ROUND_DOWN)
+_DEC_ONE = Decimal(2 ** (8 * LOCAL_STAKE_N))
+
+
+def _to_raw(x):
+    return int(_EXACT.multiply(x, _DEC_ONE).to_integral_value(rounding=ROUND_DOWN, context=_EXACT))
+
+
+def _from_raw(x):
+    return _EXACT.divide(Decimal(x), _DEC_ONE)
+
+
+def _truncate(x):
+    return _from_raw(_to_raw(x))
+
+
+# increase in claim_stake_record(): 1 + claim_amt / total stake, truncated to N fractional bytes
+def dec_increase(claim_amt, total_stake):
+    return _to_raw(_EXACT.add(1, _truncate(_EXACT.divide(Decimal(claim_amt), Decimal(total_stake)))))
+
+
+# cumulative index update in claim_stake_record()
+def dec_compound_index(index, increase):
+    return _to_raw(_EXACT.multiply(_from_raw(index), _from_raw(increase)))
+
+
+# local stake update in local_claim_box()
+def dec_local_claim_box(ls, from_index, to_index):
+    return _to_raw(_EXACT.divide(_EXACT.multiply(_from_raw(ls), _from_raw(to_index)), _from_raw(from_index)))
+
+
+# -----    Decimal path of the original off-chain estimate     -----
+def decimal_local_claim(ls, increases):
+    local_stake = Decimal(ls)
+    for increase in increases:
+        local_stake = local_stake * (Decimal(increase) / _DEC_ONE)
+    return (local_stake / _DEC_ONE).quantize(Decimal('1'), rounding=ROUND_DOWN)
+
+
+# -----    Claiming of the increases one by one     -----
+def sequential_local_claim(ls, increases):
+    for increase in increases:
+        ls = ls * increase >> fp.SHIFT
+    return ls
+
+
+# -----    Random compoundings     -----
+def random_compounding(rng):
+    # Total stake and a claimed reward that is a small (possibly zero) fraction of it
+    total_stake = rng.randint(1, 10 ** 15)
+    claim_amt = rng.randint(0, max(total_stake // rng.choice([1_000, 1_000_000, 1_000_000_000]), 1))
+    return claim_amt, total_stake
+
+
+# Function checks the emulation against the byte-level and the exact Decimal reference on n random compoundings
+def check_bit_exact(rng, n):
+    index = fp.ONE
+    for _ in range(n):
+        claim_amt, total_stake = random_compounding(rng)
+        increase = fp.compound_increase(claim_amt, total_stake)
+        assert increase == btoi_big(ref_increase(claim_amt, total_stake))
+        assert increase == dec_increase(claim_amt, total_stake)
+
+        new_index = fp.compound_index(index, increase)
+        assert new_index == btoi_big(ref_compound_index(to_bytes(index), to_bytes(increase)))
+        assert new_index == dec_compound_index(index, increase)
+
+        ls = rng.getrandbits(rng.randint(1, 8 * (LOCAL_STAKE_N + 7)))
+        new_ls = fp.local_claim_box(ls, index, new_index)
+        assert new_ls == btoi_big(ref_local_claim_box(to_bytes(ls), to_bytes(index), to_bytes(new_index)))
+        assert new_ls == dec_local_claim_box(ls, index, new_index)
+        # Restart the index now and then, thus it does not grow out of the checked range
+        index = new_index if rng.random() < 0.99 else fp.ONE
+    print("bit-exact with byte-level and Decimal reference: {} random compoundings".format(n))
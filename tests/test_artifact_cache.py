@@ -0,0 +1,70 @@
+# -----------------           Description          -----------------
+# Checks that the bytecode of the artifact cache of the compiled contracts (src/artifact_cache.py) is cross-checked
+# against algod before it is used with an algod client, also when the artifact has been cached by an offline tool.
+# Run from the repository root with: python -m pytest tests
+
+# -----------------           Imports          -----------------
+import pytest
+
+import src.config as cfg
+from src.artifact_cache import compile_contract, artifact_key, contract_sources, load_artifact
+from src.teal_assembler import AssemblyError, assemble_b64
+
+# ---------------------------------------------------------------
+
+NAME = "CompoundContract"
+MODULE = "src.CompoundContract"
+
+
+# Stand-in of algod's compile, returning the bytecode of the offline assembler (or a different one)
+class CompilingClient:
+
+    def __init__(self, differs: bool = False):
+        self.differs = differs
+        self.compiles = 0
+
+    def compile(self, source: str):
+        self.compiles += 1
+        return {"result": assemble_b64(source + "\nint 1\n" if self.differs else source)}
+
+
+@pytest.fixture(autouse=True)
+def artifact_dirs(tmp_path, monkeypatch):
+    monkeypatch.setattr(cfg, "COMPILED_FILES_DIR", str(tmp_path))
+    monkeypatch.setattr(cfg, "ARTIFACT_CACHE_DIR", str(tmp_path / "artifacts"))
+    monkeypatch.setattr(cfg, "OFFLINE_ASSEMBLY", True)
+    monkeypatch.setattr(cfg, "ASSEMBLY_CROSS_CHECK", True)
+
+
+def _artifact():
+    return load_artifact(artifact_key(NAME, contract_sources(MODULE)))
+
+
+def test_artifact_of_offline_tool_is_checked_on_first_use_with_client():
+    compile_contract(None, NAME, MODULE)
+    assert not _artifact()["verified"]
+
+    client = CompilingClient()
+    compile_contract(client, NAME, MODULE)
+    assert client.compiles == 2
+    assert _artifact()["verified"]
+
+    # Verified artifacts are not checked again
+    compile_contract(client, NAME, MODULE)
+    assert client.compiles == 2
+
+
+def test_cached_bytecode_differing_from_algod_is_rejected():
+    compile_contract(None, NAME, MODULE)
+    with pytest.raises(AssemblyError):
+        compile_contract(CompilingClient(differs=True), NAME, MODULE)
+    assert not _artifact()["verified"]
+
+
+def test_key_depends_on_assembly_mode(monkeypatch):
+    key = artifact_key(NAME, contract_sources(MODULE))
+    monkeypatch.setattr(cfg, "ASSEMBLY_CROSS_CHECK", False)
+    assert artifact_key(NAME, contract_sources(MODULE)) != key
+    monkeypatch.setattr(cfg, "OFFLINE_ASSEMBLY", False)
+    assert len({key, artifact_key(NAME, contract_sources(MODULE))}) == 2
+    assert "src/teal_assembler.py" in " ".join(contract_sources(MODULE)).replace("\\", "/")
@@ -0,0 +1,107 @@
+# -----------------           Description          -----------------
+# Property checks of the exact integer emulation of the contract's fixed-point arithmetic (src/fixed_point.py) against
+# the byte-level and the exact Decimal references (tests/fixed_point_ref.py). benchmarks/bench_fixed_point.py runs the
+# same checks on more compoundings.
+# Run from the repository root with: python -m pytest tests
+
+# -----------------           Imports          -----------------
+import random
+
+import pytest
+
+import src.fixed_point as fp
+from src.config import LOCAL_STAKE_N
+from tests.fixed_point_ref import btoi_big, to_bytes, ref_increase, ref_compound_index, ref_local_claim_box, \
+    dec_increase, dec_compound_index, dec_local_claim_box, decimal_local_claim, sequential_local_claim, \
+    random_compounding, check_bit_exact
+
+# ---------------------------------------------------------------
+
+# Number of random compoundings per check
+COMPOUNDINGS = 2_000
+
+
+def test_bit_exact_with_references():
+    check_bit_exact(random.Random(0), COMPOUNDINGS)
+
+
+def test_increase_edge_cases():
+    # Nothing claimed, or less than the precision of the local stake
+    assert fp.compound_increase(0, 1) == fp.ONE
+    assert fp.compound_increase(1, 2 ** 64 + 1) == fp.ONE
+    # Claimed all of the stake, and the largest claim
+    assert fp.compound_increase(1, 1) == 2 * fp.ONE
+    assert fp.compound_increase(fp.MAX_UINT64, 1) == fp.ONE + fp.to_fixed(fp.MAX_UINT64)
+    for claim_amt, total_stake in ((0, 1), (1, 1), (fp.MAX_UINT64, 1), (1, fp.MAX_UINT64)):
+        increase = fp.compound_increase(claim_amt, total_stake)
+        assert increase == btoi_big(ref_increase(claim_amt, total_stake))
+        assert increase == dec_increase(claim_amt, total_stake)
+
+    with pytest.raises(ValueError):
+        fp.compound_increase(1, 0)
+
+
+def test_index_is_non_decreasing():
+    rng = random.Random(1)
+    index = fp.ONE
+    for _ in range(COMPOUNDINGS):
+        increase = fp.compound_increase(*random_compounding(rng))
+        new_index = fp.compound_index(index, increase)
+        assert new_index >= index
+        assert new_index == btoi_big(ref_compound_index(to_bytes(index), to_bytes(increase)))
+        index = new_index
+    # The increase of 1 keeps the index
+    assert fp.compound_index(index, fp.ONE) == index
+    assert fp.compound_index(index, fp.ONE) == dec_compound_index(index, fp.ONE)
+
+
+def test_local_claim_from_indices():
+    rng = random.Random(2)
+    for _ in range(COMPOUNDINGS // 10):
+        ls = fp.to_fixed(rng.randint(1, 10 ** 12))
+        increases = [fp.compound_increase(*random_compounding(rng)) for _ in range(rng.randint(1, 50))]
+        indexes = [fp.ONE]
+        for increase in increases:
+            indexes.append(fp.compound_index(indexes[-1], increase))
+
+        # Claiming up to the same index keeps the stake
+        assert fp.local_claim_box(ls, indexes[-1], indexes[-1]) == ls
+
+        # Claim from any recorded index up to the last one
+        i = rng.randrange(len(indexes))
+        claimed = fp.local_claim_box(ls, indexes[i], indexes[-1])
+        assert claimed >= ls
+        assert claimed == btoi_big(ref_local_claim_box(to_bytes(ls), to_bytes(indexes[i]), to_bytes(indexes[-1])))
+        assert claimed == dec_local_claim_box(ls, indexes[i], indexes[-1])
+
+        # The claimed amount agrees with claiming the increases one by one and with the original Decimal estimate
+        # within the rounding of the intermediate results
+        amt = fp.floor_local_stake(fp.local_claim_box(ls, fp.ONE, indexes[-1]))
+        assert abs(fp.floor_local_stake(sequential_local_claim(ls, increases)) - amt) <= 1
+        assert abs(int(decimal_local_claim(ls, increases)) - amt) <= 1
+
+
+def test_failures_of_the_contract():
+    # Itob of a value that is not uint64
+    with pytest.raises(OverflowError):
+        fp.to_fixed(fp.MAX_UINT64 + 1)
+    # Btoi of more than 8 bytes
+    with pytest.raises(OverflowError):
+        fp.floor_local_stake(fp.to_fixed(fp.MAX_UINT64) + fp.ONE)
+    # Byte-math inputs of more than 64 bytes
+    with pytest.raises(OverflowError):
+        fp.compound_index(fp.MAX_BYTE_MATH_INPUT, fp.ONE)
+    with pytest.raises(OverflowError):
+        fp.local_claim_box(1 << (8 * 40), fp.ONE, 1 << (8 * 40))
+    # Negative result of b-
+    with pytest.raises(ValueError):
+        fp.withdraw_stake(fp.to_fixed(1), 2)
+
+
+def test_stake_and_withdraw():
+    rng = random.Random(3)
+    for _ in range(COMPOUNDINGS):
+        ls = rng.getrandbits(8 * (LOCAL_STAKE_N + 7))
+        amt = rng.randint(0, fp.MAX_UINT64)
+        assert fp.withdraw_stake(fp.add_stake(ls, amt), amt) == ls
+        assert fp.floor_local_stake(fp.add_stake(fp.to_fixed(amt // 2), amt // 2)) == amt // 2 * 2
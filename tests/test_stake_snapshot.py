@@ -0,0 +1,38 @@
+# -----------------           Description          -----------------
+# Checks of the projection of the stakes of all accounts in the stake snapshot (demo/stake_snapshot.py) against the
+# emulation of local_claim_box (src/fixed_point.py).
+# Run from the repository root with: python -m pytest tests
+
+# -----------------           Imports          -----------------
+import src.fixed_point as fp
+from demo.stake_snapshot import project_local_claims
+
+# ---------------------------------------------------------------
+
+
+def _indexes(increases):
+    indexes = {0: fp.ONE}
+    for i, increase in enumerate(increases, 1):
+        indexes[i] = fp.compound_index(indexes[i - 1], increase)
+    return indexes
+
+
+def test_projection_matches_local_claim():
+    indexes = _indexes([fp.compound_increase(claim, 1_000_000) for claim in (1_000, 0, 250, 7, 99_999)])
+    local_stakes = [fp.to_fixed(amt) for amt in (1, 10, 12_345, 10 ** 9, 0, 3)]
+    local_boxes = [0, 1, 2, 3, 5, 4]
+
+    projected = project_local_claims(local_stakes, local_boxes, indexes, 5)
+    assert projected == [fp.local_claim_box(ls, indexes[lnb], indexes[5]) for ls, lnb in zip(local_stakes, local_boxes)]
+
+
+def test_projection_after_boxes_deleted():
+    # delete_boxes lowered NB from 130 to 64, below the LNB of some accounts - only the indices up to NB are known
+    indexes = _indexes([fp.compound_increase(1, 1_000)] * 64)
+    local_stakes = [fp.to_fixed(amt) for amt in (100, 200, 300)]
+    local_boxes = [10, 100, 130]
+
+    projected = project_local_claims(local_stakes, local_boxes, indexes, 64)
+    assert projected[0] == fp.local_claim_box(local_stakes[0], indexes[10], indexes[64])
+    # Nothing is left to claim for the accounts ahead of NB
+    assert projected[1:] == local_stakes[1:]
@@ -1,6 +1,36 @@
+import asyncio
 import base64
+import concurrent.futures
+import copy
+import heapq
+import http.client
+import itertools
+import json
+import queue
+import socket
+import threading
+from urllib import parse
 from algosdk.v2client import algod
-from time import sleep, time
+from algosdk import abi, constants, error
+from algosdk.atomic_transaction_composer import (
+    ABI_RETURN_HASH, ABIResult, AtomicTransactionComposer, AtomicTransactionComposerStatus, AtomicTransactionResponse
+)
+from time import sleep, time, perf_counter
+
+import src.config as cfg
+from src.contract_state import decode_state
+
+# Names exported by `from util import *`, which the contracts and the demo use - only the helpers of this module, thus
+# the modules it imports (e.g. algosdk's abi, which would shadow PyTeal's abi in the contracts) are not re-exported
+__all__ = [
+    "compile_program", "compile_program_b64",
+    "format_state", "read_global_state", "read_contract_state", "read_local_state",
+    "PooledAlgodClient", "CachedAlgodClient",
+    "RoundFollower", "round_follower",
+    "SuggestedParamsCache", "suggested_params",
+    "SubmissionPipeline", "submission_pipeline",
+    "waitUntilRound", "log_gtx",
+]
 
 
 # Helper function to compile program source to base64 encoding
@@ -40,6 +70,11 @@ def read_global_state(client, app_id):
     )
     return format_state(global_state)
 
+# helper function to read the global state of a (farm) compound contract as a typed state (see src/contract_state.py)
+def read_contract_state(client, app_id):
+    app = client.application_info(app_id)
+    return decode_state(app["params"].get("global-state", []))
+
 # helper function to read app local state for account
 def read_local_state(client, address, app_id):
     app = client.account_application_info(address, app_id)
@@ -49,16 +84,535 @@ def read_local_state(client, address, app_id):
     return format_state(local_state)
 
 
+# Algod client which sends its requests over a pool of persistent (keep-alive) HTTP connections, instead of opening a new
+# connection for each request as algod.AlgodClient does. It is a drop-in replacement of algod.AlgodClient, which also
+# records the latency of the requests to each endpoint.
+class PooledAlgodClient(algod.AlgodClient):
+
+    def __init__(self, algod_token: str, algod_address: str, headers=None, pool_size: int = cfg.ALGOD_POOL_SIZE,
+                 timeout: float = None):
+        super().__init__(algod_token, algod_address, headers)
+        url = parse.urlsplit(algod_address)
+        self._connection_class = http.client.HTTPSConnection if url.scheme == "https" else http.client.HTTPConnection
+        self._host = url.hostname
+        self._port = url.port
+        self._base_path = url.path.rstrip("/")
+        # Timeout of the connections [s] - None by default since status_after_block waits for the next round
+        self.timeout = timeout
+        self.pool_size = pool_size
+
+        # Idle connections and the number of connections that can still be opened
+        self._idle = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(pool_size)
+        # Latency of the requests to each endpoint: endpoint -> (number of requests, total time [s], max time [s])
+        self._latency = {}
+        self._latency_lock = threading.Lock()
+
+    def algod_request(self, method, requrl, params=None, data=None, headers=None, response_format="json"):
+        header = {"User-Agent": "py-algorand-sdk"}
+        if self.headers:
+            header.update(self.headers)
+        if headers:
+            header.update(headers)
+        if requrl not in constants.no_auth:
+            header.update({constants.algod_auth_header: self.algod_token})
+
+        endpoint = requrl
+        if requrl not in constants.unversioned_paths:
+            requrl = algod.api_version_path_prefix + requrl
+        if params:
+            requrl = requrl + "?" + parse.urlencode(params)
+
+        t = perf_counter()
+        status, body = self._request(method, self._base_path + requrl, data, header)
+        self._record(_endpoint_name(endpoint), perf_counter() - t)
+
+        if status >= 400:
+            message = body.decode("utf-8")
+            try:
+                message = json.loads(message)["message"]
+            finally:
+                raise error.AlgodHTTPError(message, status)
+        if response_format == "json":
+            try:
+                return json.loads(body)
+            except Exception as e:
+                raise error.AlgodResponseError("Failed to parse JSON response from algod") from e
+        return body
+
+    # Latency of the requests to each endpoint: endpoint -> (number of requests, mean time [s], max time [s])
+    def latency(self):
+        with self._latency_lock:
+            return {e: (n, total / n, max_t) for e, (n, total, max_t) in self._latency.items()}
+
+    # Close all idle connections
+    def close(self):
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                return
+
+    def _request(self, method, url, data, header):
+        with self._slots:
+            try:
+                connection, reused = self._idle.get_nowait(), True
+            except queue.Empty:
+                connection, reused = self._connect(), False
+
+            while True:
+                try:
+                    connection.request(method, url, body=data, headers=header)
+                    response = connection.getresponse()
+                    body = response.read()
+                    break
+                except (http.client.HTTPException, OSError):
+                    connection.close()
+                    if not reused:
+                        raise
+                    # Idle connection has been closed by the node in the meantime - retry once with a new one
+                    connection, reused = self._connect(), False
+
+            if response.will_close:
+                connection.close()
+            else:
+                self._idle.put(connection)
+            return response.status, body
+
+    def _connect(self):
+        connection = self._connection_class(self._host, self._port, timeout=self.timeout)
+        connection.connect()
+        # Requests are small and sent as a whole, thus don't delay them on a connection that is kept alive
+        connection.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        return connection
+
+    def _record(self, endpoint, dt):
+        with self._latency_lock:
+            n, total, max_t = self._latency.get(endpoint, (0, 0.0, 0.0))
+            self._latency[endpoint] = (n + 1, total + dt, max(max_t, dt))
+
+
+# Pooled algod client which additionally caches the responses of application_info, account_application_info and
+# account_info for the current round (as seen by the round follower), thus repeated reads of the same state within one
+# operation or screen are served from memory. Concurrent identical requests are coalesced into a single request to the
+# node. Cached responses are dropped when the round advances and when any transaction is seen confirmed (e.g. by
+# atc.execute or the submission pipeline), since the state could have been changed by it.
+class CachedAlgodClient(PooledAlgodClient):
+
+    def __init__(self, algod_token: str, algod_address: str, headers=None, pool_size: int = cfg.ALGOD_POOL_SIZE,
+                 timeout: float = None):
+        super().__init__(algod_token, algod_address, headers, pool_size, timeout)
+        # Number of requests served from the cache, sent to the node and coalesced with one in flight
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+
+        self._cache_lock = threading.Lock()
+        # Cached responses of the round self._cache_round: (method, arguments) -> response
+        self._cache = {}
+        self._cache_round = 0
+        # Number of times the cache has been invalidated
+        self._generation = 0
+        # Requests in flight: (method, arguments, round, generation) -> future of the response
+        self._in_flight = {}
+
+    def application_info(self, application_id, **kwargs):
+        return self._cached(super().application_info, ("application_info", application_id), kwargs)
+
+    def account_application_info(self, address, application_id, **kwargs):
+        return self._cached(super().account_application_info, ("account_application_info", address, application_id),
+                            kwargs)
+
+    def account_info(self, address, exclude=None, **kwargs):
+        return self._cached(super().account_info, ("account_info", address, exclude), kwargs)
+
+    def pending_transaction_info(self, transaction_id, response_format="json", **kwargs):
+        info = super().pending_transaction_info(transaction_id, response_format, **kwargs)
+        if response_format == "json" and info.get("confirmed-round", 0) > 0:
+            self.invalidate()
+        return info
+
+    # Drop all cached responses
+    def invalidate(self):
+        with self._cache_lock:
+            self._cache = {}
+            self._generation += 1
+
+    def _cached(self, request, key, kwargs):
+        if kwargs:
+            # Requests with additional options are not cached
+            return request(*key[1:], **kwargs)
+
+        current_round = round_follower(self).start().last_round
+        with self._cache_lock:
+            if self._cache_round != current_round:
+                self._cache = {}
+                self._cache_round = current_round
+            if key in self._cache:
+                self.hits += 1
+                return copy.deepcopy(self._cache[key])
+
+            generation = self._generation
+            flight_key = key + (current_round, generation)
+            future = self._in_flight.get(flight_key)
+            owner = future is None
+            if owner:
+                self.misses += 1
+                future = self._in_flight[flight_key] = concurrent.futures.Future()
+            else:
+                self.coalesced += 1
+
+        if not owner:
+            # Wait for the identical request in flight
+            return copy.deepcopy(future.result())
+
+        try:
+            response = request(*key[1:])
+        except Exception as e:
+            with self._cache_lock:
+                self._in_flight.pop(flight_key, None)
+            future.set_exception(e)
+            raise
+
+        with self._cache_lock:
+            self._in_flight.pop(flight_key, None)
+            if self._generation == generation and self._cache_round == current_round:
+                self._cache[key] = response
+        future.set_result(response)
+        return copy.deepcopy(response)
+
+
+# Endpoint name of the request URL used for recording the latency, e.g. "/applications/{id}/box" - IDs, addresses and
+# transaction IDs are replaced with {id}
+def _endpoint_name(requrl: str):
+    return "/".join("{id}" if p.isdigit() or (len(p) in (52, 58) and p.isalnum() and p.isupper()) else p
+                    for p in requrl.split("/"))
+
+
+# Follower of the rounds of a node. A single background thread long-polls the node (status_after_block) for each new
+# round, while any number of threads and coroutines can wait for a round without making requests of their own.
+class RoundFollower:
+
+    def __init__(self, client: algod.AlgodClient):
+        self.client = client
+        # Last round seen by the follower
+        self.last_round = 0
+
+        self._cond = threading.Condition()
+        # Heap of (round, sequence number, event loop, future) of waiting coroutines
+        self._waiters = []
+        self._seq = itertools.count()
+        self._thread = None
+        self._stopped = False
+        # Functions called (in the follower's thread) with each new round
+        self._listeners = []
+
+    # Start following the rounds (if not started yet)
+    def start(self):
+        with self._cond:
+            if self._thread is None:
+                self._stopped = False
+                self.last_round = self.client.status().get('last-round')
+                self._thread = threading.Thread(target=self._follow, daemon=True)
+                self._thread.start()
+        return self
+
+    # Stop following the rounds, releasing all waiters
+    def stop(self):
+        with self._cond:
+            self._stopped = True
+            self._thread = None
+            self._cond.notify_all()
+            for _, _, loop, future in self._waiters:
+                try:
+                    loop.call_soon_threadsafe(future.cancel)
+                except RuntimeError:
+                    pass
+            self._waiters = []
+
+    # Call the function with each new round. It is called in the follower's thread, thus it should return quickly.
+    def add_listener(self, listener):
+        with self._cond:
+            self._listeners.append(listener)
+
+    # Block until the round has been reached or until timeout [s]. Returns the last round.
+    def wait_for_round(self, round: int, timeout: float = None):
+        self.start()
+        with self._cond:
+            self._cond.wait_for(lambda: self.last_round >= round or self._stopped, timeout)
+            return self.last_round
+
+    # Wait (in the running event loop) until the round has been reached. Returns the last round.
+    async def wait_for_round_async(self, round: int):
+        self.start()
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        with self._cond:
+            if self.last_round >= round:
+                return self.last_round
+            heapq.heappush(self._waiters, (round, next(self._seq), loop, future))
+        return await future
+
+    def _follow(self):
+        while True:
+            with self._cond:
+                # Thread has been stopped (and possibly replaced by a new one)
+                if self._thread is not threading.current_thread():
+                    return
+                last_round = self.last_round
+
+            try:
+                status = self.client.status_after_block(last_round)
+            except Exception:
+                sleep(1)
+                continue
+
+            with self._cond:
+                if self._thread is not threading.current_thread():
+                    return
+                new_round = status.get('last-round') > self.last_round
+                self.last_round = max(self.last_round, status.get('last-round'))
+                self._cond.notify_all()
+                while self._waiters and self._waiters[0][0] <= self.last_round:
+                    _, _, loop, future = heapq.heappop(self._waiters)
+                    try:
+                        loop.call_soon_threadsafe(_resolve, future, self.last_round)
+                    except RuntimeError:
+                        # Event loop of the waiter has already been closed
+                        pass
+                listeners = list(self._listeners) if new_round else []
+                last_round = self.last_round
+
+            for listener in listeners:
+                try:
+                    listener(last_round)
+                except Exception:
+                    pass
+
+
+def _resolve(future, result):
+    if not future.done():
+        future.set_result(result)
+
+
+# Round followers shared by all users of the same client
+_round_followers = {}
+_round_followers_lock = threading.RLock()
+
+
+# Function returns the round follower shared by all users of the client
+def round_follower(client: algod.AlgodClient):
+    with _round_followers_lock:
+        if client not in _round_followers:
+            _round_followers[client] = RoundFollower(client)
+        return _round_followers[client]
+
+
+# Cache of the suggested transaction parameters of a node. Parameters are fetched at most once per round: when a new
+# block arrives, they are refreshed in the background (if they have been used since the last refresh). Each user gets
+# a copy of the cached parameters with first and last valid rounds moved to the current round.
+class SuggestedParamsCache:
+
+    def __init__(self, client: algod.AlgodClient, follower: RoundFollower = None):
+        self.client = client
+        self.follower = follower if follower is not None else round_follower(client)
+        # Number of requests served from the cache and from the node
+        self.hits = 0
+        self.misses = 0
+
+        self._lock = threading.Lock()
+        self._params = None
+        # Whether the parameters have been used since they were last fetched
+        self._used = False
+        self.follower.add_listener(self._on_round)
+
+    # Copy of the suggested parameters valid from the current round
+    def get(self):
+        self.follower.start()
+        with self._lock:
+            current_round = self.follower.last_round
+            if self._params is not None and self._params.first >= current_round:
+                self.hits += 1
+                self._used = True
+                return self._copy(current_round)
+            self.misses += 1
+
+        params = self.client.suggested_params()
+        with self._lock:
+            if self._params is None or params.first >= self._params.first:
+                self._params = params
+            self._used = True
+            return self._copy(max(current_round, params.first))
+
+    def _copy(self, first):
+        params = copy.copy(self._params)
+        params.last = first + (params.last - params.first)
+        params.first = first
+        return params
+
+    # Refresh the parameters with a new round, if they are in use
+    def _on_round(self, last_round: int):
+        with self._lock:
+            if not self._used:
+                return
+            self._used = False
+        params = self.client.suggested_params()
+        with self._lock:
+            if self._params is None or params.first >= self._params.first:
+                self._params = params
+
+
+# Suggested parameter caches shared by all users of the same client
+_suggested_params_caches = {}
+
+
+# Function returns a copy of the (cached) suggested transaction parameters of the client's node
+def suggested_params(client: algod.AlgodClient):
+    with _round_followers_lock:
+        if client not in _suggested_params_caches:
+            _suggested_params_caches[client] = SuggestedParamsCache(client, round_follower(client))
+        cache = _suggested_params_caches[client]
+    return cache.get()
+
+
+# Pipeline of submitted transaction groups. Groups are sent right away and their confirmations are tracked by a single
+# background thread, which checks all pending groups once with each new round (see RoundFollower), instead of each caller
+# blocking and polling the node for its own group. Results are delivered through futures (and optional callbacks), thus
+# any number of groups can be in flight at once.
+class SubmissionPipeline:
+
+    def __init__(self, client: algod.AlgodClient, follower: RoundFollower = None):
+        self.client = client
+        self.follower = follower if follower is not None else round_follower(client)
+        # Number of confirmed and failed groups
+        self.confirmed = 0
+        self.failed = 0
+
+        self._cond = threading.Condition()
+        # Pending groups: first transaction ID -> (composer, future, last round to wait for)
+        self._pending = {}
+        # Last round up to which the pending groups have been checked
+        self._checked_round = 0
+        self._thread = None
+
+    # Number of groups in flight
+    def in_flight(self):
+        with self._cond:
+            return len(self._pending)
+
+    # Send the group of the composer and return a concurrent.futures.Future of its AtomicTransactionResponse (as returned
+    # by atc.execute), which fails if the group is not confirmed within wait_rounds. The callback (if any) is called with
+    # the future once it is done. Raises error.AlgodHTTPError right away if the node rejects the group.
+    def submit(self, atc: AtomicTransactionComposer, wait_rounds: int = 10, callback=None):
+        self.follower.start()
+        tx_ids = atc.submit(self.client)
+
+        future = concurrent.futures.Future()
+        if callback is not None:
+            future.add_done_callback(callback)
+        with self._cond:
+            if not self._pending:
+                self._checked_round = self.follower.last_round
+            self._pending[tx_ids[0]] = (atc, future, self.follower.last_round + wait_rounds)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._track, daemon=True)
+                self._thread.start()
+            self._cond.notify_all()
+        return future
+
+    # Send the group of the composer and block until it is confirmed - same as atc.execute
+    def execute(self, atc: AtomicTransactionComposer, wait_rounds: int = 10):
+        return self.submit(atc, wait_rounds).result()
+
+    def _track(self):
+        while True:
+            with self._cond:
+                self._cond.wait_for(lambda: self._pending)
+                checked_round = self._checked_round
+            last_round = self.follower.wait_for_round(checked_round + 1)
+            if last_round <= checked_round:
+                # Follower has been stopped
+                sleep(1)
+                continue
+
+            with self._cond:
+                pending = list(self._pending.items())
+            for tx_id, (atc, future, wait_until) in pending:
+                try:
+                    result = self._check(atc, tx_id, last_round > wait_until)
+                except Exception as e:
+                    self.failed += 1
+                    self._done(tx_id)
+                    future.set_exception(e)
+                    continue
+                if result is not None:
+                    self.confirmed += 1
+                    self._done(tx_id)
+                    future.set_result(result)
+
+            with self._cond:
+                self._checked_round = last_round
+
+    def _done(self, tx_id: str):
+        with self._cond:
+            self._pending.pop(tx_id, None)
+
+    # Response of the group if it has been confirmed, None if it is still pending
+    def _check(self, atc: AtomicTransactionComposer, tx_id: str, timed_out: bool):
+        try:
+            tx_info = self.client.pending_transaction_info(tx_id)
+        except error.AlgodHTTPError:
+            # Node behind a load balancer might not know the transaction yet
+            tx_info = {}
+
+        if tx_info.get("pool-error"):
+            raise error.TransactionRejectedError("Transaction rejected: " + tx_info["pool-error"])
+        if tx_info.get("confirmed-round", 0) == 0:
+            if timed_out:
+                raise error.ConfirmationTimeoutError("Wait for transaction id {} timed out".format(tx_id))
+            return None
+
+        atc.status = AtomicTransactionComposerStatus.COMMITTED
+        results = []
+        for i, method in sorted(atc.method_dict.items()):
+            info = tx_info if i == 0 else self.client.pending_transaction_info(atc.tx_ids[i])
+            raw_value = None
+            return_value = None
+            decode_error = None
+            try:
+                if method.returns.type != abi.Returns.VOID:
+                    logs = info.get("logs", [])
+                    result_bytes = base64.b64decode(logs[-1]) if logs else b""
+                    if result_bytes[:4] != ABI_RETURN_HASH:
+                        raise error.AtomicTransactionComposerError("app call transaction did not log a return value")
+                    raw_value = result_bytes[4:]
+                    return_value = method.returns.type.decode(raw_value)
+            except Exception as e:
+                decode_error = e
+            results.append(ABIResult(atc.tx_ids[i], raw_value, return_value, decode_error, info, method))
+
+        return AtomicTransactionResponse(tx_info["confirmed-round"], atc.tx_ids, results)
+
+
+# Submission pipelines shared by all users of the same client
+_submission_pipelines = {}
+
+
+# Function returns the submission pipeline shared by all users of the client
+def submission_pipeline(client: algod.AlgodClient):
+    with _round_followers_lock:
+        if client not in _submission_pipelines:
+            _submission_pipelines[client] = SubmissionPipeline(client, round_follower(client))
+        return _submission_pipelines[client]
+
+
 # Function waits until a block with specific round has been accepted
 def waitUntilRound(
         client: algod.AlgodClient,
         round: int,
 ):
     print("Waiting for round {} ...".format(round))
-    currentRound = client.status().get('last-round')
-    while not currentRound >= round:
-        currentRound = client.status().get('last-round')
-        sleep(1)
+    round_follower(client).wait_for_round(round)
 
 # Function logs transaction to a default file (for simplicity)
 def log_gtx(gtx):